@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+记忆去重工具（离线，一次性）
+
+分批扫描事实记忆库，把向量距离很近的近似重复事实合并为一条：
+保留最早写入的一条，时间刷新为最新、count 累加，其余删除。
+运行前请先停止机器人主程序。只支持 ChromaDB 存储（memory.store 为 numpy 时直接退出）。
+
+用法:
+    python dedup_memory.py --dry-run          # 只统计，不修改
+    python dedup_memory.py --threshold 0.1    # 执行去重
+"""
+
+import argparse
+
+import chromadb
+
+from src.brain.vector_store import NUMPY_STORE_UNSUPPORTED, chroma_index_params, l2_equivalent, numpy_store_in_use
+
+
+def _root(merged_into: dict, doc_id: str) -> str:
+    """沿合并关系找到最终保留的文档"""
+    while doc_id in merged_into:
+        doc_id = merged_into[doc_id]
+    return doc_id
+
+
+def dedup_collection(db_path="data/memory", collection_name="important_facts",
+                     threshold=0.1, batch_size=256, neighbours=5, dry_run=False) -> dict:
+    """
+    对一个集合去重
+
+    Args:
+        db_path: 数据库路径
+        collection_name: 集合名（默认事实记忆）
+        threshold: L2 距离不超过此值视为重复（与 api.json memory.fact_dedup_threshold 一致，
+                   集合使用 cosine / ip 空间时自动换算）
+        batch_size: 每批读取/查询的条数
+        neighbours: 每条文档检查多少个最近邻
+        dry_run: 只统计不修改
+
+    Returns:
+        {"before", "after", "removed", "merged_groups"}
+    """
+    client = chromadb.PersistentClient(path=db_path)
+    collection = client.get_collection(collection_name)
+    space = chroma_index_params(collection)["space"]
+    total = collection.count()
+    print(f"📊 {collection_name}: {total} 条")
+
+    metadatas = {}     # 文档ID -> 元数据
+    merged_into = {}   # 被合并的文档ID -> 合并到的文档ID
+
+    for offset in range(0, total, batch_size):
+        batch = collection.get(limit=batch_size, offset=offset, include=["metadatas", "embeddings"])
+        for doc_id, meta in zip(batch["ids"], batch["metadatas"]):
+            metadatas[doc_id] = dict(meta or {})
+
+        results = collection.query(
+            query_embeddings=batch["embeddings"],
+            n_results=min(neighbours + 1, total),
+            include=["metadatas", "distances"]
+        )
+        for doc_id, hit_ids, hit_metas, distances in zip(batch["ids"], results["ids"],
+                                                         results["metadatas"], results["distances"]):
+            for hit_id, hit_meta, dist in zip(hit_ids, hit_metas, distances):
+                if l2_equivalent(dist, space) > threshold:
+                    break
+                metadatas.setdefault(hit_id, dict(hit_meta or {}))
+                if metadatas[hit_id].get("speaker") != metadatas[doc_id].get("speaker"):
+                    continue  # 不同家庭成员的事实分开保留
+                a, b = _root(merged_into, doc_id), _root(merged_into, hit_id)
+                if a == b:
+                    continue
+                # 保留较早写入的一条
+                keep, drop = (a, b) if metadatas[a].get("time", "") <= metadatas[b].get("time", "") else (b, a)
+                merged_into[drop] = keep
+                kept, dropped = metadatas[keep], metadatas[drop]
+                kept["count"] = kept.get("count", 1) + dropped.get("count", 1)
+                kept["time"] = max(kept.get("time", ""), dropped.get("time", ""))
+
+        print(f"   已扫描 {min(offset + batch_size, total)}/{total}，发现重复 {len(merged_into)} 条", flush=True)
+
+    survivors = {_root(merged_into, doc_id) for doc_id in merged_into}
+    removed = list(merged_into)
+
+    if not dry_run and removed:
+        for i in range(0, len(removed), batch_size):
+            collection.delete(ids=removed[i:i + batch_size])
+        survivor_ids = list(survivors)
+        for i in range(0, len(survivor_ids), batch_size):
+            ids = survivor_ids[i:i + batch_size]
+            collection.update(ids=ids, metadatas=[metadatas[doc_id] for doc_id in ids])
+
+    report = {
+        "before": total,
+        "after": total if dry_run else collection.count(),
+        "removed": len(removed),
+        "merged_groups": len(survivors)
+    }
+    print(f"{'🔍 [预览] ' if dry_run else '✅ '}{len(removed)} 条重复合并到 {len(survivors)} 条事实，"
+          f"{report['before']} → {total - len(removed)} 条")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="记忆去重工具")
+    parser.add_argument("--db-path", default="data/memory", help="数据库路径")
+    parser.add_argument("--collection", default="important_facts", help="集合名")
+    parser.add_argument("--threshold", type=float, default=0.1, help="重复判定的 L2 距离阈值")
+    parser.add_argument("--batch-size", type=int, default=256, help="每批条数")
+    parser.add_argument("--neighbours", type=int, default=5, help="每条检查的最近邻数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不修改数据库")
+    parser.add_argument("--config", default="config/api.json", help="配置文件（检查 memory.store）")
+    args = parser.parse_args()
+
+    if numpy_store_in_use(args.db_path, args.config):
+        print(f"❌ {NUMPY_STORE_UNSUPPORTED}")
+        return
+
+    dedup_collection(
+        db_path=args.db_path,
+        collection_name=args.collection,
+        threshold=args.threshold,
+        batch_size=args.batch_size,
+        neighbours=args.neighbours,
+        dry_run=args.dry_run
+    )
+
+
+if __name__ == "__main__":
+    main()
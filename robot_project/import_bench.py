@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导入耗时基准
+
+每个入口在全新的解释器里用 python -X importtime 导入一次（重复多次取中位数），
+统计冷导入耗时和最重的直接依赖，用来发现又把重量级依赖（chromadb / torch / pyaudio ...）
+放回了模块顶层。
+
+可以保存一份基线，之后对比：
+    python import_bench.py --save logs/import_baseline.json
+    python import_bench.py --compare logs/import_baseline.json
+
+用法:
+    python import_bench.py                        # 全部入口
+    python import_bench.py src.brain.brain        # 指定模块
+    python import_bench.py --repeat 9 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# 入口模块（从项目根目录导入）
+ENTRY_POINTS = [
+    "src.brain.brain",
+    "src.voice",
+    "src.voice.dialog_manager",
+    "src.voice.speaker_id",
+    "main_voice",
+    "view_memory",
+    "import_memory",
+    "dedup_memory",
+    "trace_summary",
+]
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def parse_importtime(stderr: str, module: str) -> dict:
+    """
+    解析 -X importtime 输出（后序：子模块先于父模块输出，缩进表示层级）
+
+    Returns:
+        {"total_ms", "children": [(模块名, 累计 ms)]}，找不到入口时 total_ms 为 None
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # 表头
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(cumulative) / 1000))
+
+    for i, (depth, name, total_ms) in enumerate(rows):
+        if depth == 0 and name == module:
+            children = []
+            for child_depth, child_name, child_ms in reversed(rows[:i]):
+                if child_depth == 0:
+                    break
+                if child_depth == 1:
+                    children.append((child_name, child_ms))
+            children.sort(key=lambda item: item[1], reverse=True)
+            return {"total_ms": total_ms, "children": children}
+    return {"total_ms": None, "children": []}
+
+
+def measure(module: str, repeat: int = 5) -> dict:
+    """
+    在全新解释器中重复导入，取中位数
+
+    Returns:
+        {"module", "ms", "min_ms", "heaviest": [(模块名, ms)], "error"}
+    """
+    totals = []
+    heaviest = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+            return {"module": module, "ms": None, "min_ms": None, "heaviest": [], "error": error}
+        parsed = parse_importtime(proc.stderr, module)
+        if parsed["total_ms"] is None:
+            continue
+        totals.append(parsed["total_ms"])
+        heaviest = parsed["children"][:5]
+
+    if not totals:
+        return {"module": module, "ms": None, "min_ms": None, "heaviest": [], "error": "未找到导入记录"}
+    return {"module": module, "ms": statistics.median(totals), "min_ms": min(totals),
+            "heaviest": heaviest, "error": None}
+
+
+def print_report(results: list, baseline: dict = None):
+    print("📦 冷导入耗时（ms，中位数）:")
+    for result in results:
+        if result["error"]:
+            print(f"   ❌ {result['module']:<28} {result['error']}")
+            continue
+        line = f"   {result['module']:<30}{result['ms']:>8.1f}"
+        previous = (baseline or {}).get(result["module"])
+        if previous:
+            delta = result["ms"] - previous
+            mark = "⚠️" if delta > max(10.0, previous * 0.2) else ""
+            line += f"  ({delta:+.1f}){mark}"
+        print(line)
+        if result["heaviest"]:
+            print("      " + ", ".join(f"{name} {ms:.0f}" for name, ms in result["heaviest"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入耗时基准（python -X importtime）")
+    parser.add_argument("modules", nargs="*", help="要测量的模块（默认全部入口）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个模块重复次数")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    parser.add_argument("--save", default=None, help="把结果保存为基线（JSON）")
+    parser.add_argument("--compare", default=None, help="与基线对比")
+    args = parser.parse_args()
+
+    results = [measure(module, args.repeat) for module in (args.modules or ENTRY_POINTS)]
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({r["module"]: r["ms"] for r in results if r["ms"] is not None}, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_report(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
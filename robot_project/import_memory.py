@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+记忆批量导入 / 迁移工具（离线）
+
+从 JSONL 批量导入记忆（换 SD 卡迁移、给新家庭成员预置事实等），
+每行一条：{"document": "...", "metadata": {...}, "id": "可选", "embedding": [可选的预计算向量],
+"collection": "可选，覆盖 --collection"}；也可以是纯文本文件，每行一条文档。
+view_memory.py --export 导出的 JSONL 可以直接导入。
+
+- 多进程分批嵌入（--workers / --embed-batch），大批量写入（--write-batch）
+- 断点续传：每写完一批记录进度到 <输入文件>.progress.json，中断后重新运行即从断点继续
+- 未指定 id 时按内容生成确定的 id，重复导入只会覆盖不会重复
+
+--reembed 用新的嵌入函数重新嵌入整个集合（嵌入模型更换后使用）：
+写入临时集合，完成后替换原集合；中断后重新运行同样从断点继续。
+嵌入函数默认取 config/api.json 中的 memory.embedding（与机器人主程序一致）；更换模型时先改配置，
+再运行 --reembed all，否则主程序的查询向量和库内向量不在同一空间。
+新建的集合使用 config/api.json 中 memory.index 的索引参数，修改 space / M / ef_construction
+后用 --reembed 重建即可生效。
+
+运行前请先停止机器人主程序。只支持 ChromaDB 存储（memory.store 为 numpy 时直接退出；
+可以先导入 ChromaDB，再用 migrate_store.py 迁移）。
+
+用法:
+    python import_memory.py facts.jsonl --collection facts
+    python import_memory.py backup.jsonl --workers 4 --embed-batch 64 --write-batch 1000
+    python import_memory.py --reembed all
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime
+
+import chromadb
+
+from src.brain.embedding import make_embedding_function
+from src.brain.vector_store import NUMPY_STORE_UNSUPPORTED, hnsw_metadata, numpy_store_in_use
+
+# 集合别名 -> (集合名, 默认记忆类型, id 前缀)
+COLLECTIONS = {
+    "facts": ("important_facts", "fact", "fact"),
+    "conversations": ("long_term_memory", "conv", "conv"),
+}
+_BY_NAME = {name: (name, doc_type, prefix) for name, doc_type, prefix in COLLECTIONS.values()}
+
+
+# ==================== 嵌入工作进程 ====================
+
+_worker_embedding_fn = None
+
+
+def _init_worker(spec: str):
+    global _worker_embedding_fn
+    _worker_embedding_fn = make_embedding_function(spec)
+
+
+def _embed_batch(batch: tuple) -> tuple:
+    """
+    为一批记录补齐向量（已有预计算向量的跳过）
+
+    Args:
+        batch: (结束行号, 记录列表)
+    """
+    end_line, records = batch
+    missing = [r for r in records if r["embedding"] is None]
+    if missing:
+        embeddings = _worker_embedding_fn([r["document"] for r in missing])
+        for record, embedding in zip(missing, embeddings):
+            record["embedding"] = [float(x) for x in embedding]
+    return end_line, records
+
+
+class _BoundedFeed:
+    """限制已提交但未取回的批次数，避免 Pool.imap 把整个输入文件读进内存"""
+
+    def __init__(self, batches, max_pending: int):
+        self._batches = batches
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def __iter__(self):
+        for batch in self._batches:
+            self._slots.acquire()
+            yield batch
+
+    def done_one(self):
+        self._slots.release()
+
+
+def _map_batches(batches, spec: str, workers: int):
+    """按顺序产出嵌入完成的批次（workers=0 时在当前进程中执行）"""
+    if workers <= 0:
+        _init_worker(spec)
+        for batch in batches:
+            yield _embed_batch(batch)
+        return
+
+    feed = _BoundedFeed(batches, workers * 4)
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(spec,)) as pool:
+        for result in pool.imap(_embed_batch, feed):
+            feed.done_one()
+            yield result
+
+
+# ==================== 导入 ====================
+
+def _record(item, default_collection: str, line_no: int) -> dict:
+    """把一行输入规范化为 {"collection", "id", "document", "metadata", "embedding"}"""
+    if not isinstance(item, dict):
+        item = {"document": str(item)}
+    collection = item.get("collection") or default_collection
+    name, doc_type, prefix = COLLECTIONS.get(collection) or _BY_NAME.get(collection) or (None, None, None)
+    if name is None:
+        raise ValueError(f"第 {line_no} 行: 未知集合 {collection}")
+
+    document = item.get("document") or item.get("text")
+    if not document:
+        raise ValueError(f"第 {line_no} 行: 缺少 document")
+    metadata = dict(item.get("metadata") or {})
+    for key in ("time", "type"):
+        if key in item and key not in metadata:
+            metadata[key] = item[key]
+
+    doc_id = item.get("id")
+    if not doc_id:
+        # 只用输入里的内容生成 id（不含导入时间），重复导入同一文件时 id 不变
+        source = f"{name}\n{metadata.get('time', '')}\n{document}"
+        doc_id = f"{prefix}_import_{hashlib.sha1(source.encode('utf-8')).hexdigest()[:20]}"
+    metadata.setdefault("time", datetime.now().isoformat())
+    metadata.setdefault("type", doc_type)
+    if doc_type == "fact":
+        metadata.setdefault("count", 1)
+    return {"collection": name, "id": doc_id, "document": document,
+            "metadata": metadata, "embedding": item.get("embedding")}
+
+
+def _read_batches(path: str, start_line: int, embed_batch: int, default_collection: str):
+    """从 start_line 行之后开始读取，每 embed_batch 条一批：(结束行号, 记录列表)"""
+    records = []
+    line_no = 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if line_no <= start_line:
+                continue
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line) if line.startswith("{") else line
+            records.append(_record(item, default_collection, line_no))
+            if len(records) >= embed_batch:
+                yield line_no, records
+                records = []
+    if records or line_no > start_line:
+        yield line_no, records
+
+
+def _load_progress(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"lines": 0, "imported": 0}
+
+
+def _save_progress(path: str, progress: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)  # 原子替换，写进度时中断也不会损坏
+
+
+def import_file(input_path: str, db_path: str = "data/memory", collection: str = "facts",
+                workers: int = 2, embed_batch: int = 64, write_batch: int = 1000,
+                embedding: str = "default", restart: bool = False, index: dict = None) -> dict:
+    """
+    批量导入 JSONL / 文本文件
+
+    Args:
+        input_path: 输入文件
+        db_path: 数据库路径
+        collection: 默认集合（facts / conversations），行内 collection 字段优先
+        workers: 嵌入进程数（0 为不用子进程）
+        embed_batch: 每次嵌入的文档数
+        write_batch: 每次写入数据库的文档数
+        embedding: 嵌入函数（见 src/brain/embedding.py），应与配置 memory.embedding 一致
+        restart: 忽略断点，从头导入
+        index: 新建集合的索引参数 {集合名: {"space", "M", "ef_construction", "ef_search"}}
+
+    Returns:
+        {"imported", "resumed_from_line", "lines", "seconds", "docs_per_second"}
+    """
+    progress_path = input_path + ".progress.json"
+    progress = {"lines": 0, "imported": 0} if restart else _load_progress(progress_path)
+    if progress["lines"]:
+        print(f"⏩ 从第 {progress['lines'] + 1} 行继续（已导入 {progress['imported']} 条）")
+
+    client = chromadb.PersistentClient(path=db_path)
+    max_batch = client.get_max_batch_size()
+    embedding_fn = make_embedding_function(embedding)
+    collections = {}
+
+    def get_collection(name):
+        if name not in collections:
+            description = "重要事实记忆" if name == "important_facts" else "对话记忆"
+            existing = {c.name if hasattr(c, "name") else c for c in client.list_collections()}
+            if name in existing:
+                collections[name] = client.get_collection(name, embedding_function=embedding_fn)
+            else:
+                collections[name] = client.create_collection(
+                    name=name, metadata={"description": description, **hnsw_metadata((index or {}).get(name))},
+                    embedding_function=embedding_fn
+                )
+        return collections[name]
+
+    def write(records):
+        by_collection = {}
+        for record in records:
+            by_collection.setdefault(record["collection"], []).append(record)
+        for name, items in by_collection.items():
+            for i in range(0, len(items), max_batch):
+                chunk = items[i:i + max_batch]
+                # upsert：断点前后重叠的记录只会被覆盖
+                get_collection(name).upsert(
+                    ids=[r["id"] for r in chunk],
+                    documents=[r["document"] for r in chunk],
+                    metadatas=[r["metadata"] for r in chunk],
+                    embeddings=[r["embedding"] for r in chunk]
+                )
+
+    start = time.perf_counter()
+    imported = 0
+    pending = []
+    end_line = progress["lines"]
+    batches = _read_batches(input_path, progress["lines"], embed_batch, collection)
+    for end_line, records in _map_batches(batches, embedding, workers):
+        pending.extend(records)
+        if len(pending) < write_batch:
+            continue
+        write(pending)
+        imported += len(pending)
+        pending = []
+        _save_progress(progress_path, {"lines": end_line, "imported": progress["imported"] + imported})
+        elapsed = time.perf_counter() - start
+        print(f"   已导入 {imported} 条（到第 {end_line} 行，{imported / elapsed:.0f} 条/秒）", flush=True)
+    if pending:
+        write(pending)
+        imported += len(pending)
+
+    elapsed = time.perf_counter() - start
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+
+    report = {
+        "imported": imported,
+        "resumed_from_line": progress["lines"],
+        "lines": end_line,
+        "seconds": elapsed,
+        "docs_per_second": imported / elapsed if elapsed > 0 else 0.0
+    }
+    print(f"✅ 导入完成: {imported} 条，用时 {elapsed:.1f}s（{report['docs_per_second']:.0f} 条/秒）")
+    return report
+
+
+# ==================== 重新嵌入 ====================
+
+def _read_collection(collection, start: int, embed_batch: int, name: str):
+    """从第 start 条开始分批读取集合中的文档和元数据（不读旧向量）"""
+    offset = start
+    while True:
+        got = collection.get(limit=embed_batch, offset=offset, include=["documents", "metadatas"])
+        if not got["ids"]:
+            return
+        offset += len(got["ids"])
+        yield offset, [
+            {"collection": name, "id": doc_id, "document": document, "metadata": metadata, "embedding": None}
+            for doc_id, document, metadata in zip(got["ids"], got["documents"], got["metadatas"])
+        ]
+
+
+def reembed_collection(name: str, db_path: str = "data/memory", workers: int = 2, embed_batch: int = 64,
+                       write_batch: int = 1000, embedding: str = "default", index: dict = None) -> dict:
+    """
+    用新的嵌入函数重新嵌入整个集合
+
+    先写入临时集合 <name>__reembed，全部完成后删除原集合并把临时集合改名。
+    临时集合里已有的条数就是断点，中断后重新运行会接着做。
+    临时集合按 index 中该集合的索引参数新建（未配置的参数沿用原集合）。
+
+    Returns:
+        {"collection", "reembedded", "total", "seconds", "docs_per_second"}
+    """
+    client = chromadb.PersistentClient(path=db_path)
+    max_batch = client.get_max_batch_size()
+    embedding_fn = make_embedding_function(embedding)
+    tmp_name = f"{name}__reembed"
+    existing = {c.name if hasattr(c, "name") else c for c in client.list_collections()}
+
+    if name not in existing:
+        if tmp_name in existing:
+            # 上次已经删掉原集合但没来得及改名
+            client.get_collection(tmp_name, embedding_function=embedding_fn).modify(name=name)
+            print(f"✅ {name}: 已完成上次中断的替换")
+        else:
+            print(f"⚠️  集合不存在: {name}")
+        return {"collection": name, "reembedded": 0, "total": 0, "seconds": 0.0, "docs_per_second": 0.0}
+
+    source = client.get_collection(name)
+    metadata = {**(source.metadata or {}), **hnsw_metadata((index or {}).get(name))}
+    target = client.get_or_create_collection(tmp_name, metadata=metadata, embedding_function=embedding_fn)
+    total = source.count()
+    done = target.count()
+    if done:
+        print(f"⏩ {name}: 从第 {done + 1} 条继续")
+    print(f"🔄 重新嵌入 {name}: {total - done} 条")
+
+    start = time.perf_counter()
+    reembedded = 0
+    pending = []
+
+    def flush():
+        for i in range(0, len(pending), max_batch):
+            chunk = pending[i:i + max_batch]
+            target.add(
+                ids=[r["id"] for r in chunk],
+                documents=[r["document"] for r in chunk],
+                metadatas=[r["metadata"] for r in chunk],
+                embeddings=[r["embedding"] for r in chunk]
+            )
+
+    for offset, records in _map_batches(_read_collection(source, done, embed_batch, name), embedding, workers):
+        pending.extend(records)
+        if len(pending) >= write_batch:
+            flush()
+            reembedded += len(pending)
+            pending = []
+            elapsed = time.perf_counter() - start
+            print(f"   {offset}/{total}（{reembedded / elapsed:.0f} 条/秒）", flush=True)
+    if pending:
+        flush()
+        reembedded += len(pending)
+
+    if target.count() != total:
+        raise RuntimeError(f"{name}: 重新嵌入后条数不一致（{target.count()} / {total}），原集合未改动")
+    client.delete_collection(name)
+    target.modify(name=name)
+
+    elapsed = time.perf_counter() - start
+    report = {
+        "collection": name,
+        "reembedded": reembedded,
+        "total": total,
+        "seconds": elapsed,
+        "docs_per_second": reembedded / elapsed if elapsed > 0 else 0.0
+    }
+    print(f"✅ {name}: 重新嵌入 {reembedded} 条，用时 {elapsed:.1f}s（{report['docs_per_second']:.0f} 条/秒）")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导入记忆 / 重新嵌入集合（离线）")
+    parser.add_argument("input", nargs="?", default=None, help="输入文件（JSONL 或每行一条的纯文本）")
+    parser.add_argument("--db-path", default="data/memory", help="数据库路径")
+    parser.add_argument("--collection", choices=list(COLLECTIONS), default="facts",
+                        help="默认导入的集合（行内 collection 字段优先）")
+    parser.add_argument("--reembed", choices=list(COLLECTIONS) + ["all"], default=None,
+                        help="重新嵌入指定集合（不需要输入文件）")
+    parser.add_argument("--embedding", default=None,
+                        help="嵌入函数: default 或 st:<模型名>（默认取配置中的 memory.embedding）")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, (os.cpu_count() or 2) - 1)),
+                        help="嵌入进程数（0 为在主进程中嵌入）")
+    parser.add_argument("--embed-batch", type=int, default=64, help="每次嵌入的文档数")
+    parser.add_argument("--write-batch", type=int, default=1000, help="每次写入的文档数")
+    parser.add_argument("--restart", action="store_true", help="忽略断点，从头导入")
+    parser.add_argument("--config", default="config/api.json",
+                        help="读取 memory.embedding / memory.index 的配置文件")
+    args = parser.parse_args()
+
+    if numpy_store_in_use(args.db_path, args.config):
+        print(f"❌ {NUMPY_STORE_UNSUPPORTED}")
+        return
+
+    from src.brain.brain import load_api_config
+    memory_config = load_api_config(args.config).get("memory", {})
+    embedding = args.embedding or memory_config.get("embedding", "default")
+    if embedding != memory_config.get("embedding", "default"):
+        print(f"⚠️  --embedding {embedding} 与配置 memory.embedding 不一致，记得同步修改 {args.config}")
+    options = dict(db_path=args.db_path, workers=args.workers, embed_batch=args.embed_batch,
+                   write_batch=args.write_batch, embedding=embedding, index=memory_config.get("index"))
+    if args.reembed:
+        aliases = list(COLLECTIONS) if args.reembed == "all" else [args.reembed]
+        for alias in aliases:
+            reembed_collection(COLLECTIONS[alias][0], **options)
+    elif args.input:
+        import_file(args.input, collection=args.collection, restart=args.restart, **options)
+    else:
+        parser.error("需要输入文件或 --reembed")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,8 @@ from src.voice.vad import VADDetector
 from src.voice.asr import VolcengineASR
 from src.voice.tts import VolcengineTTS
 from src.voice.dialog_manager import VoiceDialogManager
+from src.tracing import configure_tracing
+from src.startup import StartupOrchestrator
 
 # 声纹识别（可选）
 try:
@@ -76,45 +78,60 @@ async def main():
         print("   access_token: 访问令牌")
         print()
 
-    # 初始化模块
-    # 1. AI大脑
+    # 每轮延迟追踪（写入 logs/turns.jsonl，用 trace_summary.py 汇总）
+    tracing_config = speech_config.get('tracing', {})
+    configure_tracing(tracing_config)
+    if tracing_config.get('enabled', True):
+        print(f"⏱️ 延迟追踪: {tracing_config.get('path', 'logs/turns.jsonl')}")
+
+    # 初始化模块：互不依赖的子系统在线程中并行构建，慢路径构建后在后台预热
+    startup = StartupOrchestrator()
+    audio_config = speech_config.get('audio', {})
+    vad_config = speech_config.get('vad', {})
+
+    # 1. AI大脑（预热：嵌入模型首次推理 + 向量索引加载）
     backend_config = api_config.get(api_config.get('backend', 'doubao'), {})
-    brain = Brain(
+    startup.add("AI大脑", lambda: Brain(
         backend=api_config.get('backend', 'doubao'),
         model=backend_config.get('model'),
         api_key=backend_config.get('api_key'),
-        fallback_to_local=api_config.get('fallback_to_local', True)
-    )
+        fallback_to_local=api_config.get('fallback_to_local', True),
+        config=api_config
+    ), warm_up=lambda brain: brain.warm_up())
 
     # 2. 音频设备（可选 AEC：voice-engine/ec）
-    audio_config = speech_config.get('audio', {})
-    aec_config = speech_config.get('aec', {})
-    audio_device = AudioDevice(audio_config, aec_config=aec_config)
+    startup.add("音频设备", lambda: AudioDevice(audio_config, aec_config=speech_config.get('aec', {})))
 
     # 3. VAD检测器
-    vad_config = speech_config.get('vad', {})
-    vad = VADDetector(
-        aggressiveness=vad_config.get('aggressiveness', 3),
-        sample_rate=audio_config.get('sample_rate', 16000)
-    )
-    # 应用配置的参数
-    vad.speech_start_frames = vad_config.get('speech_start_frames', 10)
-    vad.speech_end_frames = vad_config.get('speech_end_frames', 40)
-
-    # 4. ASR识别
-    asr = VolcengineASR(asr_config)
-
-    # 5. TTS合成
-    tts = VolcengineTTS(tts_config, audio_device)
-
-    # 6. 声纹识别（可选）
-    speaker_id = None
-    if SpeakerIdentifier and RESEMBLYZER_AVAILABLE:
-        print()
-        speaker_id = SpeakerIdentifier(data_dir="data/speakers")
-    else:
+    def build_vad():
+        vad = VADDetector(
+            aggressiveness=vad_config.get('aggressiveness', 3),
+            sample_rate=audio_config.get('sample_rate', 16000)
+        )
+        # 应用配置的参数
+        vad.speech_start_frames = vad_config.get('speech_start_frames', 10)
+        vad.speech_end_frames = vad_config.get('speech_end_frames', 40)
+        return vad
+    startup.add("VAD", build_vad)
+
+    # 4. ASR识别 / 5. TTS合成（预热：DNS 解析 + TLS 握手）
+    startup.add("ASR", lambda: VolcengineASR(asr_config), warm_up=lambda asr: asr.warm_up())
+    startup.add("TTS", lambda audio_device: VolcengineTTS(tts_config, audio_device),
+                after=("音频设备",), warm_up=lambda tts: tts.warm_up())
+
+    # 6. 声纹识别（可选，预热：首次推理）；不阻塞开始对话，就绪前的几轮不做识别
+    def build_speaker_id():
+        if SpeakerIdentifier and RESEMBLYZER_AVAILABLE:
+            return SpeakerIdentifier(data_dir="data/speakers")
         print("⚠️ 声纹识别未启用（需安装 resemblyzer: pip install resemblyzer）")
-
+        return None
+    speaker_future = startup.add("声纹识别", build_speaker_id, warm_up=lambda s: s.warm_up(), required=False)
+
+    # 对话必需的子系统构建完成即开始（预热继续在后台进行）
+    brain, audio_device, vad, asr, tts = [
+        await startup.aget(name) for name in ("AI大脑", "音频设备", "VAD", "ASR", "TTS")
+    ]
+    speaker_id = speaker_future.result() if speaker_future.done() and not speaker_future.exception() else None
     print()
 
     # 创建双向对话管理器
@@ -124,11 +141,26 @@ async def main():
         vad=vad,
         asr=asr,
         tts=tts,
-        speaker_id=speaker_id
+        speaker_id=speaker_id,
+        name_intent_threshold=speech_config.get('name_intent', {}).get('threshold', 0.75)
     )
 
+    def attach_speaker_id(future):
+        if speaker_id is None and not future.exception() and future.result() is not None:
+            dialog_manager.speaker_id = future.result()
+            print("✅ 声纹识别已就绪")
+    speaker_future.add_done_callback(attach_speaker_id)
+
+    async def report_startup():
+        await startup.await_all()
+        startup.print_table()
+    startup_report = asyncio.create_task(report_startup())
+
     # 运行
-    await dialog_manager.run()
+    try:
+        await dialog_manager.run()
+    finally:
+        startup_report.cancel()
 
 
 def run_sync():
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+记忆存储迁移工具：ChromaDB → NumpyStore（离线）
+
+把 long_term_memory / important_facts 两个集合（文档、元数据和已有向量）分批复制到
+<db-path>/vectors（float16 向量文件 + SQLite 元数据），不重新嵌入，原 ChromaDB 数据不改动。
+已复制的 id 会跳过，中断后重新运行即可继续。
+
+迁移完成后在 config/api.json 中设置:
+    "memory": {"store": "numpy"}
+
+运行前请先停止机器人主程序。
+
+用法:
+    python migrate_store.py
+    python migrate_store.py --db-path data/memory --batch 1000
+"""
+
+import argparse
+import os
+import time
+
+import chromadb
+
+from src.brain.vector_store import NumpyStore
+
+COLLECTIONS = [
+    ("long_term_memory", "对话记忆"),
+    ("important_facts", "重要事实记忆"),
+]
+
+
+def migrate(db_path: str = "data/memory", batch_size: int = 500) -> dict:
+    """
+    复制两个集合到 NumpyStore
+
+    Returns:
+        {集合名: {"source", "copied", "target"}}
+    """
+    client = chromadb.PersistentClient(path=db_path)
+    existing = {c.name if hasattr(c, "name") else c for c in client.list_collections()}
+    store = NumpyStore(os.path.join(db_path, "vectors"))
+    report = {}
+
+    for name, description in COLLECTIONS:
+        target = store.collection(name, description)
+        if name not in existing:
+            print(f"⚠️  ChromaDB 中没有集合 {name}，跳过")
+            continue
+        source = client.get_collection(name)
+        total = source.count()
+        print(f"📦 {description}（{name}）: {total} 条")
+
+        copied = 0
+        t0 = time.perf_counter()
+        for offset in range(0, total, batch_size):
+            got = source.get(limit=batch_size, offset=offset,
+                             include=["documents", "metadatas", "embeddings"])
+            done = set(target.get(ids=got["ids"], include=[])["ids"])
+            new = [i for i, doc_id in enumerate(got["ids"]) if doc_id not in done]
+            if new:
+                target.add(
+                    ids=[got["ids"][i] for i in new],
+                    documents=[got["documents"][i] for i in new],
+                    metadatas=[got["metadatas"][i] or {} for i in new],
+                    embeddings=[got["embeddings"][i] for i in new]
+                )
+                copied += len(new)
+            print(f"   {min(offset + batch_size, total)}/{total}", flush=True)
+
+        elapsed = time.perf_counter() - t0
+        report[name] = {"source": total, "copied": copied, "target": target.count()}
+        status = "✅" if target.count() == total else "⚠️ "
+        print(f"{status} {name}: 新复制 {copied} 条，目标共 {target.count()} 条（{elapsed:.1f}s）\n")
+
+    store.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="记忆存储迁移：ChromaDB → NumpyStore")
+    parser.add_argument("--db-path", default="data/memory", help="数据库路径")
+    parser.add_argument("--batch", type=int, default=500, help="每批复制条数")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  记忆存储迁移: ChromaDB → NumpyStore")
+    print("=" * 60)
+    print()
+    report = migrate(args.db_path, args.batch)
+    if report and all(r["target"] == r["source"] for r in report.values()):
+        print('👉 在 config/api.json 中设置 "memory": {"store": "numpy"} 即可切换')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+# AI成长机器人 - 大脑延迟基准测试
+# 本地 OpenAI 兼容桩服务 + 临时记忆库，跑脚本化多轮对话，按阶段统计每轮耗时
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 支持 python src/brain/bench.py 直接运行（把项目根目录加入路径）
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.brain.brain import Brain
+
+
+# 脚本化多轮对话（按顺序循环使用）
+SCRIPTS = [
+    ["你好呀", "我今天在学校画了一只小猫", "老师说我画得很好", "你还记得我喜欢什么颜色吗", "那我明天画一只蓝色的小狗"],
+    ["今天星期几", "我明天要去奶奶家", "奶奶家有一只大黄狗", "它叫旺财", "你说我应该给它带什么礼物"],
+    ["我有点不开心", "因为我和好朋友吵架了", "她说我的积木搭得不好看", "我该怎么办呢", "好的，我明天去和她道歉"],
+    ["清于的生日是哪天", "我们要给她准备什么礼物", "她喜欢恐龙", "那就送恐龙拼图吧", "记得提醒我哦"],
+]
+
+# 种子记忆的素材
+_NAMES = ["清于", "小明", "妈妈", "爸爸", "奶奶", "爷爷", "小红"]
+_TOPICS = ["画画", "搭积木", "踢足球", "看恐龙书", "去公园", "弹钢琴", "吃冰淇淋", "学英语", "养小金鱼"]
+_FACT_TEMPLATES = ["{name}喜欢{topic}", "{name}不喜欢{topic}", "{name}每周六去{topic}", "记住{name}对花生过敏"]
+
+# 报告中的阶段（turn 为整轮端到端耗时）
+STAGES = ["memory_search", "prompt_build", "api_first_token", "api_total", "memory_write", "turn"]
+
+
+class StubLLMServer:
+    """
+    本地 OpenAI 兼容桩服务（/v1/chat/completions，支持流式和非流式）
+
+    首 token 前等待 first_token_delay 秒，之后按 tokens_per_second 的速度输出。
+    """
+
+    REPLY = "好的呀，我记住啦！我们下次再一起玩吧，你今天过得开心吗？"
+
+    def __init__(self, first_token_delay: float = 0.3, tokens_per_second: float = 30.0,
+                 reply: str = None, host: str = "127.0.0.1", port: int = 0):
+        self.first_token_delay = first_token_delay
+        self.tokens_per_second = tokens_per_second
+        self.reply = reply or self.REPLY
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _tokens(self) -> list:
+        """把回复切成 2 个字一个 token"""
+        return [self.reply[i:i + 2] for i in range(0, len(self.reply), 2)]
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                prompt_chars = sum(len(m.get("content") or "") for m in request.get("messages", []))
+                usage = {
+                    "prompt_tokens": prompt_chars,
+                    "completion_tokens": len(stub._tokens()),
+                    "total_tokens": prompt_chars + len(stub._tokens())
+                }
+                model = request.get("model", "stub")
+
+                time.sleep(stub.first_token_delay)
+                if not request.get("stream"):
+                    body = json.dumps({
+                        "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": stub.reply}}],
+                        "usage": usage
+                    }).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                def send(payload):
+                    data = f"data: {payload}\n\n".encode("utf-8")
+                    self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                    self.wfile.flush()
+
+                interval = 1.0 / stub.tokens_per_second if stub.tokens_per_second > 0 else 0
+                for i, token in enumerate(stub._tokens()):
+                    if i and interval:
+                        time.sleep(interval)
+                    send(json.dumps({
+                        "id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+                    }, ensure_ascii=False))
+                if request.get("stream_options", {}).get("include_usage"):
+                    send(json.dumps({"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                                     "model": model, "choices": [], "usage": usage}))
+                send("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def seed_memory(db_path: str, docs: int, facts: int, seed: int = 0, batch_size: int = 256):
+    """向临时记忆库写入 docs 条对话记忆和 facts 条事实记忆"""
+    import chromadb
+    from chromadb.utils import embedding_functions
+
+    rng = random.Random(seed)
+    embedding_fn = embedding_functions.DefaultEmbeddingFunction()
+    client = chromadb.PersistentClient(path=db_path)
+    start = datetime.now() - timedelta(days=60)
+
+    def add(name, prefix, count, make):
+        collection = client.get_or_create_collection(name=name, embedding_function=embedding_fn)
+        for offset in range(0, count, batch_size):
+            ids, documents, metadatas = [], [], []
+            for i in range(offset, min(count, offset + batch_size)):
+                document, metadata = make(i)
+                ids.append(f"{prefix}_{i}")
+                documents.append(document)
+                metadatas.append(metadata)
+            collection.add(ids=ids, documents=documents, metadatas=metadatas)
+
+    def make_conv(i):
+        name, topic = rng.choice(_NAMES), rng.choice(_TOPICS)
+        when = (start + timedelta(minutes=17 * i)).isoformat()
+        return (f"用户说：{name}今天去{topic}了\n机器人回复：哇，{topic}听起来好有趣！",
+                {"time": when, "type": "conv"})
+
+    def make_fact(i):
+        text = rng.choice(_FACT_TEMPLATES).format(name=rng.choice(_NAMES), topic=rng.choice(_TOPICS))
+        return f"{text}（{i}）", {"time": start.isoformat(), "type": "fact", "count": 1}
+
+    add("long_term_memory", "conv", docs, make_conv)
+    add("important_facts", "fact", facts, make_fact)
+
+
+def percentile(values: list, p: float) -> float:
+    """线性插值分位数"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summarize(samples: dict) -> dict:
+    """各阶段耗时样本（秒）-> 统计（毫秒）"""
+    result = {}
+    for stage in STAGES:
+        values = samples.get(stage, [])
+        if not values:
+            continue
+        result[stage] = {
+            "count": len(values),
+            "mean_ms": sum(values) / len(values) * 1000,
+            "p50_ms": percentile(values, 50) * 1000,
+            "p90_ms": percentile(values, 90) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+            "max_ms": max(values) * 1000,
+        }
+    return result
+
+
+def run_benchmark(turns: int = 40, docs: int = 500, facts: int = 50, first_token_delay: float = 0.3,
+                  tokens_per_second: float = 30.0, mode: str = "async", warmup: int = 2, seed: int = 0) -> dict:
+    """
+    运行基准测试
+
+    Args:
+        turns: 计入统计的对话轮数
+        docs / facts: 临时记忆库的对话/事实条数
+        first_token_delay / tokens_per_second: 桩服务的首 token 延迟和输出速度
+        mode: "async"（achat_stream，语音对话用）/ "stream"（chat_stream）/ "sync"（chat）
+        warmup: 不计入统计的预热轮数
+        seed: 随机种子
+
+    Returns:
+        报告字典（config / stages / memory_flush_ms）
+    """
+    db_path = tempfile.mkdtemp(prefix="brain_bench_")
+    server = StubLLMServer(first_token_delay, tokens_per_second).start()
+    try:
+        print(f"📦 准备临时记忆库: {docs}条对话, {facts}条事实 ...")
+        seed_memory(db_path, docs, facts, seed)
+
+        brain = Brain(
+            backend=Brain.BACKEND_OPENAI,
+            model="stub",
+            api_key="stub",
+            api_base=server.base_url,
+            fallback_to_local=False,
+            config={
+                "memory": {"db_path": db_path},
+                "consolidation": {"enabled": False},
+                "context": {"summary": {"enabled": False}},
+                "ollama": {"preload": False},
+            }
+        )
+
+        script = [text for conversation in SCRIPTS for text in conversation]
+        samples = {stage: [] for stage in STAGES}
+        loop = asyncio.new_event_loop()
+
+        async def run_async(text):
+            async for _ in brain.achat_stream(text, debug=False):
+                pass
+            # 等待记忆写入线程处理完本轮写入
+            await brain._run_memory(lambda: None)
+
+        print(f"🏃 运行 {warmup} 轮预热 + {turns} 轮测试 (模式: {mode}) ...")
+        for i in range(warmup + turns):
+            text = script[i % len(script)]
+            t0 = time.perf_counter()
+            if mode == "async":
+                loop.run_until_complete(run_async(text))
+            elif mode == "stream":
+                for _ in brain.chat_stream(text, debug=False):
+                    pass
+            else:
+                brain.chat(text, debug=False)
+            elapsed = time.perf_counter() - t0
+
+            if i < warmup:
+                continue
+            for stage, value in brain.last_timings.items():
+                if stage in samples:
+                    samples[stage].append(value)
+            samples["turn"].append(elapsed)
+
+        t0 = time.perf_counter()
+        brain.save_memory()
+        flush_ms = (time.perf_counter() - t0) * 1000
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "config": {
+                "turns": turns, "docs": docs, "facts": facts, "mode": mode, "warmup": warmup,
+                "first_token_delay": first_token_delay, "tokens_per_second": tokens_per_second, "seed": seed
+            },
+            "stages": summarize(samples),
+            "memory_flush_ms": flush_ms,
+            "transport": brain.get_backend_stats().get("transport")
+        }
+    finally:
+        server.stop()
+        shutil.rmtree(db_path, ignore_errors=True)
+
+
+def print_report(report: dict, baseline: dict = None):
+    """打印各阶段耗时（可与基线报告对比 p50/p95）"""
+    print("\n" + "=" * 78)
+    print(f"  {'阶段':<16}{'次数':>6}{'均值':>9}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'最大':>9}  (ms)")
+    print("=" * 78)
+    for stage, s in report["stages"].items():
+        line = (f"  {stage:<16}{s['count']:>6}{s['mean_ms']:>9.1f}{s['p50_ms']:>9.1f}{s['p90_ms']:>9.1f}"
+                f"{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}")
+        base = (baseline or {}).get("stages", {}).get(stage)
+        if base:
+            line += f"   Δp50 {s['p50_ms'] - base['p50_ms']:+.1f}  Δp95 {s['p95_ms'] - base['p95_ms']:+.1f}"
+        print(line)
+    print("=" * 78)
+    print(f"  退出前记忆落盘: {report['memory_flush_ms']:.1f}ms")
+    transport = report.get("transport")
+    if transport:
+        print(f"  HTTP 连接: 请求 {transport['requests']} 次, 新建连接 {transport['connections']} 次"
+              f"（平均建连 {transport['connect_ms'] or 0:.1f}ms）, 复用 {transport['reused']} 次, "
+              f"保活 {transport['pings']} 次（新建连接 {transport['ping_connections']} 次）")
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="AI大脑延迟基准测试")
+    parser.add_argument("--turns", type=int, default=40, help="计入统计的对话轮数")
+    parser.add_argument("--warmup", type=int, default=2, help="预热轮数")
+    parser.add_argument("--docs", type=int, default=500, help="临时记忆库中的对话条数")
+    parser.add_argument("--facts", type=int, default=50, help="临时记忆库中的事实条数")
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="桩服务首 token 延迟（秒）")
+    parser.add_argument("--tokens-per-second", type=float, default=30.0, help="桩服务输出速度")
+    parser.add_argument("--mode", choices=["async", "stream", "sync"], default="async", help="调用方式")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--json", default=None, help="把报告写入 JSON 文件")
+    parser.add_argument("--baseline", default=None, help="与之对比的基线 JSON 报告")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        turns=args.turns,
+        docs=args.docs,
+        facts=args.facts,
+        first_token_delay=args.first_token_delay,
+        tokens_per_second=args.tokens_per_second,
+        mode=args.mode,
+        warmup=args.warmup,
+        seed=args.seed
+    )
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 报告已保存: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
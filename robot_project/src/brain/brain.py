@@ -1,16 +1,52 @@
 # AI成长机器人 - AI大脑模块
 # 包含对话、记忆、人格功能
 
-import chromadb
+import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import hashlib
 import json
+import logging
+from logging.handlers import RotatingFileHandler
 import os
+import sys
+import threading
 import time
-import re
 
-# API 客户端（延迟导入）
+# 支持 python src/brain/brain.py 直接运行（把项目根目录加入路径）
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+from src.brain.consolidation import MemoryConsolidator
+from src.brain.context import ContextPacker, TokenCounter
+from src.brain.embedding import make_embedding_function
+from src.brain.keyword_index import KeywordIndex, reciprocal_rank_fusion
+from src.brain.memory_writer import MemoryWriter
+from src.brain.prompt import PromptBuilder
+from src.brain.response_cache import ResponseCache
+from src.brain.rolling_summary import RollingSummary
+from src.brain.router import BackendRouter
+from src.brain.segmenter import SentenceSegmenter
+from src.brain.speculative import SpeculativeRetriever, normalize_text
+from src.brain.vector_store import l2_equivalent
+from src.tracing import get_tracer
+
+# 向量库、API 客户端（延迟导入）
+chromadb = None
 ollama = None
 openai = None
+async_openai = None
+
+
+def get_chromadb():
+    """延迟加载 chromadb（只用文本对话或只读工具时不必付出导入开销）"""
+    global chromadb
+    if chromadb is None:
+        import chromadb as _chromadb
+        chromadb = _chromadb
+    return chromadb
 
 
 def get_ollama():
@@ -31,12 +67,27 @@ def get_openai():
     return openai
 
 
+def get_async_openai():
+    """延迟加载 AsyncOpenAI"""
+    global async_openai
+    if async_openai is None:
+        from openai import AsyncOpenAI
+        async_openai = AsyncOpenAI
+    return async_openai
+
+
 class Memory:
     """分层记忆系统 - 优化版"""
 
     # 记忆类型
     TYPE_FACT = "fact"          # 事实记忆：生日、喜好、重要信息
     TYPE_CONVERSATION = "conv"   # 对话记忆：日常闲聊
+    TYPE_DIGEST = "digest"       # 对话摘要：由旧对话整理而来
+
+    SPEAKER_SHARED = "shared"    # 说话人未识别或全家共享的记忆（对所有人可见）
+
+    # 全家共享的事实（说话人已识别也记为 shared）
+    HOUSEHOLD_KEYWORDS = ["我们家", "咱家", "家里", "全家"]
 
     # 事实关键词（用于自动识别重要信息）
     FACT_KEYWORDS = [
@@ -45,33 +96,126 @@ class Memory:
         "记住", "记得", "别忘了", "重要"
     ]
 
-    def __init__(self, db_path="data/memory", similarity_threshold=2.0):
+    def __init__(self, db_path="data/memory", similarity_threshold=2.0, cache_size=128,
+                 write_batch_size=16, write_flush_interval=2.0, token_counter: TokenCounter = None,
+                 keyword_search=True, keyword_short_query=12, keyword_min_coverage=0.6,
+                 fact_dedup_threshold=0.1, store="chroma", index: dict = None, query_log: str = None,
+                 speaker_partition=True, embedding="default"):
         """
         初始化记忆系统
 
         Args:
             db_path: 数据库路径
-            similarity_threshold: 相似度阈值，ChromaDB 使用 L2 距离，越小越相似
-                                  建议值 1.0-3.0，超过此值的记忆不会被召回
+            similarity_threshold: 相似度阈值，按单位向量的平方 L2 距离计（0~4，越小越相似），
+                                  集合使用 cosine / ip 空间时自动换算；建议值 1.0-3.0，超过此值的记忆不会被召回
+            cache_size: 查询向量 / 检索结果 LRU 缓存的条数
+            write_batch_size: 后台批量写入的批大小
+            write_flush_interval: 待写入记忆最多等待多少秒落盘
+            token_counter: token 计数器（默认按字符估算）
+            keyword_search: 是否启用事实关键词索引（与向量检索融合）
+            keyword_short_query: 查询不超过多少字时，关键词强命中可跳过向量检索
+            keyword_min_coverage: 强命中所需的查询关键词覆盖率（0~1）
+            fact_dedup_threshold: 新事实与已有事实的 L2 距离不超过此值时视为重复（单位同上），
+                                  只合并（刷新时间、计数+1）不新增；0 表示不去重
+            store: 向量存储后端 chroma / numpy（见 src/brain/vector_store.py）
+            index: 每个集合的索引参数 {集合名: {"space", "M", "ef_construction", "ef_search"}}
+                   （调参见 tune_index.py）
+            query_log: 记录向量检索查询的 JSONL 路径（供 tune_index.py 回放），None 表示不记录
+            speaker_partition: 按说话人分区检索：已识别说话人时只检索他/她自己的记忆和共享记忆
+                               （记忆元数据总会记录 speaker，关闭后检索不过滤）
+            embedding: 嵌入函数 default / st:<模型名>（见 src/brain/embedding.py），
+                       必须和库内向量一致，更换后用 import_memory.py --reembed all 重新嵌入
         """
-        self.client = chromadb.PersistentClient(path=db_path)
         self.similarity_threshold = similarity_threshold
 
+        # 显式持有嵌入函数：查询文本只嵌入一次，向量在两个集合间复用
+        # （numpy 后端不经过 ChromaDB，默认模型直接用 ONNX 加载，不导入 chromadb）
+        self.embedding_fn = make_embedding_function(embedding, chroma=(store == "chroma"))
+
+        # 向量存储后端：chroma（默认）或 numpy（轻量，数据在 <db_path>/vectors，用 migrate_store.py 迁移）
+        if store == "numpy":
+            from src.brain.vector_store import NumpyStore
+            self.store = NumpyStore(os.path.join(db_path, "vectors"), self.embedding_fn, index=index)
+        elif store == "chroma":
+            from src.brain.vector_store import ChromaStore
+            self.store = ChromaStore(get_chromadb().PersistentClient(path=db_path), self.embedding_fn, index=index)
+        else:
+            raise ValueError(f"未知的记忆存储后端: {store}")
+
         # 长期对话记忆
-        self.conversations = self.client.get_or_create_collection(
-            name="long_term_memory",
-            metadata={"description": "对话记忆"}
-        )
+        self.conversations = self.store.collection("long_term_memory", "对话记忆")
 
         # 重要事实记忆（单独存储，优先级更高）
-        self.facts = self.client.get_or_create_collection(
-            name="important_facts",
-            metadata={"description": "重要事实记忆"}
+        self.facts = self.store.collection("important_facts", "重要事实记忆")
+
+        # 距离空间（阈值按平方 L2 配置，cosine / ip 距离比较前换算）
+        self._conv_space = self.store.index_params("long_term_memory")["space"]
+        self._fact_space = self.store.index_params("important_facts")["space"]
+
+        # 查询记录（离线回放调参用）
+        self._query_logger = None
+        if query_log:
+            os.makedirs(os.path.dirname(query_log) or ".", exist_ok=True)
+            logger = logging.getLogger("robot.memory_queries")
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+                handler.close()
+            handler = RotatingFileHandler(query_log, maxBytes=5 * 1024 * 1024, backupCount=3, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            self._query_logger = logger
+
+        # 集合条数缓存（写入时同步更新，避免每次检索都 count()）
+        self._fact_count = self.facts.count()
+        self._conv_count = self.conversations.count()
+
+        # 说话人分区：每条记忆的元数据带 speaker（家庭成员名字或 shared），按说话人统计条数，
+        # 检索时用元数据过滤只看当前说话人和共享的记忆
+        self.speaker_partition = speaker_partition
+        self._fact_speaker_counts = {}
+        self._conv_speaker_counts = {}
+        self._fact_speakers = {}  # 事实ID -> speaker（关键词检索按说话人过滤）
+        self._speaker_registry = os.path.join(db_path, "speakers.json")  # 出现过的说话人名单
+        self._speakers = set()
+        self._load_speakers()
+
+        # 事实去重：待写入（尚未落盘）事实的 (说话人, 规范化文本)
+        self.fact_dedup_threshold = fact_dedup_threshold
+        self._pending_facts = set()
+
+        # 事实关键词索引（内存中，启动时从事实库加载，写入事实时同步更新）
+        self.keyword_search = keyword_search
+        self.keyword_short_query = keyword_short_query
+        self.keyword_min_coverage = keyword_min_coverage
+        self.keyword_index = KeywordIndex()
+        if keyword_search and self._fact_count > 0:
+            existing = self.facts.get(include=["documents"])
+            self.keyword_index.add_many(existing["ids"], existing["documents"])
+
+        # LRU 缓存：查询向量（与库内容无关，长期有效）、检索结果（写入后失效）
+        self.cache_size = cache_size
+        self._embedding_cache = OrderedDict()
+        self._result_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0  # 每次写入 +1，检索期间发生写入的结果不进缓存
+
+        # 写后队列：新记忆由后台线程批量嵌入并写入，不占用对话耗时
+        self._id_seq = 0
+        self._writer = MemoryWriter(
+            batch_size=write_batch_size,
+            flush_interval=write_flush_interval,
+            on_written=self._on_written,
+            on_failed=self._on_write_failed
         )
 
-        # 短期记忆（最近对话）
-        self.short_term = []
+        self.token_counter = token_counter or TokenCounter()
+
+        # 短期记忆（最近对话），每条在加入时记录 token 数
+        self.short_term = deque()
         self.max_short_term = 10  # 保留最近10轮对话
+        self.on_evict = None  # 淘汰旧对话时的回调 [user 条目, assistant 条目] -> None（用于滚动摘要）
 
     def _is_fact(self, text: str) -> bool:
         """判断是否包含重要事实信息"""
@@ -79,62 +223,317 @@ class Memory:
         return any(kw in text_lower for kw in self.FACT_KEYWORDS)
 
     def _estimate_tokens(self, text: str) -> int:
-        """估算文本的 token 数（中文约1.5字符/token，英文约4字符/token）"""
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
-        other_chars = len(text) - chinese_chars
-        return int(chinese_chars / 1.5 + other_chars / 4)
+        """计算文本的 token 数（默认估算：中文约1.5字符/token，英文约4字符/token）"""
+        return self.token_counter.count(text)
+
+    def add_conversation(self, user_msg: str, bot_reply: str, speaker: str = None):
+        """
+        添加一轮对话到记忆
 
-    def add_conversation(self, user_msg: str, bot_reply: str):
-        """添加一轮对话到记忆"""
+        Args:
+            user_msg: 用户说的话
+            bot_reply: 机器人回复
+            speaker: 说话人（家庭成员名字），None 表示未识别（记为共享）
+        """
         timestamp = datetime.now().isoformat()
 
         # 添加到短期记忆
         self.short_term.append({
             "role": "user",
             "content": user_msg,
-            "time": timestamp
+            "time": timestamp,
+            "tokens": self._estimate_tokens(user_msg),
+            "speaker": speaker
         })
         self.short_term.append({
             "role": "assistant",
             "content": bot_reply,
-            "time": timestamp
+            "time": timestamp,
+            "tokens": self._estimate_tokens(bot_reply)
         })
 
         # 检查是否包含重要事实，立即存入事实记忆
         if self._is_fact(user_msg):
-            self._save_fact(user_msg, timestamp)
+            self._save_fact(user_msg, timestamp, speaker)
 
         # 保持短期记忆长度
-        if len(self.short_term) > self.max_short_term * 2:
-            old_conversation = self.short_term[:2]
+        while len(self.short_term) > self.max_short_term * 2:
+            old_conversation = [self.short_term.popleft(), self.short_term.popleft()]
             self._save_to_long_term(old_conversation)
-            self.short_term = self.short_term[2:]
-
-    def _save_fact(self, content: str, timestamp: str):
-        """保存重要事实到事实记忆库"""
-        doc_id = f"fact_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
-        self.facts.add(
-            documents=[content],
-            ids=[doc_id],
-            metadatas=[{"time": timestamp, "type": self.TYPE_FACT}]
+            if self.on_evict is not None:
+                self.on_evict(old_conversation)
+
+    def _new_id(self, prefix: str) -> str:
+        """生成文档ID（批量写入时同一微秒内可能有多条，加序号防止重复）"""
+        self._id_seq += 1
+        return f"{prefix}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}_{self._id_seq}"
+
+    def _fact_owner(self, content: str, speaker: str = None) -> str:
+        """事实归属：说话人未识别或内容是全家的事（"我们家""家里"...）时为共享"""
+        if not speaker or any(kw in content for kw in self.HOUSEHOLD_KEYWORDS):
+            return self.SPEAKER_SHARED
+        return speaker
+
+    def _save_fact(self, content: str, timestamp: str, speaker: str = None):
+        """
+        保存重要事实到事实记忆库（后台批量写入；关键词索引立即可查）
+
+        近似重复的判断（嵌入 + 向量查询）在写入线程上进行，不占用对话耗时；
+        这里只挡掉完全相同、尚未落盘的事实
+        """
+        owner = self._fact_owner(content, speaker)
+        doc_id = self._new_id("fact")
+        prepare = None
+        if self.fact_dedup_threshold > 0:
+            key = normalize_text(content) or content
+            if (owner, key) in self._pending_facts:
+                return
+            self._pending_facts.add((owner, key))
+            prepare = lambda: self._dedup_fact(doc_id, content, key, timestamp, owner)
+
+        self._fact_speakers[doc_id] = owner
+        if self.keyword_search:
+            self.keyword_index.add(doc_id, content)
+            self._invalidate_results()
+        self._writer.enqueue(
+            self.facts,
+            doc_id,
+            content,
+            {"time": timestamp, "type": self.TYPE_FACT, "count": 1, "speaker": owner},
+            prepare=prepare
+        )
+
+    def _dedup_fact(self, doc_id: str, content: str, key: str, timestamp: str, owner: str):
+        """
+        写入线程上的事实去重：返回向量供写入；已合并到近似重复的事实时撤销这条，返回 None
+        """
+        # 用户原话刚检索过记忆，向量通常已在缓存里
+        embedding = self._embed_query(content, key)
+        if not self._merge_duplicate_fact(embedding, timestamp, owner):
+            return embedding
+        self._pending_facts.discard((owner, key))
+        self._forget_fact(doc_id)
+        return None
+
+    def _forget_fact(self, doc_id: str):
+        """撤销一条没有写入事实库的事实（关键词索引、说话人记录）"""
+        self._fact_speakers.pop(doc_id, None)
+        if self.keyword_search:
+            self.keyword_index.remove(doc_id)
+            self._invalidate_results()
+
+    def _merge_duplicate_fact(self, embedding, timestamp: str, owner: str = None) -> bool:
+        """已有近似重复的事实时刷新其时间并计数+1，返回是否已合并（只与同一说话人或共享的事实比较）"""
+        if self._fact_count == 0:
+            return False
+        owner = owner or self.SPEAKER_SHARED
+        where = None
+        if self.speaker_partition:
+            owners = sorted({owner, self.SPEAKER_SHARED})
+            if sum(self._fact_speaker_counts.get(o, 0) for o in owners) == 0:
+                return False
+            where = {"speaker": {"$in": owners}}
+        nearest = self.facts.query(
+            query_embeddings=[embedding],
+            n_results=1,
+            where=where,
+            include=["metadatas", "distances"]
         )
+        if not nearest['ids'] or not nearest['ids'][0]:
+            return False
+        if l2_equivalent(nearest['distances'][0][0], self._fact_space) > self.fact_dedup_threshold:
+            return False
+
+        metadata = dict(nearest['metadatas'][0][0] or {})
+        metadata["time"] = timestamp
+        metadata["count"] = metadata.get("count", 1) + 1
+        self.facts.update(ids=[nearest['ids'][0][0]], metadatas=[metadata])
+        return True
 
-    def add_fact(self, content: str):
-        """手动添加重要事实（供外部调用）"""
-        self._save_fact(content, datetime.now().isoformat())
+    def add_fact(self, content: str, speaker: str = None):
+        """手动添加重要事实（供外部调用；不指定说话人时为全家共享）"""
+        self._save_fact(content, datetime.now().isoformat(), speaker)
 
     def _save_to_long_term(self, conversation: list):
         """保存到长期对话记忆"""
         content = f"用户说：{conversation[0]['content']}\n机器人回复：{conversation[1]['content']}"
-        doc_id = f"conv_{datetime.now().strftime('%Y%m%d%H%M%S%f')}"
-
-        self.conversations.add(
-            documents=[content],
-            ids=[doc_id],
-            metadatas=[{"time": conversation[0]['time'], "type": self.TYPE_CONVERSATION}]
+        self._writer.enqueue(
+            self.conversations,
+            self._new_id("conv"),
+            content,
+            {"time": conversation[0]['time'], "type": self.TYPE_CONVERSATION,
+             "speaker": conversation[0].get("speaker") or self.SPEAKER_SHARED}
         )
 
-    def search_memory(self, query: str, n_results: int = 3, token_budget: int = 500) -> dict:
+    def _load_speakers(self):
+        """
+        启动时按说话人统计条数
+
+        按说话人名单（speakers.json）逐个用 speaker 过滤只取 id 计数，不读元数据；
+        各说话人条数之和与集合总数对不上（第一次启动、旧数据没有 speaker、离线导入了新说话人）时
+        才完整扫描一遍，并重写名单
+        """
+        try:
+            with open(self._speaker_registry, "r", encoding="utf-8") as f:
+                known = json.load(f).get("speakers", [])
+        except (OSError, ValueError):
+            known = []
+
+        for collection, counts, total in ((self.facts, self._fact_speaker_counts, self._fact_count),
+                                          (self.conversations, self._conv_speaker_counts, self._conv_count)):
+            if total == 0:
+                continue
+            for speaker in known:
+                ids = collection.get(where={"speaker": speaker}, include=[])["ids"]
+                if ids:
+                    counts[speaker] = len(ids)
+                    if collection is self.facts:
+                        self._fact_speakers.update(dict.fromkeys(ids, speaker))
+            if sum(counts.values()) != total:
+                counts.clear()
+                if collection is self.facts:
+                    self._fact_speakers.clear()
+                self._scan_speakers(collection, counts)
+
+        self._speakers = set(known) | set(self._fact_speaker_counts) | set(self._conv_speaker_counts)
+        if self._speakers != set(known):
+            self._save_speaker_registry()
+
+    def _save_speaker_registry(self, speakers: list = None):
+        """保存说话人名单（先写临时文件再替换；speakers 为调用方在锁内取的快照，默认取当前名单）"""
+        if speakers is None:
+            speakers = sorted(self._speakers)
+        tmp_path = self._speaker_registry + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"speakers": speakers}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._speaker_registry)
+
+    def _scan_speakers(self, collection, counts: dict):
+        """完整扫描集合元数据按说话人计数；旧数据没有 speaker 字段的补记为共享"""
+        existing = collection.get(include=["metadatas"])
+        missing = []
+        for doc_id, meta in zip(existing["ids"], existing["metadatas"]):
+            meta = meta or {}
+            speaker = meta.get("speaker")
+            if speaker is None:
+                speaker = self.SPEAKER_SHARED
+                missing.append((doc_id, dict(meta, speaker=speaker)))
+            counts[speaker] = counts.get(speaker, 0) + 1
+            if collection is self.facts:
+                self._fact_speakers[doc_id] = speaker
+        for i in range(0, len(missing), 500):
+            chunk = missing[i:i + 500]
+            collection.update(ids=[doc_id for doc_id, _ in chunk], metadatas=[meta for _, meta in chunk])
+        if missing:
+            print(f"[INFO] {len(missing)} 条旧记忆没有说话人，已标记为共享")
+
+    def _speaker_where(self, speaker: str = None):
+        """
+        检索的说话人过滤条件
+
+        Returns:
+            (where, 可见的说话人列表)；说话人未知或未开启分区时为 (None, None)，即全局检索
+        """
+        if not self.speaker_partition or not speaker or speaker == self.SPEAKER_SHARED:
+            return None, None
+        speakers = [speaker, self.SPEAKER_SHARED]
+        return {"speaker": {"$in": speakers}}, speakers
+
+    def _on_written(self, collection, ids: list, documents: list, metadatas: list):
+        """后台批量写入完成：更新条数缓存，检索结果缓存失效"""
+        is_fact = collection is self.facts
+        counts = self._fact_speaker_counts if is_fact else self._conv_speaker_counts
+        registry = None
+        with self._cache_lock:
+            if is_fact:
+                self._fact_count += len(ids)
+            else:
+                self._conv_count += len(ids)
+            for meta in metadatas:
+                speaker = (meta or {}).get("speaker", self.SPEAKER_SHARED)
+                counts[speaker] = counts.get(speaker, 0) + 1
+                if speaker not in self._speakers:
+                    self._speakers.add(speaker)
+                    registry = sorted(self._speakers)
+        # 出现新说话人时在锁外写名单文件，不让检索线程等 SD 卡写入
+        if registry is not None:
+            self._save_speaker_registry(registry)
+        if is_fact:
+            for document, meta in zip(documents, metadatas):
+                speaker = (meta or {}).get("speaker", self.SPEAKER_SHARED)
+                self._pending_facts.discard((speaker, normalize_text(document) or document))
+        self._invalidate_results()
+
+    def _on_write_failed(self, collection, ids: list, documents: list, metadatas: list):
+        """批次写入重试用尽被丢弃：撤销这些事实的待写记录和关键词索引（否则同样的事实再也存不进去）"""
+        if collection is not self.facts:
+            return
+        for doc_id, document, meta in zip(ids, documents, metadatas):
+            speaker = (meta or {}).get("speaker", self.SPEAKER_SHARED)
+            self._pending_facts.discard((speaker, normalize_text(document) or document))
+            self._forget_fact(doc_id)
+
+    def replace_conversations(self, old_ids: list, document: str, metadata: dict):
+        """
+        用一条摘要替换多条旧对话（记忆整理用，同步写入）
+
+        old_ids 须属于同一说话人（metadata 的 speaker）。摘要 ID 由 old_ids 决定，先写摘要再删原对话：
+        中途断电后重新整理同一批对话只会覆盖同一条摘要，不会重复，也不会丢对话
+        """
+        metadata = dict(metadata)
+        speaker = metadata.setdefault("speaker", self.SPEAKER_SHARED)
+        digest_id = "digest_" + hashlib.sha1("\n".join(sorted(old_ids)).encode("utf-8")).hexdigest()[:20]
+        existed = bool(self.conversations.get(ids=[digest_id], include=[])["ids"])
+        present = self.conversations.get(ids=old_ids, include=[])["ids"]
+        self.conversations.upsert(ids=[digest_id], documents=[document], metadatas=[metadata])
+        if present:
+            self.conversations.delete(ids=present)
+        added = (0 if existed else 1) - len(present)
+        with self._cache_lock:
+            self._conv_count += added
+            self._conv_speaker_counts[speaker] = self._conv_speaker_counts.get(speaker, 0) + added
+        self._invalidate_results()
+
+    def _invalidate_results(self):
+        """记忆内容变化：检索结果缓存失效"""
+        with self._cache_lock:
+            self._result_cache.clear()
+            self._cache_generation += 1
+
+    def flush(self, timeout: float = None) -> bool:
+        """等待排队中的记忆全部写入数据库"""
+        return self._writer.flush(timeout)
+
+    def embed(self, text: str):
+        """嵌入文本（与记忆检索共用查询向量缓存）"""
+        return self._embed_query(text, normalize_text(text) or text)
+
+    def _cache_get(self, cache: OrderedDict, key):
+        """LRU 读取（命中时移到队尾）"""
+        with self._cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _cache_put(self, cache: OrderedDict, key, value):
+        """LRU 写入（超出容量时淘汰最久未用的）"""
+        with self._cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+    def _embed_query(self, query: str, key: str):
+        """嵌入查询文本（带缓存）"""
+        embedding = self._cache_get(self._embedding_cache, key)
+        if embedding is None:
+            embedding = self.embedding_fn([query])[0]
+            self._cache_put(self._embedding_cache, key, embedding)
+        return embedding
+
+    def search_memory(self, query: str, n_results: int = 3, token_budget: int = 500,
+                      speaker: str = None) -> dict:
         """
         搜索相关记忆（带相似度过滤和 token 预算）
 
@@ -142,78 +541,173 @@ class Memory:
             query: 查询文本
             n_results: 最大返回条数
             token_budget: token 预算，超出则截断
+            speaker: 当前说话人；已识别时只检索其本人和共享的记忆，None 表示全局检索
 
         Returns:
             {"facts": [...], "conversations": [...], "total_tokens": int}
         """
+        # 同一会话内重复/仅标点不同的查询直接命中缓存
+        key = normalize_text(query) or query
+        where, speakers = self._speaker_where(speaker)
+        cache_key = (key, n_results, token_budget, tuple(speakers or ()))
+        cached = self._cache_get(self._result_cache, cache_key)
+        if cached is not None:
+            return {
+                "facts": list(cached["facts"]),
+                "conversations": list(cached["conversations"]),
+                "total_tokens": cached["total_tokens"]
+            }
+
+        generation = self._cache_generation
         result = {"facts": [], "conversations": [], "total_tokens": 0}
+        if self._fact_count == 0 and self._conv_count == 0 and len(self.keyword_index) == 0:
+            return result
+
+        # 当前说话人可见的条数（分区为空时跳过该集合的向量检索）
+        fact_count, conv_count = self._fact_count, self._conv_count
+        accept = None
+        if speakers is not None:
+            fact_count = sum(self._fact_speaker_counts.get(s, 0) for s in speakers)
+            conv_count = sum(self._conv_speaker_counts.get(s, 0) for s in speakers)
+
+            def accept(doc_id):
+                return self._fact_speakers.get(doc_id, self.SPEAKER_SHARED) in speakers
+
+        # 0. 关键词检索事实（微秒级）；短查询且强命中时直接采用，跳过嵌入和向量检索
+        keyword_hits = self.keyword_index.search(query, n_results=3, accept=accept) if self.keyword_search else []
+        if (keyword_hits and len(key) <= self.keyword_short_query
+                and keyword_hits[0]["coverage"] >= self.keyword_min_coverage):
+            for hit in keyword_hits:
+                if hit["coverage"] < self.keyword_min_coverage:
+                    break
+                tokens = self._estimate_tokens(hit["document"])
+                if result["total_tokens"] + tokens <= token_budget:
+                    result["facts"].append(hit["document"])
+                    result["total_tokens"] += tokens
+            if generation == self._cache_generation:
+                self._cache_put(self._result_cache, cache_key, result)
+            return {
+                "facts": list(result["facts"]),
+                "conversations": list(result["conversations"]),
+                "total_tokens": result["total_tokens"]
+            }
 
-        # 1. 优先搜索事实记忆（重要信息）
-        if self.facts.count() > 0:
+        # 查询文本只嵌入一次，两个集合共用
+        query_embedding = self._embed_query(query, key)
+        if self._query_logger is not None:
+            self._query_logger.info(json.dumps({"time": datetime.now().isoformat(), "query": query,
+                                                "n_results": n_results}, ensure_ascii=False))
+
+        # 1. 优先搜索事实记忆（重要信息），向量结果与关键词结果按排名融合
+        #    （只命中单字的关键词结果不参与融合，避免"的""天"之类的常见字带入无关事实）
+        keyword_hits = [hit for hit in keyword_hits if hit["coverage"] > 0]
+        fact_docs = {hit["id"]: hit["document"] for hit in keyword_hits}
+        vector_ids = []
+        if fact_count > 0:
             fact_results = self.facts.query(
-                query_texts=[query],
-                n_results=min(3, self.facts.count()),
+                query_embeddings=[query_embedding],
+                n_results=min(3, fact_count),
+                where=where,
                 include=["documents", "distances"]
             )
 
             if fact_results['documents'] and fact_results['documents'][0]:
-                for doc, dist in zip(fact_results['documents'][0], fact_results['distances'][0]):
-                    if dist < self.similarity_threshold:
-                        tokens = self._estimate_tokens(doc)
-                        if result["total_tokens"] + tokens <= token_budget:
-                            result["facts"].append(doc)
-                            result["total_tokens"] += tokens
+                for doc_id, doc, dist in zip(fact_results['ids'][0], fact_results['documents'][0],
+                                             fact_results['distances'][0]):
+                    if l2_equivalent(dist, self._fact_space) < self.similarity_threshold:
+                        vector_ids.append(doc_id)
+                        fact_docs[doc_id] = doc
+
+        fused_ids = reciprocal_rank_fusion([vector_ids, [hit["id"] for hit in keyword_hits]])
+        for doc_id in fused_ids[:3]:
+            doc = fact_docs[doc_id]
+            tokens = self._estimate_tokens(doc)
+            if result["total_tokens"] + tokens <= token_budget:
+                result["facts"].append(doc)
+                result["total_tokens"] += tokens
 
         # 2. 搜索对话记忆
-        if self.conversations.count() > 0:
+        if conv_count > 0:
             conv_results = self.conversations.query(
-                query_texts=[query],
-                n_results=min(n_results, self.conversations.count()),
+                query_embeddings=[query_embedding],
+                n_results=min(n_results, conv_count),
+                where=where,
                 include=["documents", "distances"]
             )
 
             if conv_results['documents'] and conv_results['documents'][0]:
                 for doc, dist in zip(conv_results['documents'][0], conv_results['distances'][0]):
                     # 相似度过滤
-                    if dist < self.similarity_threshold:
+                    if l2_equivalent(dist, self._conv_space) < self.similarity_threshold:
                         tokens = self._estimate_tokens(doc)
                         if result["total_tokens"] + tokens <= token_budget:
                             result["conversations"].append(doc)
                             result["total_tokens"] += tokens
 
-        return result
+        if generation == self._cache_generation:
+            self._cache_put(self._result_cache, cache_key, result)
+        return {
+            "facts": list(result["facts"]),
+            "conversations": list(result["conversations"]),
+            "total_tokens": result["total_tokens"]
+        }
 
     def get_short_term(self, token_budget: int = 800) -> list:
         """获取短期记忆（带 token 预算控制）"""
         if not self.short_term:
             return []
 
-        # 从最新的开始，倒序添加直到超出预算
+        # 从最新的开始，倒序添加直到超出预算（token 数在加入时已算好）
         result = []
         total_tokens = 0
 
         for msg in reversed(self.short_term):
-            tokens = self._estimate_tokens(msg["content"])
+            tokens = msg["tokens"]
             if total_tokens + tokens > token_budget:
                 break
-            result.insert(0, msg)
+            result.append(msg)
             total_tokens += tokens
 
+        result.reverse()
         return result
 
-    def save_remaining(self):
-        """保存剩余的短期记忆"""
+    def save_remaining(self) -> bool:
+        """
+        保存剩余的短期记忆，并等待所有排队中的记忆写入完成
+
+        Returns:
+            是否全部写入成功
+        """
         while len(self.short_term) >= 2:
-            old_conversation = self.short_term[:2]
+            old_conversation = [self.short_term.popleft(), self.short_term.popleft()]
             self._save_to_long_term(old_conversation)
-            self.short_term = self.short_term[2:]
+        if not self._writer.flush():
+            print("[ERROR] 部分记忆未能写入数据库")
+            return False
+        return True
+
+    def warm_up(self) -> dict:
+        """
+        预热检索路径：加载嵌入模型并完成一次推理，各集合各查询一次（加载向量索引）
+
+        Returns:
+            {"embed_ms", "query_ms"}
+        """
+        t0 = time.perf_counter()
+        embedding = self.embedding_fn(["你好"])[0]
+        t1 = time.perf_counter()
+        for collection, count in ((self.facts, self._fact_count), (self.conversations, self._conv_count)):
+            if count > 0:
+                collection.query(query_embeddings=[embedding], n_results=1, include=[])
+        t2 = time.perf_counter()
+        return {"embed_ms": (t1 - t0) * 1000, "query_ms": (t2 - t1) * 1000}
 
     def get_stats(self) -> dict:
         """获取记忆统计信息"""
         return {
             "short_term_count": len(self.short_term) // 2,
-            "conversation_count": self.conversations.count(),
-            "fact_count": self.facts.count()
+            "conversation_count": self._conv_count,
+            "fact_count": self._fact_count
         }
 
 
@@ -223,6 +717,10 @@ class Persona:
     def __init__(self, config_path="config/persona.json"):
         self.config_path = config_path
         self.persona = self._load_or_create()
+
+        # 编译好的系统提示词缓存（persona.json 修改时间变化时失效）
+        self._prompt_cache = None
+        self._prompt_mtime = self._get_mtime()
     
     def _load_or_create(self) -> dict:
         """加载或创建默认人格"""
@@ -249,7 +747,26 @@ class Persona:
         
         return default
     
+    def _get_mtime(self):
+        """获取配置文件修改时间（文件不存在返回 None）"""
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
     def get_system_prompt(self) -> str:
+        """获取系统提示词（编译一次后复用，配置文件被修改时重新加载）"""
+        mtime = self._get_mtime()
+        if mtime != self._prompt_mtime:
+            self.persona = self._load_or_create()
+            self._prompt_mtime = mtime
+            self._prompt_cache = None
+
+        if self._prompt_cache is None:
+            self._prompt_cache = self._compile_system_prompt()
+        return self._prompt_cache
+
+    def _compile_system_prompt(self) -> str:
         """生成系统提示词"""
         p = self.persona
 
@@ -323,24 +840,32 @@ class Persona:
         self.persona['owner']['name'] = name
         with open(self.config_path, 'w', encoding='utf-8') as f:
             json.dump(self.persona, f, ensure_ascii=False, indent=2)
+        self._prompt_cache = None
 
 
 class Brain:
     """AI大脑 - 整合对话、记忆、人格（支持多后端）"""
 
+    # 记忆上下文末尾的提示语
+    MEMORY_HINT = "\n\n(请参考以上记忆回答，如包含答案请直接使用)"
+
     # 后端类型
     BACKEND_OLLAMA = "ollama"
     BACKEND_DEEPSEEK = "deepseek"
     BACKEND_OPENAI = "openai"
     BACKEND_DOUBAO = "doubao"
 
+    # 路由中本地降级后端的名字
+    LOCAL_ROUTE = "local"
+
     def __init__(
         self,
         backend: str = "ollama",
         model: str = None,
         api_key: str = None,
         api_base: str = None,
-        fallback_to_local: bool = True
+        fallback_to_local: bool = True,
+        config: dict = None
     ):
         """
         初始化 AI 大脑
@@ -351,11 +876,37 @@ class Brain:
             api_key: API 密钥（deepseek/openai 需要）
             api_base: API 地址（可选，用于自定义端点）
             fallback_to_local: API 失败时是否降级到本地 Ollama
+            config: 完整的 api.json 配置（可选，用于超时等高级设置）
         """
+        self.config = config or {}
         self.backend = backend
         self.fallback_to_local = fallback_to_local
         self.api_key = api_key
         self.client = None
+        self.async_client = None
+        self.transport = None  # 云端后端共用的 HTTP 连接池（Ollama 后端为 None）
+
+        # 超时（秒）：请求总超时 / 流式输出中两个 token 之间的最长等待
+        self.timeout = self.config.get("timeout", 20)
+        self.stream_timeout = self.config.get("stream_timeout", 10)
+
+        # 本地降级模型
+        ollama_config = self.config.get("ollama", {})
+        self.local_model = ollama_config.get("model", "qwen2:0.5b")
+
+        # Ollama 常驻：keep_alive（-1 表示一直驻留内存）；num_keep 为上下文滑动时保留的前缀 token 数，
+        # "auto" 表示按人格提示词长度设置，保证人格前缀不被挤出
+        self.keep_alive = ollama_config.get("keep_alive", -1)
+        self.ollama_options = {}
+        if ollama_config.get("num_ctx"):
+            self.ollama_options["num_ctx"] = ollama_config["num_ctx"]
+        self._num_keep = ollama_config.get("num_keep", "auto")
+        if isinstance(self._num_keep, int):
+            self.ollama_options["num_keep"] = self._num_keep
+        self._local_async_client = None
+
+        # 记忆读写在单独的线程里串行执行，异步接口不阻塞事件循环
+        self._memory_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory")
 
         # 根据后端设置默认模型
         if model is None:
@@ -372,9 +923,125 @@ class Brain:
         # 初始化客户端
         self._init_client(api_base)
 
+        # 后端路由：熔断 + 延迟统计 + 首 token 截止时间（可选对冲到本地模型）
+        router_config = self.config.get("router", {})
+        can_fallback = fallback_to_local and backend != self.BACKEND_OLLAMA
+        self.router = BackendRouter(
+            backend,
+            self.LOCAL_ROUTE if can_fallback else None,
+            first_token_deadline=router_config.get("first_token_deadline", 3.0),
+            min_deadline=router_config.get("min_deadline", 1.0),
+            hedge=router_config.get("hedge", False),
+            failure_threshold=router_config.get("failure_threshold", 3),
+            open_seconds=router_config.get("open_seconds", 30)
+        )
+        # 后台任务（滚动摘要、记忆整理）单独一套熔断器：慢速的后台请求失败不会让对话熔断
+        self.background_router = BackendRouter(
+            backend,
+            self.LOCAL_ROUTE if can_fallback else None,
+            failure_threshold=router_config.get("failure_threshold", 3),
+            open_seconds=router_config.get("open_seconds", 30)
+        )
+
         # 初始化记忆和人格
-        self.memory = Memory()
+        # 上下文预算：可选真实分词器，人格 + 记忆 + 短期对话共用一个总预算
+        context_config = self.config.get("context", {})
+        self.token_counter = TokenCounter(context_config.get("tokenizer"))
+        self.context_packer = ContextPacker(
+            self.token_counter,
+            total_budget=context_config.get("total_budget", 3000)
+        )
+
+        memory_config = self.config.get("memory", {})
+        self.memory = Memory(
+            db_path=memory_config.get("db_path", "data/memory"),
+            similarity_threshold=memory_config.get("similarity_threshold", 2.0),
+            cache_size=memory_config.get("cache_size", 128),
+            write_batch_size=memory_config.get("write_batch_size", 16),
+            write_flush_interval=memory_config.get("write_flush_interval", 2.0),
+            token_counter=self.token_counter,
+            keyword_search=memory_config.get("keyword_search", True),
+            keyword_short_query=memory_config.get("keyword_short_query", 12),
+            keyword_min_coverage=memory_config.get("keyword_min_coverage", 0.6),
+            fact_dedup_threshold=memory_config.get("fact_dedup_threshold", 0.1),
+            store=memory_config.get("store", "chroma"),
+            index=memory_config.get("index"),
+            query_log=memory_config.get("query_log"),
+            speaker_partition=memory_config.get("speaker_partition", True),
+            embedding=memory_config.get("embedding", "default")
+        )
         self.persona = Persona()
+        self.prompt_builder = PromptBuilder(self.persona, self.token_counter.count)
+
+        # 滚动摘要：挤出短期记忆的旧对话在后台合并成摘要，长对话的提示词长度保持有界
+        summary_config = context_config.get("summary", {})
+        self.rolling_summary = None
+        self._summary_executor = None
+        if summary_config.get("enabled", True):
+            self.rolling_summary = RollingSummary(
+                self._fold_summary,
+                self.token_counter.count,
+                max_tokens=summary_config.get("max_tokens", 200),
+                batch_turns=summary_config.get("batch_turns", 2)
+            )
+            self._summary_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+            self.memory.on_evict = self._on_short_term_evicted
+        # 最近一轮对话的 token 用量（每次请求各用一份 stats，后台摘要 / 记忆整理不写入）
+        self.last_usage = {}
+        # 最近一轮各阶段耗时（秒）：memory_search / prompt_build / api_first_token / api_total / memory_write
+        self.last_timings = {}
+        # 语音对话的每轮延迟追踪（未启用时打点为空操作）
+        self.tracer = get_tracer()
+
+        # 语义回复缓存（问候/告别/自我介绍等高频意图，默认关闭）
+        cache_config = self.config.get("response_cache", {})
+        self.response_cache = None
+        if cache_config.get("enabled", False):
+            self.response_cache = ResponseCache(
+                self.memory.embed,
+                intents=cache_config.get("intents"),
+                threshold=cache_config.get("threshold", 0.95),
+                intent_threshold=cache_config.get("intent_threshold", 0.85),
+                ttl=cache_config.get("ttl", 3600),
+                max_size=cache_config.get("max_size", 256)
+            )
+
+        # 空闲时整理长期记忆（旧对话聚类压缩成摘要）
+        self._last_activity = time.monotonic()
+        consolidation_config = self.config.get("consolidation", {})
+        self.consolidation_idle = consolidation_config.get("idle_seconds", 600)
+        self.consolidation_interval = consolidation_config.get("check_interval", 1800)
+        self.consolidator = MemoryConsolidator(
+            self.memory,
+            self._summarize_conversations,
+            min_age_days=consolidation_config.get("min_age_days", 7),
+            max_documents=consolidation_config.get("max_documents", 2000),
+            window_hours=consolidation_config.get("window_hours", 24),
+            topic_similarity=consolidation_config.get("topic_similarity", 0.6),
+            max_cluster_size=consolidation_config.get("max_cluster_size", 8),
+            page_size=consolidation_config.get("page_size", 500),
+            max_plan_size=consolidation_config.get("max_plan_size", 1000)
+        )
+        self._consolidation_stop = threading.Event()
+        if consolidation_config.get("enabled", False):
+            threading.Thread(
+                target=self._consolidation_loop, name="memory-consolidation", daemon=True
+            ).start()
+
+        # 推测式记忆检索（ASR 中间结果驱动）
+        spec_config = self.config.get("speculative_retrieval", {})
+        self.speculative_enabled = spec_config.get("enabled", True)
+        self._last_speaker = None  # 推测检索时说话人还没识别出来，按上一轮的说话人检索
+        self.speculative = SpeculativeRetriever(
+            lambda query: self._search_memory(query, debug=False, speaker=self._last_speaker),
+            self._memory_executor,
+            min_chars=spec_config.get("min_chars", 4),
+            reuse_ratio=spec_config.get("reuse_ratio", 0.8)
+        )
+
+        # 后台预加载本地模型并预填充人格前缀（启动不等待）
+        if ollama_config.get("preload", True) and self._warm_model():
+            threading.Thread(target=self._warm_up_safe, name="ollama-warmup", daemon=True).start()
 
         print(f"🧠 AI大脑初始化完成")
         print(f"   后端: {backend}")
@@ -384,176 +1051,861 @@ class Brain:
         print(f"   记忆: {stats['fact_count']}条事实, {stats['conversation_count']}条对话")
 
     def _init_client(self, api_base: str = None):
-        """初始化 API 客户端"""
+        """初始化 API 客户端（同步 + 异步）"""
         if self.backend == self.BACKEND_OLLAMA:
             self.client = get_ollama()
-        elif self.backend == self.BACKEND_DEEPSEEK:
-            OpenAI = get_openai()
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url=api_base or "https://api.deepseek.com/v1"
-            )
-        elif self.backend == self.BACKEND_OPENAI:
-            OpenAI = get_openai()
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url=api_base
-            )
+            self.async_client = get_ollama().AsyncClient(timeout=self.timeout)
+            return
+
+        if self.backend == self.BACKEND_DEEPSEEK:
+            base_url = api_base or "https://api.deepseek.com/v1"
         elif self.backend == self.BACKEND_DOUBAO:
-            OpenAI = get_openai()
-            self.client = OpenAI(
-                api_key=self.api_key,
-                base_url=api_base or "https://ark.cn-beijing.volces.com/api/v3"
-            )
+            base_url = api_base or "https://ark.cn-beijing.volces.com/api/v3"
+        else:
+            base_url = api_base
+
+        # 同步/异步客户端共用一个显式配置的连接池（长连接、HTTP/2、建连超时、空闲保活）
+        from src.brain.transport import HTTPTransport
+        http_config = self.config.get("http", {})
+        self.transport = HTTPTransport(
+            base_url,
+            timeout=self.timeout,
+            connect_timeout=http_config.get("connect_timeout", 5),
+            http2=http_config.get("http2", True),
+            max_connections=http_config.get("max_connections", 10),
+            max_keepalive=http_config.get("max_keepalive", 5),
+            keepalive_expiry=http_config.get("keepalive_expiry", 120),
+            keep_warm_interval=http_config.get("keep_warm_interval", 60)
+        )
 
-    def _call_api(self, messages: list) -> str:
-        """调用 API 获取回复"""
+        OpenAI = get_openai()
+        self.client = OpenAI(
+            api_key=self.api_key,
+            base_url=base_url,
+            timeout=self.timeout,
+            http_client=self.transport.client
+        )
+        AsyncOpenAI = get_async_openai()
+        self.async_client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=base_url,
+            timeout=self.timeout,
+            http_client=self.transport.async_client
+        )
+
+    def _ollama_kwargs(self, **options) -> dict:
+        """Ollama 请求的公共参数（keep_alive 常驻 + num_ctx/num_keep 等选项）"""
+        merged = dict(self.ollama_options)
+        merged.update(options)
+        kwargs = {"keep_alive": self.keep_alive}
+        if merged:
+            kwargs["options"] = merged
+        return kwargs
+
+    def _warm_model(self) -> str:
+        """需要预热的本地模型（Ollama 为主后端，或启用了本地降级）"""
         if self.backend == self.BACKEND_OLLAMA:
-            response = self.client.chat(model=self.model, messages=messages)
+            return self.model
+        if self.router.fallback:
+            return self.local_model
+        return None
+
+    def warm_up_local(self) -> dict:
+        """
+        预加载本地模型并预填充人格前缀
+
+        Ollama 会保留最近一次请求的 KV 缓存，之后前缀相同的请求（人格提示词在最前面，
+        见 PromptBuilder）只需计算变化的部分。
+
+        Returns:
+            {"model", "load_ms", "prefill_tokens", "prefill_ms"}
+        """
+        model = self._warm_model()
+        if model is None:
+            return {}
+        client = get_ollama()
+
+        # 空 prompt 只加载模型
+        loaded = client.generate(model=model, prompt="", keep_alive=self.keep_alive)
+
+        system_prompt = self.persona.get_system_prompt()
+        if self._num_keep == "auto":
+            self.ollama_options["num_keep"] = self.token_counter.count(system_prompt)
+        prefilled = client.chat(
+            model=model,
+            messages=[{"role": "system", "content": system_prompt}],
+            **self._ollama_kwargs(num_predict=1)
+        )
+
+        report = {
+            "model": model,
+            "load_ms": (loaded.get("load_duration") or 0) / 1e6,
+            "prefill_tokens": prefilled.get("prompt_eval_count"),
+            "prefill_ms": (prefilled.get("prompt_eval_duration") or 0) / 1e6
+        }
+        print(f"🔥 本地模型 {model} 已预热: 加载 {report['load_ms']:.0f}ms, "
+              f"人格前缀 {report['prefill_tokens']} tokens 预填充 {report['prefill_ms']:.0f}ms")
+        return report
+
+    def _warm_up_safe(self):
+        try:
+            self.warm_up_local()
+        except Exception as e:
+            print(f"[WARN] 本地模型预热失败: {e!r}")
+
+    def _call_api(self, messages: list, temperature: float = 0.7, max_tokens: int = 500, stats: dict = None) -> str:
+        """调用 API 获取回复（stats 不为 None 时写入本次请求的 token 用量）"""
+        if self.backend == self.BACKEND_OLLAMA:
+            response = self.client.chat(model=self.model, messages=messages, **self._ollama_kwargs())
+            self._record_ollama_usage(response, stats)
             return response['message']['content']
         else:
             # OpenAI 兼容接口（DeepSeek / OpenAI）
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                temperature=0.7,
-                max_tokens=500
+                temperature=temperature,
+                max_tokens=max_tokens
             )
+            self._record_usage(response.usage, stats)
             return response.choices[0].message.content
 
-    def chat(self, user_input: str, speaker: str = None, debug: bool = True) -> str:
-        """
-        与用户对话
+    def _call_api_stream(self, messages: list, stats: dict = None):
+        """流式调用 API，逐段 yield 文本 token"""
+        if self.backend == self.BACKEND_OLLAMA:
+            for part in self.client.chat(model=self.model, messages=messages, stream=True,
+                                         **self._ollama_kwargs()):
+                if part.get('done'):
+                    self._record_ollama_usage(part, stats)
+                content = part['message']['content']
+                if content:
+                    yield content
+        else:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=500,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            for chunk in stream:
+                if chunk.usage:
+                    self._record_usage(chunk.usage, stats)
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    yield content
+
+    def _call_local(self, messages: list, stats: dict = None) -> str:
+        """调用本地 Ollama（降级用）"""
+        response = get_ollama().chat(model=self.local_model, messages=messages, **self._ollama_kwargs())
+        self._record_ollama_usage(response, stats)
+        return response['message']['content']
+
+    def _local_stream(self, messages: list, stats: dict = None):
+        """流式调用本地 Ollama（降级用）"""
+        for part in get_ollama().chat(model=self.local_model, messages=messages, stream=True,
+                                      **self._ollama_kwargs()):
+            if part.get('done'):
+                self._record_ollama_usage(part, stats)
+            content = part['message']['content']
+            if content:
+                yield content
+
+    def _memory_speaker(self, speaker: str = None) -> str:
+        """记忆中使用的说话人名字（声纹识别结果映射到家庭成员的真实名字），未识别时为 None"""
+        return self._resolve_speaker(speaker)[0] if speaker else None
+
+    def _search_memory(self, user_input: str, debug: bool = True, speaker: str = None) -> dict:
+        """搜索相关记忆（带相似度过滤；已识别说话人时只检索其本人和共享的记忆）"""
+        t0 = time.time()
+        memory_result = self.memory.search_memory(
+            user_input, n_results=15, token_budget=self.context_packer.total_budget,
+            speaker=self._memory_speaker(speaker)
+        )
+        memory_result["speaker"] = speaker
+        t1 = time.time()
 
-        Args:
-            user_input: 用户输入
-            speaker: 说话人名字（声纹识别结果），None 表示未识别
-            debug: 是否打印调试信息
-        """
-        # 构建消息列表
-        messages = []
+        if debug:
+            print(f"\n[DEBUG] 记忆搜索耗时: {t1 - t0:.2f}s")
+            print(f"[DEBUG] 召回: {len(memory_result['facts'])}条事实, {len(memory_result['conversations'])}条对话 (~{memory_result['total_tokens']} tokens)")
+        return memory_result
 
-        # 1. 系统提示（人格）
-        messages.append({
-            "role": "system",
-            "content": self.persona.get_system_prompt()
-        })
+    def _build_messages(self, user_input: str, speaker: str = None, memory_result: dict = None,
+                        debug: bool = True) -> list:
+        """
+        构建本轮对话的消息列表
 
-        # 1.5. 添加当前日期时间信息
+        顺序：人格 → 短期对话 → 本轮动态上下文（记忆/时间/说话人）→ 用户输入，
+        每轮只有末尾部分变化，前缀可被服务端缓存复用（见 PromptBuilder）。
+        """
+        self._last_activity = time.monotonic()
+        if memory_result is None:
+            t0 = time.perf_counter()
+            memory_result = self._search_memory(user_input, debug, speaker)
+            self.last_timings["memory_search"] = time.perf_counter() - t0
+        t_build = time.perf_counter()
+
+        # 1. 当前日期时间信息（每分钟都在变，必须放在稳定前缀之后）
         current_time = datetime.now()
         weekdays = ['星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日']
         weekday = weekdays[current_time.weekday()]
-        messages.append({
-            "role": "system",
-            "content": f"【当前时间】\n今天是 {current_time.strftime('%Y年%m月%d日')} {weekday}，现在是 {current_time.strftime('%H:%M')}"
-        })
-
-        # 2. 搜索相关记忆（带相似度过滤）
-        t0 = time.time()
-        memory_result = self.memory.search_memory(user_input, n_results=15, token_budget=2000)
-        t1 = time.time()
+        time_part = f"【当前时间】\n今天是 {current_time.strftime('%Y年%m月%d日')} {weekday}，现在是 {current_time.strftime('%H:%M')}"
 
-        if debug:
-            print(f"\n[DEBUG] 记忆搜索耗时: {t1 - t0:.2f}s")
-            print(f"[DEBUG] 召回: {len(memory_result['facts'])}条事实, {len(memory_result['conversations'])}条对话 (~{memory_result['total_tokens']} tokens)")
+        # 2. 如果有声纹识别结果，告知模型当前对话者
+        speaker_part = ""
+        if speaker:
+            speaker_real_name, speaker_nickname = self._resolve_speaker(speaker)
+            speaker_part = f"【当前对话者】\n正在和你说话的是：{speaker_real_name}（你称呼他/她为「{speaker_nickname}」）"
+
+        # 3. 之前对话的滚动摘要（有上限，和人格一样必留）
+        summary_part = ""
+        if self.rolling_summary is not None and self.rolling_summary.text:
+            summary_part = f"【之前的对话摘要】\n{self.rolling_summary.text}"
+
+        # 4. 全局 token 预算：人格/摘要/时间/说话人/用户输入必留，其余按 事实 → 短期对话 → 历史对话 分配
+        packed = self.context_packer.pack(
+            [self.persona.get_system_prompt(), summary_part, user_input, time_part, speaker_part, self.MEMORY_HINT],
+            memory_result['facts'],
+            self.memory.short_term,
+            memory_result['conversations']
+        )
+        short_term = packed['short_term']
 
-        # 构建记忆上下文
+        # 5. 相关记忆上下文
         memory_parts = []
-        if memory_result['facts']:
-            memory_parts.append("【重要信息】\n" + "\n".join(f"- {f}" for f in memory_result['facts']))
-        if memory_result['conversations']:
-            memory_parts.append("【相关历史】\n" + "\n---\n".join(memory_result['conversations']))
+        if packed['facts']:
+            memory_parts.append("【重要信息】\n" + "\n".join(f"- {f}" for f in packed['facts']))
+        if packed['conversations']:
+            memory_parts.append("【相关历史】\n" + "\n---\n".join(packed['conversations']))
 
+        dynamic_parts = []
         if memory_parts:
-            messages.append({
-                "role": "system",
-                "content": "\n\n".join(memory_parts) + "\n\n(请参考以上记忆回答，如包含答案请直接使用)"
-            })
-
-        # 3. 短期记忆（最近对话，带 token 控制）
-        short_term = self.memory.get_short_term(token_budget=800)
-        for msg in short_term:
-            messages.append({
-                "role": msg["role"],
-                "content": msg["content"]
-            })
-
-        # 4. 当前用户输入
-        # 如果有声纹识别结果，通过 system 消息告知模型
-        if speaker:
-            # 查找说话人的真实姓名和称呼
-            speaker_real_name = speaker  # 默认用识别到的名字
-            speaker_nickname = speaker
-            speaker_lower = speaker.lower()
-
-            # 检查是否是 owner
-            owner = self.persona.persona.get('owner', {})
-            owner_name = owner.get('name', '')
-            if owner_name and (owner_name in speaker or speaker in owner_name or
-                               owner_name.lower() in speaker_lower):
-                speaker_real_name = owner_name
-                speaker_nickname = owner.get('role', speaker_real_name)
-
-            # 检查是否是家庭成员（通过名字或昵称匹配）
-            for member in self.persona.persona.get('family_members', []):
-                member_name = member.get('name', '')
-                member_nickname = member.get('nickname', '')
-                member_role = member.get('role', '')
-
-                # 多种匹配方式：名字、昵称、角色
-                if (member_name and (member_name in speaker or speaker in member_name)) or \
-                   (member_nickname and member_nickname in speaker) or \
-                   (member_role and member_role in speaker):
-                    speaker_real_name = member_name
-                    speaker_nickname = member.get('nickname', member_role)
-                    break
+            dynamic_parts.append("\n\n".join(memory_parts) + self.MEMORY_HINT)
+        dynamic_parts.append(time_part)
+        dynamic_parts.append(speaker_part)
 
-            messages.append({
-                "role": "system",
-                "content": f"【当前对话者】\n正在和你说话的是：{speaker_real_name}（你称呼他/她为「{speaker_nickname}」）"
-            })
+        messages = self.prompt_builder.build(short_term, dynamic_parts, user_input, summary_part)
+        self.last_timings["prompt_build"] = time.perf_counter() - t_build
 
         if debug:
+            stats = self.prompt_builder.last_stats
             print(f"[DEBUG] 说话人: {speaker if speaker else '未识别'}")
-            print(f"[DEBUG] 上下文: {len(short_term)//2}轮对话")
+            print(f"[DEBUG] 上下文: {len(short_term)//2}轮对话, 预算 {packed['used_tokens']}/{packed['budget']} tokens")
+            if summary_part:
+                summary_stats = self.rolling_summary.stats()
+                print(f"[DEBUG] 对话摘要: ~{summary_stats['tokens']} tokens（已合并 {summary_stats['folded_turns']} 轮，"
+                      f"待合并 {summary_stats['pending_turns']} 轮）")
+            print(f"[DEBUG] 提示词: ~{stats['prompt_tokens_estimate']} tokens, "
+                  f"可复用前缀 ~{stats['reusable_prefix_tokens']} tokens (人格 ~{stats['static_prefix_tokens']})")
+        return messages
+
+    def _record_usage(self, usage, stats: dict):
+        """
+        把 OpenAI 兼容接口返回的 token 用量（含命中 prompt cache 的 token 数）写入 stats
 
-        messages.append({
-            "role": "user",
-            "content": user_input
+        兼容 OpenAI (prompt_tokens_details.cached_tokens) 和
+        DeepSeek (prompt_cache_hit_tokens) 的字段。
+        stats 由每次调用自己传入（后台摘要等请求传 None），并发请求不会互相覆盖。
+        """
+        if usage is None or stats is None:
+            return
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        if cached is None and details is not None:
+            cached = getattr(details, "cached_tokens", None)
+        stats.update({
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "cached_tokens": cached,
+            "prompt_eval_tokens": None,
+            "completion_tokens": getattr(usage, "completion_tokens", None),
         })
 
-        # 5. 调用模型
+    def _record_ollama_usage(self, response, stats: dict):
+        """
+        把 Ollama 返回的用量写入 stats
+
+        prompt_eval_count 是实际重新计算的 prompt token 数（命中 KV 缓存的前缀不计），
+        load_duration / prompt_eval_duration 分别是模型加载和 prompt 预填充耗时（纳秒）。
+        """
+        if stats is None:
+            return
+        load = response.get("load_duration")
+        prefill = response.get("prompt_eval_duration")
+        stats.update({
+            "prompt_tokens": None,
+            "cached_tokens": None,
+            "prompt_eval_tokens": response.get("prompt_eval_count"),
+            "completion_tokens": response.get("eval_count"),
+            "load_ms": load / 1e6 if load is not None else None,
+            "prefill_ms": prefill / 1e6 if prefill is not None else None,
+        })
+
+    def _print_usage(self, usage: dict):
+        """打印一次请求的 token 用量"""
+        if not usage:
+            return
+        if usage["prompt_eval_tokens"] is not None:
+            print(f"[DEBUG] Ollama 重新计算 prompt: {usage['prompt_eval_tokens']} tokens")
+            if usage.get("prefill_ms") is not None:
+                print(f"[DEBUG] Ollama 模型加载 {usage['load_ms'] or 0:.0f}ms, 预填充 {usage['prefill_ms']:.0f}ms")
+        elif usage["prompt_tokens"] is not None:
+            print(f"[DEBUG] 输入 {usage['prompt_tokens']} tokens, 命中缓存 {usage['cached_tokens'] or 0} tokens")
+
+    def _resolve_speaker(self, speaker: str) -> tuple:
+        """根据声纹识别结果查找说话人的真实姓名和称呼"""
+        speaker_real_name = speaker  # 默认用识别到的名字
+        speaker_nickname = speaker
+        speaker_lower = speaker.lower()
+
+        # 检查是否是 owner
+        owner = self.persona.persona.get('owner', {})
+        owner_name = owner.get('name', '')
+        if owner_name and (owner_name in speaker or speaker in owner_name or
+                           owner_name.lower() in speaker_lower):
+            speaker_real_name = owner_name
+            speaker_nickname = owner.get('role', speaker_real_name)
+
+        # 检查是否是家庭成员（通过名字或昵称匹配）
+        for member in self.persona.persona.get('family_members', []):
+            member_name = member.get('name', '')
+            member_nickname = member.get('nickname', '')
+            member_role = member.get('role', '')
+
+            # 多种匹配方式：名字、昵称、角色
+            if (member_name and (member_name in speaker or speaker in member_name)) or \
+               (member_nickname and member_nickname in speaker) or \
+               (member_role and member_role in speaker):
+                speaker_real_name = member_name
+                speaker_nickname = member.get('nickname', member_role)
+                break
+
+        return speaker_real_name, speaker_nickname
+
+    def _lookup_response_cache(self, user_input: str, speaker: str = None, debug: bool = True) -> str:
+        """查语义回复缓存，未启用或未命中返回 None"""
+        if self.response_cache is None:
+            return None
+        self._last_activity = time.monotonic()
+        t0 = time.time()
+        reply = self.response_cache.lookup(user_input, speaker)
+        if debug and reply is not None:
+            print(f"\n[DEBUG] 回复缓存命中 ({(time.time() - t0) * 1000:.1f}ms)")
+        return reply
+
+    def _store_response_cache(self, user_input: str, speaker: str, reply: str):
+        """把模型正常生成的完整回复写入语义回复缓存"""
+        if self.response_cache is not None:
+            self.response_cache.store(user_input, speaker, reply)
+
+    def chat(self, user_input: str, speaker: str = None, debug: bool = True) -> str:
+        """
+        与用户对话
+
+        Args:
+            user_input: 用户输入
+            speaker: 说话人名字（声纹识别结果），None 表示未识别
+            debug: 是否打印调试信息
+        """
+        self.last_timings = {}
+        cached = self._lookup_response_cache(user_input, speaker, debug)
+        if cached is not None:
+            self.memory.add_conversation(user_input, cached, self._memory_speaker(speaker))
+            return cached
+
+        messages = self._build_messages(user_input, speaker, debug=debug)
+
+        # 6. 调用模型
         if debug:
             print(f"[DEBUG] 正在思考... ({self.backend}/{self.model})")
 
+        stats = {}
+        route = None
         t2 = time.time()
         try:
-            reply = self._call_api(messages)
+            route, reply = self.router.call(
+                lambda: self._call_api(messages, stats=stats),
+                lambda: self._call_local(messages, stats=stats)
+            )
+            if route == self.backend:
+                self._store_response_cache(user_input, speaker, reply)
         except Exception as e:
             print(f"[ERROR] API 调用失败: {e}")
-            if self.fallback_to_local and self.backend != self.BACKEND_OLLAMA:
-                print("[INFO] 降级到本地 Ollama...")
-                try:
-                    local_client = get_ollama()
-                    response = local_client.chat(model="qwen2:0.5b", messages=messages)
-                    reply = response['message']['content']
-                except Exception as e2:
-                    reply = f"抱歉，我现在无法回答。({e2})"
-            else:
-                reply = f"抱歉，我现在无法回答。({e})"
+            reply = f"抱歉，我现在无法回答。({e})"
 
         t3 = time.time()
+        self.last_timings["api_total"] = t3 - t2
+        self.last_usage = stats
         if debug:
-            print(f"[DEBUG] 模型推理耗时: {t3 - t2:.2f}s")
+            print(f"[DEBUG] 模型推理耗时: {t3 - t2:.2f}s ({route})")
+            self._print_usage(stats)
 
         # 保存到记忆
-        self.memory.add_conversation(user_input, reply)
+        t4 = time.perf_counter()
+        self.memory.add_conversation(user_input, reply, self._memory_speaker(speaker))
+        self.last_timings["memory_write"] = time.perf_counter() - t4
 
         return reply
 
-    def add_fact(self, fact: str):
-        """手动添加重要事实"""
-        self.memory.add_fact(fact)
+    def chat_stream(self, user_input: str, speaker: str = None, debug: bool = True):
+        """
+        流式对话：边生成边按句切分
+
+        每凑够一句/一个分句就 yield 出来，调用方可以立即送去 TTS 合成播放，
+        不必等整段回复生成完。生成结束后整段回复写入记忆。
+
+        Args:
+            user_input: 用户输入
+            speaker: 说话人名字（声纹识别结果），None 表示未识别
+            debug: 是否打印调试信息
+
+        Yields:
+            可直接朗读的句子片段
+        """
+        self.last_timings = {}
+        cached = self._lookup_response_cache(user_input, speaker, debug)
+        if cached is not None:
+            self.memory.add_conversation(user_input, cached, self._memory_speaker(speaker))
+            yield cached
+            return
+
+        messages = self._build_messages(user_input, speaker, debug=debug)
+
+        if debug:
+            print(f"[DEBUG] 正在思考（流式）... ({self.backend}/{self.model})")
+
+        segmenter = SentenceSegmenter()
+        reply_parts = []
+        completed = False
+        stats = {}
+        route = None
+        t2 = time.time()
+        t_first = None
+
+        def consume(token_stream):
+            nonlocal t_first, route
+            for route, token in token_stream:
+                if t_first is None:
+                    t_first = time.time()
+                reply_parts.append(token)
+                yield from segmenter.push(token)
+
+        try:
+            try:
+                # 主后端熔断或首 token 前失败时由路由改走本地模型
+                yield from consume(self.router.stream(
+                    lambda: self._call_api_stream(messages, stats=stats),
+                    lambda: self._local_stream(messages, stats=stats)
+                ))
+                completed = route == self.backend
+            except Exception as e:
+                print(f"[ERROR] API 调用失败: {e}")
+                # 已经开始输出时不再补充错误提示
+                if not reply_parts:
+                    reply_parts.append(f"抱歉，我现在无法回答。({e})")
+                    yield reply_parts[-1]
+
+            tail = segmenter.flush()
+            if tail:
+                yield tail
+        finally:
+            reply = "".join(reply_parts)
+            t3 = time.time()
+            self._record_api_timings(t2, t_first, t3)
+            self.last_usage = stats
+            if debug:
+                first = f"{t_first - t2:.2f}s" if t_first else "-"
+                print(f"[DEBUG] 首 token: {first}, 总耗时: {t3 - t2:.2f}s ({route})")
+                self._print_usage(stats)
+
+            # 保存到记忆（生成结束或被中途关闭时）
+            if reply:
+                t4 = time.perf_counter()
+                self.memory.add_conversation(user_input, reply, self._memory_speaker(speaker))
+                self.last_timings["memory_write"] = time.perf_counter() - t4
+            if completed:
+                self._store_response_cache(user_input, speaker, reply)
+
+    # ==================== 异步接口 ====================
+    # 供语音对话（asyncio 事件循环）使用：网络请求走异步客户端，
+    # Chroma 记忆读写放到记忆线程，模型思考期间不阻塞音频读取和插话检测。
+
+    async def _run_memory(self, func, *args):
+        """在记忆线程中执行记忆操作"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._memory_executor, func, *args)
+
+    def _record_api_timings(self, t_start: float, t_first: float, t_end: float):
+        """记录本轮模型调用的首 token 耗时和总耗时"""
+        if t_first is not None:
+            self.last_timings["api_first_token"] = t_first - t_start
+        self.last_timings["api_total"] = t_end - t_start
+
+    def _add_conversation_timed(self, user_input: str, reply: str, speaker: str = None):
+        t0 = time.perf_counter()
+        self.memory.add_conversation(user_input, reply, self._memory_speaker(speaker))
+        self.last_timings["memory_write"] = time.perf_counter() - t0
+
+    def _save_conversation_later(self, user_input: str, reply: str, speaker: str = None):
+        """提交记忆写入，不等待完成（可在取消/关闭流程中安全调用）"""
+        self._memory_executor.submit(self._add_conversation_timed, user_input, reply, speaker)
+
+    def prefetch_memory(self, partial_text: str):
+        """
+        根据 ASR 中间结果提前检索记忆（在事件循环线程中调用，不阻塞）
+
+        最终文本与中间结果足够接近时，achat/achat_stream 直接复用检索结果。
+        """
+        if self.speculative_enabled:
+            self.speculative.update_partial(partial_text)
+
+    async def _get_memory_result(self, user_input: str, speaker: str = None, debug: bool = True) -> dict:
+        """获取本轮记忆检索结果：优先复用推测检索（需是同一说话人的），否则正常检索"""
+        future = self.speculative.take(user_input) if self.speculative_enabled else None
+        self._last_speaker = speaker
+        if future is not None:
+            try:
+                memory_result = await asyncio.wrap_future(future)
+                if memory_result.get("speaker") == speaker:
+                    if debug:
+                        print(f"[DEBUG] 复用推测检索结果: {len(memory_result['facts'])}条事实, "
+                              f"{len(memory_result['conversations'])}条对话")
+                    return memory_result
+                if debug:
+                    print(f"[DEBUG] 推测检索按 {memory_result.get('speaker') or '未识别'} 检索，说话人已变化，重新检索")
+            except Exception as e:
+                print(f"[WARN] 推测检索失败，重新检索: {e!r}")
+        return await self._run_memory(self._search_memory, user_input, debug, speaker)
+
+    async def _iter_with_timeout(self, stream):
+        """逐个取出异步流的元素，两次输出之间超过 stream_timeout 即报超时"""
+        iterator = stream.__aiter__()
+        while True:
+            try:
+                item = await asyncio.wait_for(iterator.__anext__(), timeout=self.stream_timeout)
+            except StopAsyncIteration:
+                return
+            yield item
+
+    async def _acall_api(self, messages: list, temperature: float = 0.7, max_tokens: int = 500,
+                         stats: dict = None) -> str:
+        """异步调用 API 获取回复"""
+        if self.backend == self.BACKEND_OLLAMA:
+            response = await asyncio.wait_for(
+                self.async_client.chat(model=self.model, messages=messages, **self._ollama_kwargs()),
+                timeout=self.timeout
+            )
+            self._record_ollama_usage(response, stats)
+            return response['message']['content']
+        else:
+            response = await asyncio.wait_for(
+                self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                ),
+                timeout=self.timeout
+            )
+            self._record_usage(response.usage, stats)
+            return response.choices[0].message.content
+
+    async def _acall_api_stream(self, messages: list, stats: dict = None):
+        """异步流式调用 API，逐段 yield 文本 token"""
+        if self.backend == self.BACKEND_OLLAMA:
+            stream = await asyncio.wait_for(
+                self.async_client.chat(model=self.model, messages=messages, stream=True,
+                                       **self._ollama_kwargs()),
+                timeout=self.timeout
+            )
+            try:
+                async for part in self._iter_with_timeout(stream):
+                    if part.get('done'):
+                        self._record_ollama_usage(part, stats)
+                    content = part['message']['content']
+                    if content:
+                        yield content
+            finally:
+                await stream.aclose()
+        else:
+            stream = await asyncio.wait_for(
+                self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=500,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                ),
+                timeout=self.timeout
+            )
+            try:
+                async for chunk in self._iter_with_timeout(stream):
+                    if chunk.usage:
+                        self._record_usage(chunk.usage, stats)
+                    if not chunk.choices:
+                        continue
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        yield content
+            finally:
+                await stream.close()
+
+    def _local_async_client_get(self):
+        """本地 Ollama 异步客户端（复用连接）"""
+        if self._local_async_client is None:
+            self._local_async_client = get_ollama().AsyncClient(timeout=self.timeout)
+        return self._local_async_client
+
+    async def _alocal_call(self, messages: list, temperature: float = 0.7, max_tokens: int = 500,
+                           stats: dict = None) -> str:
+        """异步调用本地 Ollama（降级用）"""
+        response = await self._local_async_client_get().chat(
+            model=self.local_model, messages=messages,
+            **self._ollama_kwargs(temperature=temperature, num_predict=max_tokens)
+        )
+        self._record_ollama_usage(response, stats)
+        return response['message']['content']
+
+    async def _alocal_stream(self, messages: list, stats: dict = None):
+        """异步流式调用本地 Ollama（降级用）"""
+        stream = await self._local_async_client_get().chat(
+            model=self.local_model, messages=messages, stream=True, **self._ollama_kwargs()
+        )
+        try:
+            async for part in self._iter_with_timeout(stream):
+                if part.get('done'):
+                    self._record_ollama_usage(part, stats)
+                content = part['message']['content']
+                if content:
+                    yield content
+        finally:
+            await stream.aclose()
+
+    async def acomplete(self, messages: list, temperature: float = 0.7, max_tokens: int = 500) -> str:
+        """
+        异步单次补全（不带人格和记忆，供意图理解等辅助任务使用）
+
+        Args:
+            messages: 消息列表
+            temperature: 采样温度
+            max_tokens: 最大输出 token 数
+        """
+        _, result = await self.router.acall(
+            lambda: self._acall_api(messages, temperature=temperature, max_tokens=max_tokens),
+            lambda: self._alocal_call(messages, temperature=temperature, max_tokens=max_tokens)
+        )
+        return result
+
+    async def achat(self, user_input: str, speaker: str = None, debug: bool = True) -> str:
+        """
+        异步对话（chat 的非阻塞版本）
+
+        Args:
+            user_input: 用户输入
+            speaker: 说话人名字（声纹识别结果），None 表示未识别
+            debug: 是否打印调试信息
+        """
+        parts = []
+        async for segment in self.achat_stream(user_input, speaker=speaker, debug=debug):
+            parts.append(segment)
+        return "".join(parts)
+
+    async def achat_stream(self, user_input: str, speaker: str = None, debug: bool = True):
+        """
+        异步流式对话：边生成边按句切分（chat_stream 的非阻塞版本）
+
+        任务被取消或流被提前关闭时，会关闭底层 HTTP 流，并把已生成的部分写入记忆。
+
+        Yields:
+            可直接朗读的句子片段
+        """
+        self.last_timings = {}
+        if self.response_cache is not None:
+            cached = await self._run_memory(self._lookup_response_cache, user_input, speaker, debug)
+            if cached is not None:
+                self.speculative.cancel()
+                self._save_conversation_later(user_input, cached, speaker)
+                self.tracer.mark("llm_first_token", route="cache")
+                self.tracer.mark("llm_last_token", once=False)
+                yield cached
+                return
+
+        # 记忆检索耗时按关键路径计（推测检索命中时只等待剩余部分）
+        t0 = time.perf_counter()
+        memory_result = await self._get_memory_result(user_input, speaker, debug)
+        self.last_timings["memory_search"] = time.perf_counter() - t0
+        self.tracer.mark("memory_ready")
+        messages = self._build_messages(user_input, speaker, memory_result, debug)
+
+        if debug:
+            print(f"[DEBUG] 正在思考（异步流式）... ({self.backend}/{self.model})")
+
+        segmenter = SentenceSegmenter()
+        reply_parts = []
+        completed = False
+        stats = {}
+        route = None
+        t2 = time.time()
+        t_first = None
+
+        # 主后端熔断、首 token 超过截止时间或首 token 前失败时，由路由改走（或对冲到）本地模型
+        stream = self.router.astream(
+            lambda: self._acall_api_stream(messages, stats=stats),
+            lambda: self._alocal_stream(messages, stats=stats)
+        )
+        try:
+            try:
+                async for route, token in stream:
+                    if t_first is None:
+                        t_first = time.time()
+                        self.tracer.mark("llm_first_token", route=route)
+                    reply_parts.append(token)
+                    for segment in segmenter.push(token):
+                        yield segment
+                self.tracer.mark("llm_last_token", once=False)
+                completed = route == self.backend
+            except Exception as e:
+                print(f"[ERROR] API 调用失败: {e!r}")
+                # 已经开始输出时不再补充错误提示
+                if not reply_parts:
+                    reply_parts.append(f"抱歉，我现在无法回答。({e})")
+                    yield reply_parts[-1]
+
+            tail = segmenter.flush()
+            if tail:
+                yield tail
+        finally:
+            await stream.aclose()
+            reply = "".join(reply_parts)
+            t3 = time.time()
+            self._record_api_timings(t2, t_first, t3)
+            self.last_usage = stats
+            if debug:
+                first = f"{t_first - t2:.2f}s" if t_first else "-"
+                print(f"[DEBUG] 首 token: {first}, 总耗时: {t3 - t2:.2f}s ({route})")
+                self._print_usage(stats)
+
+            # 保存到记忆（完成、被打断或被取消时都写入已生成的部分）
+            if reply:
+                self._save_conversation_later(user_input, reply, speaker)
+            # 只缓存完整生成的回复（被打断的半句话、降级回复不缓存）
+            if completed and self.response_cache is not None:
+                self._memory_executor.submit(self._store_response_cache, user_input, speaker, reply)
+
+    def warm_up(self) -> dict:
+        """
+        启动预热：在记忆线程中预热嵌入模型和向量索引
+
+        与检索共用同一个单线程执行器，预热期间到来的首次检索会排在预热之后，不会重复加载模型。
+        """
+        return self._memory_executor.submit(self.memory.warm_up).result()
+
+    def start_keep_warm(self):
+        """命令行模式：后台线程保持同步连接池常热（等待输入期间连接不被回收）"""
+        if self.transport is not None:
+            self.transport.start_keep_warm()
+
+    async def akeep_warm(self):
+        """语音模式：在当前事件循环里预先建连并保持异步连接池常热（作为后台任务运行）"""
+        if self.transport is not None:
+            await self.transport.akeep_warm()
+
+    def save_memory(self):
+        """等待排队中的记忆写入完成，并保存剩余的短期记忆（退出前调用）"""
+        self._consolidation_stop.set()
+        if self.transport is not None:
+            self.transport.stop_keep_warm()
+        self._memory_executor.submit(self.memory.save_remaining).result()
+
+    # ==================== 记忆整理 ====================
+
+    def complete(self, messages: list, temperature: float = 0.7, max_tokens: int = 500) -> str:
+        """
+        同步单次补全（不带人格和记忆，主后端熔断或失败时按配置降级到本地 Ollama）
+
+        供后台线程的滚动摘要和记忆整理使用，走独立的 background_router，不影响对话的熔断状态。
+        """
+        _, result = self.background_router.call(
+            lambda: self._call_api(messages, temperature=temperature, max_tokens=max_tokens),
+            lambda: self._call_local(messages)
+        )
+        return result
+
+    # ==================== 滚动摘要 ====================
+
+    def _on_short_term_evicted(self, conversation: list):
+        """短期记忆淘汰一轮对话：排队，攒够后在后台合并进摘要（不占用对话耗时）"""
+        self.rolling_summary.add(conversation)
+        if self.rolling_summary.ready():
+            self._summary_executor.submit(self._update_summary_safe)
+
+    def _update_summary_safe(self):
+        try:
+            self.rolling_summary.update()
+        except Exception as e:
+            print(f"[WARN] 对话摘要更新失败: {e!r}")
+
+    def _fold_summary(self, previous: str, turns: list) -> str:
+        """把新淘汰的几轮对话合并进已有摘要"""
+        name = self.persona.persona['name']
+        limit = int(self.rolling_summary.max_tokens * 1.2)  # 中文约 1.5 字/token，留出余量
+        dialogue = "\n".join(f"用户：{user}\n{name}：{reply}" for user, reply in turns)
+        prompt = (
+            f"下面是机器人「{name}」本次聊天的摘要和之后的几轮对话。请把新对话合并进摘要，"
+            f"保留人名、正在聊的话题、提到的事实和还没完成的约定，省略寒暄，不超过{limit}字。只输出新的摘要。\n\n"
+            f"【已有摘要】\n{previous or '（无）'}\n\n【新对话】\n{dialogue}"
+        )
+        return self.complete([{"role": "user", "content": prompt}], temperature=0.3, max_tokens=self.rolling_summary.max_tokens + 50)
+
+    def _summarize_conversations(self, documents: list) -> str:
+        """把同一话题的多轮旧对话压缩成一条记忆摘要"""
+        name = self.persona.persona['name']
+        prompt = (
+            f"下面是机器人「{name}」和家人的几段旧对话。请整理成一段简短的记忆摘要（不超过100字），"
+            "保留人名、时间、发生的事、喜好和约定等关键信息，省略寒暄。只输出摘要本身。\n\n"
+            + "\n---\n".join(documents)
+        )
+        return self.complete([{"role": "user", "content": prompt}], temperature=0.3, max_tokens=200)
+
+    def _is_idle(self) -> bool:
+        return time.monotonic() - self._last_activity >= self.consolidation_idle
+
+    def _consolidation_loop(self):
+        """后台线程：定期检查，空闲足够久时整理一次长期记忆"""
+        while not self._consolidation_stop.wait(self.consolidation_interval):
+            if not self._is_idle():
+                continue
+            try:
+                self.consolidate_memory()
+            except Exception as e:
+                print(f"[WARN] 记忆整理失败: {e!r}")
+
+    def consolidate_memory(self, force: bool = False) -> dict:
+        """
+        整理长期记忆：旧对话按时间窗口和话题聚类，每簇压缩成一条摘要
+
+        Args:
+            force: 为 True 时不因用户说话而中途停止
+
+        Returns:
+            整理报告（整理前后的对话条数等，见 MemoryConsolidator.run）
+        """
+        def should_stop():
+            return self._consolidation_stop.is_set() or (not force and not self._is_idle())
+
+        report = self.consolidator.run(should_stop=should_stop)
+        if report["clusters"] or report["failed"]:
+            failed = f", {report['failed']}簇摘要失败" if report["failed"] else ""
+            print(f"🗜️ 记忆整理: {report['before']} → {report['after']} 条对话 "
+                  f"({report['consolidated']}条合并为{report['clusters']}条摘要{failed})")
+        return report
+
+    def add_fact(self, fact: str, speaker: str = None):
+        """手动添加重要事实（不指定说话人时为全家共享）"""
+        self.memory.add_fact(fact, self._memory_speaker(speaker))
         print(f"[INFO] 已记住: {fact}")
 
     def introduce(self):
@@ -565,6 +1917,13 @@ class Brain:
         """获取记忆统计"""
         return self.memory.get_stats()
 
+    def get_backend_stats(self) -> dict:
+        """获取各后端健康状态（熔断状态、p50/p95 首 token 延迟）和 HTTP 连接统计"""
+        stats = self.router.snapshot()
+        if self.transport is not None:
+            stats["transport"] = self.transport.snapshot()
+        return stats
+
 
 def load_api_config(config_path="config/api.json") -> dict:
     """从配置文件加载 API 设置"""
@@ -606,9 +1965,12 @@ def main():
         backend=args.backend,
         model=model,
         api_key=api_key,
-        fallback_to_local=fallback
+        fallback_to_local=fallback,
+        config=config
     )
 
+    brain.start_keep_warm()
+
     print(f"\n{brain.introduce()}\n")
     print("命令: 'quit'退出 | 'stats'查看记忆 | 'fact:xxx'添加事实\n")
 
@@ -622,7 +1984,7 @@ def main():
             # 特殊命令
             if user_input.lower() in ['quit', 'exit', '退出']:
                 print(f"\n{brain.persona.persona['name']}: 再见！下次见~ 👋")
-                brain.memory.save_remaining()
+                brain.save_memory()
                 break
 
             if user_input.lower() == 'stats':
@@ -644,7 +2006,7 @@ def main():
 
         except KeyboardInterrupt:
             print("\n\n正在保存记忆...")
-            brain.memory.save_remaining()
+            brain.save_memory()
             print("再见！")
             break
 
@@ -0,0 +1,202 @@
+# AI成长机器人 - 长期记忆整理
+# 把旧的逐轮对话按时间窗口和话题聚类，压缩成摘要，控制 long_term_memory 的规模
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+
+class MemoryConsolidator:
+    """
+    长期对话记忆整理
+
+    1. 选出待整理的对话：早于 min_age_days 天的；集合仍超过 max_documents 条时，
+       再按时间从旧到新补足
+    2. 按说话人和 window_hours 时间窗口分组，窗口内按向量余弦相似度贪心聚类（同一话题），
+       不同家庭成员的对话不会合并到同一条摘要
+    3. 每个簇用 summarize_fn 生成一条摘要，写入摘要并删除原对话
+
+    已经是摘要的文档不再参与整理。集合按 page_size 分页读取：先只读元数据选出待整理的对话，
+    再只为其中最旧的 max_plan_size 条读取向量，内存占用与集合大小无关（其余留到下次整理）。
+    """
+
+    def __init__(self, memory, summarize_fn, min_age_days: float = 7, max_documents: int = 2000,
+                 window_hours: float = 24, topic_similarity: float = 0.6,
+                 min_cluster_size: int = 2, max_cluster_size: int = 8,
+                 page_size: int = 500, max_plan_size: int = 1000):
+        """
+        Args:
+            memory: Memory 实例
+            summarize_fn: 摘要函数 list[str] -> str（失败时返回空字符串或抛异常）
+            min_age_days: 只整理多少天以前的对话
+            max_documents: 对话集合的目标上限
+            window_hours: 时间窗口长度（小时），不同窗口的对话不会合并
+            topic_similarity: 同一簇内对话与簇中心的最小余弦相似度
+            min_cluster_size: 少于多少条的簇不整理（单条对话压缩收益很小）
+            max_cluster_size: 每个簇最多合并多少条对话
+            page_size: 分页读取集合时每页条数
+            max_plan_size: 每次整理最多处理多少条对话
+        """
+        self.memory = memory
+        self.summarize_fn = summarize_fn
+        self.min_age_days = min_age_days
+        self.max_documents = max_documents
+        self.window_hours = window_hours
+        self.topic_similarity = topic_similarity
+        self.min_cluster_size = min_cluster_size
+        self.max_cluster_size = max_cluster_size
+        self.page_size = page_size
+        self.max_plan_size = max_plan_size
+
+    def _select(self, records: list, now: datetime) -> list:
+        """选出待整理的对话（按时间升序）"""
+        cutoff = now - timedelta(days=self.min_age_days)
+        candidates = [r for r in records if r["time"] < cutoff]
+
+        # 超出规模上限时，不论新旧，从最旧的开始补足
+        overflow = len(records) - self.max_documents
+        if overflow > len(candidates):
+            candidates = records[:overflow]
+        return candidates
+
+    def _cluster(self, records: list) -> list:
+        """按时间窗口分组，窗口内按话题贪心聚类"""
+        window = timedelta(hours=self.window_hours)
+        clusters = []
+        window_start = None
+        window_clusters = []
+
+        for record in records:
+            if window_start is None or record["time"] - window_start >= window:
+                clusters.extend(window_clusters)
+                window_start = record["time"]
+                window_clusters = []
+
+            best, best_sim = None, self.topic_similarity
+            for cluster in window_clusters:
+                if len(cluster["records"]) >= self.max_cluster_size:
+                    continue
+                sim = float(np.dot(cluster["centroid"], record["embedding"]))
+                if sim >= best_sim:
+                    best, best_sim = cluster, sim
+
+            if best is None:
+                window_clusters.append({"records": [record], "sum": record["embedding"].copy(),
+                                        "centroid": record["embedding"]})
+            else:
+                best["records"].append(record)
+                best["sum"] += record["embedding"]
+                best["centroid"] = best["sum"] / np.linalg.norm(best["sum"])
+
+        clusters.extend(window_clusters)
+        return [c["records"] for c in clusters if len(c["records"]) >= self.min_cluster_size]
+
+    def plan(self, now: datetime = None) -> list:
+        """
+        生成整理计划（不修改数据库）
+
+        Returns:
+            簇列表，每个簇是同一说话人按时间排序的 [{"id", "document", "time", "embedding", "speaker"}, ...]
+        """
+        now = now or datetime.now()
+        records = self._scan_metadata()
+        records.sort(key=lambda r: r["time"])
+        selected = self._load_vectors(self._select(records, now)[:self.max_plan_size])
+
+        by_speaker = {}
+        for record in selected:
+            by_speaker.setdefault(record["speaker"], []).append(record)
+        clusters = []
+        for speaker_records in by_speaker.values():
+            clusters.extend(self._cluster(speaker_records))
+        clusters.sort(key=lambda c: c[0]["time"])
+        return clusters
+
+    def _scan_metadata(self) -> list:
+        """分页只读元数据：[{"id", "time", "speaker"}, ...]（摘要和没有时间的文档跳过）"""
+        collection = self.memory.conversations
+        records = []
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=self.page_size, offset=offset)
+            for doc_id, meta in zip(page["ids"], page["metadatas"]):
+                meta = meta or {}
+                if meta.get("type") == self.memory.TYPE_DIGEST:
+                    continue
+                try:
+                    doc_time = datetime.fromisoformat(meta["time"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                records.append({"id": doc_id, "time": doc_time,
+                                "speaker": meta.get("speaker", self.memory.SPEAKER_SHARED)})
+            if len(page["ids"]) < self.page_size:
+                return records
+            offset += self.page_size
+
+    def _load_vectors(self, records: list) -> list:
+        """分页读取选中对话的内容和（归一化的）向量，读不到或零向量的跳过"""
+        collection = self.memory.conversations
+        loaded = []
+        for i in range(0, len(records), self.page_size):
+            chunk = records[i:i + self.page_size]
+            page = collection.get(ids=[r["id"] for r in chunk], include=["documents", "embeddings"])
+            embeddings = page["embeddings"] if page["embeddings"] is not None else []
+            found = {doc_id: (doc, embedding)
+                     for doc_id, doc, embedding in zip(page["ids"], page["documents"], embeddings)}
+            for record in chunk:
+                if record["id"] not in found:
+                    continue
+                doc, embedding = found[record["id"]]
+                vector = np.asarray(embedding, dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                if norm == 0:
+                    continue
+                loaded.append(dict(record, document=doc, embedding=vector / norm))
+        return loaded
+
+    def run(self, should_stop=None, now: datetime = None) -> dict:
+        """
+        执行一次整理
+
+        Args:
+            should_stop: 可选回调，返回 True 时在两个簇之间中止（例如用户又开始说话）
+            now: 当前时间（测试/离线整理时可指定）
+
+        Returns:
+            {"before", "after", "clusters", "consolidated", "failed", "stopped"}
+        """
+        self.memory.flush()
+        before = self.memory.conversations.count()
+        report = {"before": before, "after": before, "clusters": 0,
+                  "consolidated": 0, "failed": 0, "stopped": False}
+
+        for cluster in self.plan(now):
+            if should_stop and should_stop():
+                report["stopped"] = True
+                break
+            try:
+                summary = (self.summarize_fn([r["document"] for r in cluster]) or "").strip()
+            except Exception as e:
+                print(f"[WARN] 记忆摘要失败: {e!r}")
+                summary = ""
+            if not summary:
+                report["failed"] += 1
+                continue
+
+            start, end = cluster[0]["time"], cluster[-1]["time"]
+            self.memory.replace_conversations(
+                [r["id"] for r in cluster],
+                f"【{start.strftime('%Y年%m月%d日')}对话摘要】{summary}",
+                {
+                    "time": start.isoformat(),
+                    "end_time": end.isoformat(),
+                    "type": self.memory.TYPE_DIGEST,
+                    "source_count": len(cluster),
+                    "speaker": cluster[0]["speaker"]
+                }
+            )
+            report["clusters"] += 1
+            report["consolidated"] += len(cluster)
+
+        report["after"] = self.memory.conversations.count()
+        return report
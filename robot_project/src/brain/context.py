@@ -0,0 +1,157 @@
+# AI成长机器人 - 上下文 token 预算
+# token 计数（估算或真实分词器）+ 人格/记忆/短期对话的全局预算打包
+
+import os
+import re
+import threading
+from collections import OrderedDict
+
+
+class TokenCounter:
+    """
+    token 计数器
+
+    tokenizer 取值：
+        None / "estimate"   —— 按字符估算（中文约1.5字符/token，英文约4字符/token）
+        "tiktoken:<编码名>" —— 使用 tiktoken（OpenAI 系模型，如 tiktoken:cl100k_base）
+        "hf:<名称或路径>"   —— 使用 HuggingFace tokenizers（如 Qwen 的 tokenizer.json）
+    真实分词器加载失败时自动退回估算。
+    """
+
+    _CHINESE = re.compile(r'[\u4e00-\u9fff]')
+
+    def __init__(self, tokenizer: str = None, cache_size: int = 2048):
+        self.name = "estimate"
+        self._encode = None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_size = cache_size
+
+        if tokenizer and tokenizer != "estimate":
+            try:
+                self._encode = self._load(tokenizer)
+                self.name = tokenizer
+            except Exception as e:
+                print(f"[WARN] 分词器 {tokenizer} 加载失败，改用估算: {e!r}")
+
+    @staticmethod
+    def _load(spec: str):
+        """加载真实分词器，返回 encode 函数"""
+        kind, _, name = spec.partition(":")
+        if kind == "tiktoken":
+            import tiktoken
+            encoding = tiktoken.get_encoding(name or "cl100k_base")
+            return encoding.encode
+        if kind == "hf":
+            from tokenizers import Tokenizer
+            tokenizer = Tokenizer.from_file(name) if os.path.exists(name) else Tokenizer.from_pretrained(name)
+            return lambda text: tokenizer.encode(text, add_special_tokens=False).ids
+        raise ValueError(f"未知分词器类型: {spec}")
+
+    def estimate(self, text: str) -> int:
+        """按字符估算 token 数"""
+        chinese_chars = len(self._CHINESE.findall(text))
+        other_chars = len(text) - chinese_chars
+        return int(chinese_chars / 1.5 + other_chars / 4)
+
+    def count(self, text: str) -> int:
+        """计算文本 token 数（记忆文档会反复出现，结果做 LRU 缓存）"""
+        if not text:
+            return 0
+        if self._encode is None:
+            return self.estimate(text)
+
+        with self._lock:
+            tokens = self._cache.get(text)
+            if tokens is not None:
+                self._cache.move_to_end(text)
+                return tokens
+
+        tokens = len(self._encode(text))
+        with self._lock:
+            self._cache[text] = tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+
+class ContextPacker:
+    """
+    全局 token 预算打包
+
+    人格、用户输入和本轮固定上下文（时间、说话人）必须保留，先从总预算中扣除；
+    剩余预算按优先级一次遍历分配：
+        1. 重要事实（按相关度）
+        2. 短期对话（从最新往前，按"一问一答"整轮保留）
+        3. 相关历史对话（按相关度）
+    """
+
+    # 每条消息的格式开销（角色标记等）
+    MESSAGE_OVERHEAD = 4
+
+    def __init__(self, counter: TokenCounter, total_budget: int = 3000):
+        """
+        Args:
+            counter: token 计数器
+            total_budget: 整个提示词的 token 预算
+        """
+        self.counter = counter
+        self.total_budget = total_budget
+
+    def pack(self, fixed_texts: list, facts: list, short_term, conversations: list) -> dict:
+        """
+        在总预算内挑选上下文
+
+        Args:
+            fixed_texts: 必须保留的文本（人格、用户输入、时间/说话人等）
+            facts: 候选事实（按相关度排序）
+            short_term: 短期对话条目（时间顺序，每条带 "tokens"）
+            conversations: 候选历史对话（按相关度排序）
+
+        Returns:
+            {"facts", "short_term", "conversations", "used_tokens", "budget"}
+        """
+        used = sum(self.counter.count(t) + self.MESSAGE_OVERHEAD for t in fixed_texts if t)
+        remaining = self.total_budget - used
+
+        packed_facts = []
+        for fact in facts:
+            tokens = self.counter.count(fact) + 2
+            if tokens > remaining:
+                break
+            packed_facts.append(fact)
+            remaining -= tokens
+
+        # 短期对话：从最新一轮往前，整轮（user + assistant）放入
+        packed_short = []
+        turn = []
+        turn_tokens = 0
+        for entry in reversed(short_term):
+            turn.append(entry)
+            turn_tokens += entry["tokens"] + self.MESSAGE_OVERHEAD
+            if entry["role"] != "user":
+                continue
+            # 遇到 user 说明一轮已完整
+            if turn_tokens > remaining:
+                break
+            packed_short.extend(turn)
+            remaining -= turn_tokens
+            turn = []
+            turn_tokens = 0
+        packed_short.reverse()
+
+        packed_convs = []
+        for conv in conversations:
+            tokens = self.counter.count(conv) + 2
+            if tokens > remaining:
+                break
+            packed_convs.append(conv)
+            remaining -= tokens
+
+        return {
+            "facts": packed_facts,
+            "short_term": packed_short,
+            "conversations": packed_convs,
+            "used_tokens": self.total_budget - remaining,
+            "budget": self.total_budget
+        }
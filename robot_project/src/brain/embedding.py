@@ -0,0 +1,105 @@
+# AI成长机器人 - 嵌入函数
+# 记忆库（Memory）、import_memory.py、tune_index.py 都按配置 memory.embedding 创建嵌入函数，保证向量在同一空间
+
+import os
+import threading
+
+import numpy as np
+
+# ChromaDB 默认嵌入模型的下载目录（DefaultEmbeddingFunction 首次使用时下载到这里）
+ONNX_MODEL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "chroma", "onnx_models", "all-MiniLM-L6-v2", "onnx")
+
+
+class MiniLMEmbedding:
+    """
+    all-MiniLM-L6-v2 ONNX 嵌入（不导入 chromadb）
+
+    与 ChromaDB 的 DefaultEmbeddingFunction 用同一份模型文件、同样的截断 / 填充和平均池化，
+    向量完全一致；numpy 存储后端用它，启动时省掉导入 chromadb 的时间
+    """
+
+    MAX_TOKENS = 256
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, batch_size: int = 32):
+        """
+        Args:
+            model_dir: 模型目录（model.onnx + tokenizer.json）
+            batch_size: 每次推理的文档数
+        """
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        self._tokenizer = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available(model_dir: str = ONNX_MODEL_DIR) -> bool:
+        """模型文件是否已下载"""
+        return all(os.path.exists(os.path.join(model_dir, f)) for f in ("model.onnx", "tokenizer.json"))
+
+    def _load(self):
+        """首次调用时加载分词器和 ONNX 模型"""
+        with self._lock:
+            if self._session is not None:
+                return
+            import onnxruntime
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=self.MAX_TOKENS)
+            tokenizer.enable_padding(pad_id=0, pad_token="[PAD]", length=self.MAX_TOKENS)
+
+            options = onnxruntime.SessionOptions()
+            options.log_severity_level = 3
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            providers = [p for p in onnxruntime.get_available_providers() if p != "CoreMLExecutionProvider"]
+            self._session = onnxruntime.InferenceSession(
+                os.path.join(self.model_dir, "model.onnx"), providers=providers, sess_options=options
+            )
+            self._tokenizer = tokenizer
+
+    def __call__(self, input: list) -> list:
+        self._load()
+        result = []
+        for start in range(0, len(input), self.batch_size):
+            encoded = [self._tokenizer.encode(text) for text in input[start:start + self.batch_size]]
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            hidden = self._session.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.zeros_like(input_ids),
+            })[0]
+
+            # 按 attention mask 平均池化，再归一化成单位向量
+            mask = np.broadcast_to(np.expand_dims(attention_mask, -1), hidden.shape)
+            embeddings = np.sum(hidden * mask, 1) / np.clip(mask.sum(1), a_min=1e-9, a_max=None)
+            norm = np.linalg.norm(embeddings, axis=1)
+            norm[norm == 0] = 1e-12
+            result.extend((embeddings / norm[:, np.newaxis]).astype(np.float32))
+        return result
+
+
+def make_embedding_function(spec: str = "default", chroma: bool = True):
+    """
+    按名称创建嵌入函数（config/api.json → "memory": {"embedding": "..."}）
+
+    default              —— ChromaDB 默认模型 all-MiniLM-L6-v2
+    st:<模型名>          —— sentence-transformers 模型，如 st:paraphrase-multilingual-MiniLM-L12-v2
+
+    修改配置后，已有集合要先用 python import_memory.py --reembed all 重新嵌入，否则查询向量和库内向量不在同一空间
+
+    Args:
+        spec: 嵌入函数名
+        chroma: 是否给 ChromaDB 集合使用（ChromaDB 会把嵌入函数记录进集合配置，要用它自己的实现）；
+                为 False 且模型已下载时 default 用 MiniLMEmbedding，不导入 chromadb
+    """
+    if spec == "default" and not chroma and MiniLMEmbedding.available():
+        return MiniLMEmbedding()
+    from chromadb.utils import embedding_functions
+    if spec == "default":
+        # 模型还没下载时由 ChromaDB 的实现下载（之后再启动就走 MiniLMEmbedding）
+        return embedding_functions.DefaultEmbeddingFunction()
+    if spec.startswith("st:"):
+        return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=spec[3:])
+    raise ValueError(f"未知的嵌入函数: {spec}")
@@ -0,0 +1,155 @@
+# AI成长机器人 - 事实关键词索引
+# 内存中的 BM25 倒排索引（中文按字 + 二元组切词），与向量检索结果按排名融合
+
+import math
+import re
+import threading
+
+
+_TERM_RUNS = re.compile(r'[\u4e00-\u9fff]+|[a-z0-9]+')
+
+
+def tokenize(text: str) -> list:
+    """
+    切词：中文连续片段取单字和相邻二字（"清于的生日" → 清/于/的/生/日/清于/于的/的生/生日），
+    英文和数字按整词
+    """
+    terms = []
+    for run in _TERM_RUNS.findall((text or "").lower()):
+        if run.isascii():
+            terms.append(run)
+            continue
+        terms.extend(run)
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def _key_terms(terms: list) -> set:
+    """用于计算覆盖率的关键词项：中文二字组和英文整词（单字太常见，只在没有其它词项时使用）"""
+    keys = {t for t in terms if len(t) > 1 or t.isascii()}
+    return keys or set(terms)
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """
+    倒数排名融合（RRF）
+
+    Args:
+        rankings: 多路检索结果，每路是按相关度排序的 ID 列表
+        k: 平滑常数，越大越弱化排名靠前的优势
+
+    Returns:
+        融合后按得分排序的 ID 列表
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class KeywordIndex:
+    """
+    BM25 关键词索引
+
+    事实记忆（名字、生日、过敏等）多是精确词查询，关键词命中只需几十微秒，
+    不需要经过嵌入和向量查询。
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}   # 词项 -> {文档序号: 词频}
+        self._positions = {}  # 文档ID -> 文档序号
+        self._ids = []        # 文档序号 -> 文档ID（已移除的为 None）
+        self._documents = []  # 文档序号 -> 文档内容
+        self._key_terms = []  # 文档序号 -> 关键词项集合
+        self._lengths = []    # 文档序号 -> 词项数
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def add(self, doc_id: str, document: str):
+        """加入一条文档"""
+        terms = tokenize(document)
+        with self._lock:
+            index = len(self._ids)
+            self._positions[doc_id] = index
+            self._ids.append(doc_id)
+            self._documents.append(document)
+            self._key_terms.append(_key_terms(terms))
+            self._lengths.append(len(terms))
+            self._total_length += len(terms)
+            for term in terms:
+                posting = self._postings.setdefault(term, {})
+                posting[index] = posting.get(index, 0) + 1
+
+    def add_many(self, ids: list, documents: list):
+        """批量加入文档（启动时从数据库加载）"""
+        for doc_id, document in zip(ids, documents):
+            self.add(doc_id, document)
+
+    def remove(self, doc_id: str):
+        """移除一条文档（如写入失败、合并为重复的事实）；不存在时忽略"""
+        with self._lock:
+            index = self._positions.pop(doc_id, None)
+            if index is None:
+                return
+            for term in set(tokenize(self._documents[index])):
+                posting = self._postings.get(term)
+                if posting is None:
+                    continue
+                posting.pop(index, None)
+                if not posting:
+                    del self._postings[term]
+            self._total_length -= self._lengths[index]
+            self._ids[index] = None
+            self._documents[index] = None
+            self._key_terms[index] = set()
+            self._lengths[index] = 0
+
+    def search(self, query: str, n_results: int = 3, accept=None) -> list:
+        """
+        BM25 检索
+
+        Args:
+            query: 查询文本
+            n_results: 最多返回条数
+            accept: 可选过滤函数 文档ID -> bool（如只保留当前说话人和共享的事实）
+
+        Returns:
+            [{"id", "document", "score", "coverage"}, ...]，按得分降序；
+            coverage 为查询关键词项在该文档中出现的比例（0~1）
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        query_keys = _key_terms(terms)
+
+        with self._lock:
+            count = len(self._positions)
+            if count == 0:
+                return []
+            avg_length = self._total_length / count
+
+            scores = {}
+            for term in set(terms):
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for index, tf in posting.items():
+                    if accept is not None and not accept(self._ids[index]):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / avg_length)
+                    scores[index] = scores.get(index, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            top = sorted(scores, key=scores.get, reverse=True)[:n_results]
+            return [{
+                "id": self._ids[index],
+                "document": self._documents[index],
+                "score": scores[index],
+                "coverage": len(query_keys & self._key_terms[index]) / len(query_keys)
+            } for index in top]
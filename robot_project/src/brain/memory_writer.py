@@ -0,0 +1,213 @@
+# AI成长机器人 - 记忆异步批量写入
+# 嵌入计算和 SD 卡写入从对话关键路径上移到后台线程，并合并成批量 add()
+
+import queue
+import threading
+import time
+
+
+class MemoryWriter:
+    """
+    写后（write-behind）记忆写入队列
+
+    enqueue() 只把文档放进队列立即返回；后台线程按集合分组，
+    攒够 batch_size 条或等待超过 flush_interval 秒后，用一次 add() 批量写入。
+    flush() 阻塞直到队列中已有的文档全部落盘（写入失败时按 max_retries 重试，仍失败返回 False）。
+    """
+
+    _FLUSH = object()
+    _STOP = object()
+    _RETRY_INTERVAL = 0.5  # flush/stop 时两次重试之间的等待（秒）
+
+    def __init__(self, batch_size: int = 16, flush_interval: float = 2.0,
+                 on_written=None, max_retries: int = 3, on_failed=None):
+        """
+        Args:
+            batch_size: 单个集合攒够多少条立即写入
+            flush_interval: 最早一条待写文档最多等待多少秒
+            on_written: 写入成功回调 (collection, ids, documents, metadatas)
+            max_retries: 写入失败的重试次数（超过后丢弃并打印错误）
+            on_failed: 批次重试用尽被丢弃时的回调 (collection, ids, documents, metadatas)
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_written = on_written
+        self.on_failed = on_failed
+        self.max_retries = max_retries
+
+        self._queue = queue.Queue()
+        self._pending = {}  # id(collection) -> {"collection", "ids", "documents", "metadatas", "embeddings", "retries"}
+        self._oldest = None  # 最早一条待写文档的入队时间
+
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, collection, doc_id: str, document: str, metadata: dict, embedding=None, prepare=None):
+        """
+        提交一条待写入文档（立即返回；已算好的向量可一并传入，避免重复嵌入）
+
+        Args:
+            prepare: 可选，在后台线程上、加入批次前调用的预处理 () -> 向量（如嵌入后去重）；
+                     返回 None 表示不再写入这条文档
+        """
+        self._queue.put((collection, doc_id, document, metadata, embedding, prepare))
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        立即写入所有已提交的文档并等待完成
+
+        Returns:
+            是否在超时前全部写入成功（有批次重试用尽被丢弃时为 False）
+        """
+        if not self._thread.is_alive():
+            return self.pending_count() == 0
+        done = threading.Event()
+        result = {"ok": False}
+        self._queue.put((self._FLUSH, (done, result)))
+        return done.wait(timeout) and result["ok"]
+
+    def close(self, timeout: float = None):
+        """写完剩余文档并停止后台线程"""
+        if self._thread.is_alive():
+            self._queue.put((self._STOP, None))
+            self._thread.join(timeout)
+
+    def pending_count(self) -> int:
+        """排队中（尚未写入）的文档数"""
+        return self._queue.qsize() + sum(len(b["ids"]) for b in self._pending.values())
+
+    def _run(self):
+        """后台写入循环"""
+        while True:
+            timeout = None
+            if self._oldest is not None:
+                timeout = max(0.0, self._oldest + self.flush_interval - time.monotonic())
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._write_all()
+                continue
+
+            if item[0] is self._FLUSH:
+                waiters = [item[1]] + self._drain()
+                ok = self._write_until_done()
+                # 文档真正写完（或重试用尽）之后才通知所有等待中的 flush()
+                for done, result in waiters:
+                    result["ok"] = ok
+                    done.set()
+                continue
+            if item[0] is self._STOP:
+                waiters = self._drain()
+                ok = self._write_until_done()
+                for done, result in waiters:
+                    result["ok"] = ok
+                    done.set()
+                return
+
+            self._add_pending(*item)
+            if any(len(b["ids"]) >= self.batch_size for b in self._pending.values()):
+                self._write_all()
+
+    def _drain(self) -> list:
+        """
+        把队列里已有的文档全部取出（flush/stop 之前）
+
+        Returns:
+            顺带取出的其他 flush 请求 [(done, result)]，由调用方在写入完成后通知
+        """
+        waiters = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return waiters
+            if item[0] is self._FLUSH:
+                waiters.append(item[1])
+            elif item[0] is self._STOP:
+                self._queue.put(item)
+                return waiters
+            else:
+                self._add_pending(*item)
+
+    def _write_until_done(self) -> bool:
+        """
+        反复写入直到待写批次清空（每个批次最多重试 max_retries 次）
+
+        Returns:
+            是否全部写入成功
+        """
+        ok = self._write_all()
+        while self._pending:
+            time.sleep(self._RETRY_INTERVAL)
+            ok = self._write_all() and ok
+        return ok
+
+    def _add_pending(self, collection, doc_id, document, metadata, embedding=None, prepare=None):
+        if prepare is not None:
+            try:
+                embedding = prepare()
+            except Exception as e:
+                # 预处理失败时照常写入（由集合的嵌入函数计算向量），不丢记忆
+                print(f"[WARN] 记忆写入预处理失败: {e!r}")
+            else:
+                if embedding is None:
+                    return
+        batch = self._pending.setdefault(id(collection), {
+            "collection": collection, "ids": [], "documents": [], "metadatas": [], "embeddings": [],
+            "retries": 0
+        })
+        batch["ids"].append(doc_id)
+        batch["documents"].append(document)
+        batch["metadatas"].append(metadata)
+        batch["embeddings"].append(embedding)
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+
+    def _write_all(self) -> bool:
+        """
+        把所有待写批次写入数据库
+
+        Returns:
+            False 表示有批次重试用尽被丢弃
+        """
+        ok = True
+        for key in list(self._pending):
+            batch = self._pending[key]
+            # 整批都带向量时直接写入，否则由集合的嵌入函数统一计算
+            embeddings = batch["embeddings"]
+            if any(e is None for e in embeddings):
+                embeddings = None
+            try:
+                batch["collection"].add(
+                    ids=batch["ids"],
+                    documents=batch["documents"],
+                    metadatas=batch["metadatas"],
+                    embeddings=embeddings
+                )
+            except Exception as e:
+                batch["retries"] += 1
+                if batch["retries"] <= self.max_retries:
+                    print(f"[WARN] 记忆写入失败，稍后重试 ({batch['retries']}/{self.max_retries}): {e!r}")
+                    continue
+                print(f"[ERROR] 记忆写入失败，丢弃 {len(batch['ids'])} 条: {e!r}")
+                del self._pending[key]
+                ok = False
+                self._notify(self.on_failed, batch)
+                continue
+
+            del self._pending[key]
+            self._notify(self.on_written, batch)
+
+        self._oldest = time.monotonic() if self._pending else None
+        return ok
+
+    @staticmethod
+    def _notify(callback, batch: dict):
+        """调用写入成功 / 失败回调（回调出错只打印，不影响后台线程）"""
+        if callback is None:
+            return
+        try:
+            callback(batch["collection"], batch["ids"], batch["documents"], batch["metadatas"])
+        except Exception as e:
+            print(f"[WARN] 记忆写入回调失败: {e!r}")
@@ -0,0 +1,80 @@
+# AI成长机器人 - 提示词组装
+# 保证每轮请求的消息前缀逐字节一致，让云端（豆包/DeepSeek/OpenAI）的
+# prompt cache 和 Ollama 的 KV 缓存能够复用前缀
+
+
+class PromptBuilder:
+    """
+    前缀稳定的提示词组装器
+
+    消息顺序（从稳定到易变）：
+        1. 人格系统提示       —— 只在 persona.json 修改后变化
+        2. 之前的对话摘要     —— 淘汰的旧对话合并进摘要后才变化（见 RollingSummary）
+        3. 短期对话历史       —— 只在末尾追加，淘汰最旧一轮时才变化
+        4. 本轮动态上下文     —— 记忆召回 + 当前时间 + 当前说话人，合并为一条 system 消息
+        5. 用户输入
+
+    每次 build() 后，会与上一轮的消息逐条比较，统计可被缓存复用的前缀 token 数。
+    """
+
+    def __init__(self, persona, count_tokens):
+        """
+        Args:
+            persona: Persona 实例（提供 get_system_prompt()）
+            count_tokens: token 计数函数 text -> int
+        """
+        self.persona = persona
+        self.count_tokens = count_tokens
+        self._last_messages = []
+        self._static_prompt = None
+        self._static_tokens = 0
+        self.last_stats = {}
+
+    def build(self, history: list, dynamic_parts: list, user_input: str, summary: str = "") -> list:
+        """
+        组装消息列表
+
+        Args:
+            history: 短期对话 [{"role", "content"}, ...]
+            dynamic_parts: 本轮动态上下文片段（记忆、时间、说话人等），空片段会被忽略
+            user_input: 用户输入
+            summary: 之前对话的滚动摘要（可选）
+
+        Returns:
+            消息列表
+        """
+        system_prompt = self.persona.get_system_prompt()
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": summary})
+
+        for msg in history:
+            messages.append({"role": msg["role"], "content": msg["content"]})
+
+        dynamic = "\n\n".join(part for part in dynamic_parts if part)
+        if dynamic:
+            messages.append({"role": "system", "content": dynamic})
+
+        messages.append({"role": "user", "content": user_input})
+
+        self._update_stats(messages, system_prompt)
+        return messages
+
+    def _update_stats(self, messages: list, system_prompt: str):
+        """统计静态前缀和与上一轮相同的前缀 token 数"""
+        reusable_tokens = 0
+        for current, previous in zip(messages, self._last_messages):
+            if current != previous:
+                break
+            reusable_tokens += self.count_tokens(current["content"])
+
+        if system_prompt is not self._static_prompt:
+            self._static_prompt = system_prompt
+            self._static_tokens = self.count_tokens(system_prompt)
+
+        self.last_stats = {
+            "static_prefix_tokens": self._static_tokens,
+            "reusable_prefix_tokens": reusable_tokens,
+            "prompt_tokens_estimate": sum(self.count_tokens(m["content"]) for m in messages),
+        }
+        self._last_messages = messages
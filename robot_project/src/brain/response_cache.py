@@ -0,0 +1,167 @@
+# AI成长机器人 - 语义回复缓存
+# 问候、告别、"你叫什么"这类高频意图直接复用之前的回复，省掉一次大模型往返
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+
+class ResponseCache:
+    """
+    语义回复缓存（默认关闭，需在 api.json 的 response_cache 中开启）
+
+    - 先把输入与各意图的例句比较，只有命中已启用意图的输入才可缓存
+    - 缓存键：输入向量 + 说话人 + 时间桶（如"今天星期几"按天分桶，问候按小时分桶）
+    - 同一意图/说话人/时间桶内，输入向量余弦相似度不低于 threshold、且对比词（CONTRAST_TERMS）一致才命中
+    - 条目有 TTL，总数超过 max_size 时淘汰最久未用的
+
+    默认嵌入模型 all-MiniLM-L6-v2 是英文模型，对"今天/明天""你/我"这种只差一个字的中文问句
+    几乎分不开，所以除了较保守的阈值，还要求对比词一致；中文场景建议把 memory.embedding
+    配置成多语言模型（如 st:paraphrase-multilingual-MiniLM-L12-v2），缓存与记忆共用同一个嵌入函数。
+    """
+
+    # 决定回复内容的对比词：输入中出现的这些词不完全相同时不复用回复（"今天星期几" ≠ "明天星期几"）
+    CONTRAST_TERMS = ("今天", "明天", "昨天", "后天", "前天", "早上", "上午", "中午", "下午", "晚上",
+                      "你", "我", "他", "她")
+
+    # 默认意图：examples 为例句，bucket 为时间分桶（none / hour / day），ttl 为秒
+    DEFAULT_INTENTS = {
+        "greeting": {"enabled": True, "bucket": "hour", "ttl": 3600,
+                     "examples": ["你好", "早上好", "晚上好", "嗨", "哈喽"]},
+        "farewell": {"enabled": True, "bucket": "hour", "ttl": 3600,
+                     "examples": ["再见", "拜拜", "晚安", "我走了"]},
+        "identity": {"enabled": True, "bucket": "none", "ttl": 86400,
+                     "examples": ["你叫什么", "你叫什么名字", "你是谁", "你几岁了"]},
+        "date": {"enabled": True, "bucket": "day", "ttl": 86400,
+                 "examples": ["今天星期几", "今天几号", "今天是几月几号"]},
+    }
+
+    def __init__(self, embed_fn, intents: dict = None, threshold: float = 0.95,
+                 intent_threshold: float = 0.85, ttl: float = 3600, max_size: int = 256):
+        """
+        Args:
+            embed_fn: 嵌入函数 text -> 向量
+            intents: 意图配置，按名字覆盖/补充 DEFAULT_INTENTS（{"date": {"enabled": false}}）
+            threshold: 输入与缓存条目的最小余弦相似度
+            intent_threshold: 输入与意图例句的最小余弦相似度
+            ttl: 意图未指定 ttl 时的默认有效期（秒）
+            max_size: 最多缓存多少条回复
+        """
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.intent_threshold = intent_threshold
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self.intents = {name: dict(cfg) for name, cfg in self.DEFAULT_INTENTS.items()}
+        for name, cfg in (intents or {}).items():
+            self.intents.setdefault(name, {}).update(cfg)
+
+        self._intent_vectors = None  # [(意图名, 例句向量矩阵)]，首次使用时计算
+        self._entries = OrderedDict()  # 条目ID -> {"intent", "speaker", "bucket", "contrast", "vector", "reply", "expires"}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    def _vector(self, text: str):
+        vector = np.asarray(self.embed_fn(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _contrast(self, text: str) -> frozenset:
+        """输入中出现的对比词"""
+        return frozenset(term for term in self.CONTRAST_TERMS if term in text)
+
+    def _classify(self, vector) -> str:
+        """返回输入所属的已启用意图，不属于任何意图时返回 None"""
+        if self._intent_vectors is None:
+            self._intent_vectors = [
+                (name, np.stack([self._vector(example) for example in cfg.get("examples", [])]))
+                for name, cfg in self.intents.items()
+                if cfg.get("enabled", True) and cfg.get("examples")
+            ]
+
+        best, best_sim = None, self.intent_threshold
+        for name, matrix in self._intent_vectors:
+            sim = float(np.max(matrix @ vector))
+            if sim >= best_sim:
+                best, best_sim = name, sim
+        return best
+
+    @staticmethod
+    def _bucket(kind: str) -> str:
+        now = datetime.now()
+        if kind == "hour":
+            return now.strftime("%Y%m%d%H")
+        if kind == "day":
+            return now.strftime("%Y%m%d")
+        return ""
+
+    def _key(self, user_input: str):
+        """计算 (向量, 意图, 时间桶)；不可缓存时意图为 None"""
+        vector = self._vector(user_input)
+        intent = self._classify(vector)
+        if intent is None:
+            return vector, None, ""
+        return vector, intent, self._bucket(self.intents[intent].get("bucket", "none"))
+
+    def lookup(self, user_input: str, speaker: str = None) -> str:
+        """查找缓存的回复，未命中返回 None"""
+        vector, intent, bucket = self._key(user_input)
+        if intent is None:
+            return None
+        contrast = self._contrast(user_input)
+
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_sim = None, self.threshold
+            for entry_id, entry in list(self._entries.items()):
+                if entry["expires"] <= now:
+                    del self._entries[entry_id]
+                    continue
+                if entry["intent"] != intent or entry["speaker"] != speaker or entry["bucket"] != bucket:
+                    continue
+                if entry["contrast"] != contrast:
+                    continue
+                sim = float(entry["vector"] @ vector)
+                if sim >= best_sim:
+                    best_id, best_sim = entry_id, sim
+
+            if best_id is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.stats["hits"] += 1
+            return self._entries[best_id]["reply"]
+
+    def store(self, user_input: str, speaker: str, reply: str):
+        """缓存一条回复（输入不属于已启用意图时忽略）"""
+        if not reply:
+            return
+        vector, intent, bucket = self._key(user_input)
+        if intent is None:
+            return
+
+        ttl = self.intents[intent].get("ttl", self.ttl)
+        with self._lock:
+            self._entries[self._next_id] = {
+                "intent": intent,
+                "speaker": speaker,
+                "bucket": bucket,
+                "contrast": self._contrast(user_input),
+                "vector": vector,
+                "reply": reply,
+                "expires": time.monotonic() + ttl
+            }
+            self._next_id += 1
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存（人格等影响回复的设置变化后调用）"""
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,82 @@
+# AI成长机器人 - 滚动对话摘要
+# 被挤出短期记忆的旧对话不直接丢掉，而是增量合并进一段简短摘要，长对话的提示词长度保持有界
+
+import threading
+
+
+class RollingSummary:
+    """
+    本次会话的滚动摘要
+
+    - add()：短期记忆淘汰一轮对话时调用，只排队，不阻塞对话
+    - update()：在后台把排队的对话和已有摘要一起交给 summarize_fn，生成新摘要
+    - text：当前摘要（提示词中放在人格之后、短期对话之前）
+
+    摘要生成失败时保留旧摘要，排队的对话下次再合并。
+    """
+
+    def __init__(self, summarize_fn, count_tokens, max_tokens: int = 200, batch_turns: int = 2):
+        """
+        Args:
+            summarize_fn: 摘要函数 (已有摘要, [(用户, 回复)]) -> 新摘要
+            count_tokens: token 计数函数 text -> int
+            max_tokens: 摘要的 token 上限（超出时截断最早的部分）
+            batch_turns: 攒够多少轮才合并一次（减少摘要请求次数）
+        """
+        self.summarize_fn = summarize_fn
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.batch_turns = batch_turns
+        self.text = ""
+        self.tokens = 0
+        self.folded_turns = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._updating = threading.Lock()
+
+    def add(self, conversation: list):
+        """排队一轮被淘汰的对话（[user 条目, assistant 条目]）"""
+        with self._lock:
+            self._pending.append((conversation[0]["content"], conversation[1]["content"]))
+
+    def ready(self) -> bool:
+        """是否攒够了需要合并的对话"""
+        with self._lock:
+            return len(self._pending) >= self.batch_turns
+
+    def update(self) -> bool:
+        """
+        把排队的对话合并进摘要（可在后台线程调用，同时只会有一个在执行）
+
+        Returns:
+            是否更新了摘要
+        """
+        if not self._updating.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                turns = list(self._pending)
+            if not turns:
+                return False
+
+            summary = (self.summarize_fn(self.text, turns) or "").strip()
+            if not summary:
+                return False
+
+            # 模型没遵守长度要求时，保留摘要末尾（较新的内容）
+            while self.count_tokens(summary) > self.max_tokens and len(summary) > 1:
+                summary = summary[len(summary) // 10 or 1:]
+
+            with self._lock:
+                del self._pending[:len(turns)]
+            self.text = summary
+            self.tokens = self.count_tokens(summary)
+            self.folded_turns += len(turns)
+            return True
+        finally:
+            self._updating.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {"tokens": self.tokens, "folded_turns": self.folded_turns, "pending_turns": pending}
@@ -0,0 +1,380 @@
+# AI成长机器人 - 后端路由
+# 每个后端一个熔断器 + 滚动延迟统计；云端迟迟不出首 token 时切换（或对冲）到本地模型
+
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(RuntimeError):
+    """后端处于熔断状态，且没有可用的降级后端"""
+
+
+class BackendHealth:
+    """
+    单个后端的健康状态（熔断器）
+
+    closed    —— 正常，请求直接放行
+    open      —— 连续失败 failure_threshold 次后熔断，open_seconds 秒内不再请求
+    half_open —— 熔断到期后只放行一个探测请求，成功则恢复，失败则重新熔断
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, open_seconds: float = 30.0, window: int = 50):
+        """
+        Args:
+            name: 后端名（用于日志）
+            failure_threshold: 连续失败多少次后熔断
+            open_seconds: 熔断持续时间（秒），之后进入半开状态
+            window: 延迟统计保留最近多少次请求
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """当前是否可以向该后端发请求"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self):
+        """放弃进行中的探测（请求在出结果前被取消），下次 allow() 重新放行一个探测"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self, latency: float = None):
+        """请求成功（latency 为首 token / 整体响应耗时，秒）"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"[INFO] 后端 {self.name} 已恢复")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+            if latency is not None:
+                self._latencies.append(latency)
+
+    def record_failure(self):
+        """请求失败（异常、超时或首 token 超过截止时间）"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"[WARN] 后端 {self.name} 熔断 {self.open_seconds:.0f}s（连续失败 {self.failures} 次）")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def percentile(self, p: float) -> float:
+        """最近请求延迟的 p 分位数（秒），没有数据时返回 None"""
+        with self._lock:
+            if not self._latencies:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        """健康状态摘要"""
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "samples": len(self._latencies),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95)
+        }
+
+
+class BackendRouter:
+    """
+    主后端 + 本地降级后端的路由
+
+    - 主后端熔断时，请求直接走降级后端，不再每轮都等一次超时
+    - 降级后端也有自己的熔断器：它熔断中时不再降级过去，直接报错
+    - 异步流式请求（astream）有首 token 截止时间（根据主后端 p95 延迟自适应，不超过 first_token_deadline）：
+        hedge=False：超时即放弃主后端，改走降级后端
+        hedge=True ：超时后同时请求降级后端，谁先出首 token 用谁
+      同步 stream() 没有首 token 截止时间，只靠客户端自身的请求超时
+    """
+
+    _END = object()
+
+    def __init__(self, primary: str, fallback: str = None, first_token_deadline: float = 3.0,
+                 min_deadline: float = 1.0, hedge: bool = False,
+                 failure_threshold: int = 3, open_seconds: float = 30.0, window: int = 50):
+        """
+        Args:
+            primary: 主后端名
+            fallback: 降级后端名（None 表示不降级）
+            first_token_deadline: 首 token 截止时间上限（秒）
+            min_deadline: 首 token 截止时间下限（秒）
+            hedge: 超过截止时间后是否对冲（同时请求降级后端）
+            failure_threshold / open_seconds / window: 见 BackendHealth
+        """
+        self.primary = primary
+        self.fallback = fallback
+        self.max_deadline = first_token_deadline
+        self.min_deadline = min_deadline
+        self.hedge = hedge
+        self.health = {
+            name: BackendHealth(name, failure_threshold, open_seconds, window)
+            for name in (primary, fallback) if name
+        }
+
+    def first_token_deadline(self) -> float:
+        """主后端首 token 截止时间：p95 × 1.5，限制在 [min_deadline, first_token_deadline]"""
+        p95 = self.health[self.primary].percentile(95)
+        if p95 is None:
+            return self.max_deadline
+        return min(self.max_deadline, max(self.min_deadline, p95 * 1.5))
+
+    def _can_fallback(self, fallback_fn) -> bool:
+        return fallback_fn is not None and self.fallback is not None
+
+    def _allow_fallback(self) -> bool:
+        """降级前检查降级后端的熔断器（半开时同样只放行一个探测）"""
+        if self.health[self.fallback].allow():
+            return True
+        print(f"[WARN] 降级后端 {self.fallback} 熔断中，不再降级")
+        return False
+
+    def call(self, primary_fn, fallback_fn=None):
+        """
+        同步调用：主后端熔断或失败时调用降级后端
+
+        路由随结果一起返回（不放在路由器上），后台任务并发调用时不会互相覆盖。
+
+        Args:
+            primary_fn: 主后端调用 () -> 结果
+            fallback_fn: 降级后端调用 () -> 结果（可选）
+
+        Returns:
+            (实际服务的后端名, 结果)
+        """
+        if self.health[self.primary].allow():
+            start = time.monotonic()
+            try:
+                result = primary_fn()
+            except Exception as e:
+                self.health[self.primary].record_failure()
+                if not self._can_fallback(fallback_fn) or not self._allow_fallback():
+                    raise
+                print(f"[ERROR] {self.primary} 调用失败，降级到 {self.fallback}: {e!r}")
+            else:
+                self.health[self.primary].record_success(time.monotonic() - start)
+                return self.primary, result
+        elif not self._can_fallback(fallback_fn) or not self._allow_fallback():
+            raise CircuitOpenError(f"后端 {self.primary} 熔断中")
+
+        start = time.monotonic()
+        try:
+            result = fallback_fn()
+        except Exception:
+            self.health[self.fallback].record_failure()
+            raise
+        self.health[self.fallback].record_success(time.monotonic() - start)
+        return self.fallback, result
+
+    async def acall(self, primary_fn, fallback_fn=None):
+        """异步调用（参数为返回协程的函数），逻辑同 call()，返回 (后端名, 结果)"""
+        if self.health[self.primary].allow():
+            start = time.monotonic()
+            try:
+                result = await primary_fn()
+            except Exception as e:
+                self.health[self.primary].record_failure()
+                if not self._can_fallback(fallback_fn) or not self._allow_fallback():
+                    raise
+                print(f"[ERROR] {self.primary} 调用失败，降级到 {self.fallback}: {e!r}")
+            else:
+                self.health[self.primary].record_success(time.monotonic() - start)
+                return self.primary, result
+        elif not self._can_fallback(fallback_fn) or not self._allow_fallback():
+            raise CircuitOpenError(f"后端 {self.primary} 熔断中")
+
+        start = time.monotonic()
+        try:
+            result = await fallback_fn()
+        except Exception:
+            self.health[self.fallback].record_failure()
+            raise
+        self.health[self.fallback].record_success(time.monotonic() - start)
+        return self.fallback, result
+
+    def stream(self, primary_factory, fallback_factory=None):
+        """
+        同步流式调用：主后端熔断或首 token 前失败时改走降级后端；
+        已经输出内容后失败不再降级（避免同一轮回复说两遍）
+
+        没有首 token 截止时间（同步生成器无法在等待中途切换），主后端迟迟不出首 token
+        时只能等客户端请求超时；需要截止时间 / 对冲的调用方请用 astream()。
+
+        Args:
+            primary_factory: () -> 主后端 token 生成器
+            fallback_factory: () -> 降级后端 token 生成器（可选）
+
+        Yields:
+            (实际服务的后端名, token)
+        """
+        routes = []
+        if self.health[self.primary].allow():
+            routes.append((self.primary, primary_factory))
+        elif not self._can_fallback(fallback_factory):
+            raise CircuitOpenError(f"后端 {self.primary} 熔断中")
+        if self._can_fallback(fallback_factory):
+            routes.append((self.fallback, fallback_factory))
+
+        error = None
+        for i, (name, factory) in enumerate(routes):
+            if name != self.primary and not self._allow_fallback():
+                if error is not None:
+                    raise error
+                raise CircuitOpenError(f"后端 {self.primary} 熔断中")
+            start = time.monotonic()
+            started = False
+            try:
+                for token in factory():
+                    if not started:
+                        started = True
+                        self.health[name].record_success(time.monotonic() - start)
+                    yield name, token
+                if not started:
+                    self.health[name].record_success(time.monotonic() - start)
+                return
+            except Exception as e:
+                self.health[name].record_failure()
+                if started or i == len(routes) - 1:
+                    raise
+                error = e
+                print(f"[ERROR] {name} 调用失败，降级到 {self.fallback}: {e!r}")
+
+    async def astream(self, primary_factory, fallback_factory=None):
+        """
+        异步流式调用（带首 token 截止时间和可选对冲）
+
+        Args:
+            primary_factory: () -> 主后端异步 token 生成器
+            fallback_factory: () -> 降级后端异步 token 生成器（可选）
+
+        Yields:
+            (实际服务的后端名, token)
+        """
+        name, stream, token = await self._race_first_token(primary_factory, fallback_factory)
+        try:
+            if token is self._END:
+                return
+            yield name, token
+            async for token in stream:
+                yield name, token
+        except Exception:
+            self.health[name].record_failure()
+            raise
+        finally:
+            await stream.aclose()
+
+    @staticmethod
+    def _start(pending: dict, name: str, factory):
+        stream = factory()
+        task = asyncio.ensure_future(stream.__anext__())
+        pending[task] = (name, stream, time.monotonic())
+
+    async def _cancel(self, pending: dict):
+        """取消尚未出首 token 的请求并关闭其流（释放半开探测，否则熔断器永远不再放行）"""
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for name, stream, start in pending.values():
+            self.health[name].release()
+            await stream.aclose()
+        pending.clear()
+
+    async def _race_first_token(self, primary_factory, fallback_factory):
+        """
+        等待首 token
+
+        Returns:
+            (后端名, 流, 首 token 或 _END)
+        """
+        can_fallback = self._can_fallback(fallback_factory)
+        pending = {}
+        fallback_started = False
+
+        if self.health[self.primary].allow():
+            self._start(pending, self.primary, primary_factory)
+        elif can_fallback and self._allow_fallback():
+            self._start(pending, self.fallback, fallback_factory)
+            fallback_started = True
+        else:
+            raise CircuitOpenError(f"后端 {self.primary} 熔断中")
+
+        deadline = self.first_token_deadline()
+        error = None
+        try:
+            while pending:
+                timeout = deadline if can_fallback and not fallback_started else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # 主后端超过首 token 截止时间；降级后端也熔断时只能继续等主后端
+                    if not self._allow_fallback():
+                        can_fallback = False
+                        continue
+                    if self.hedge:
+                        print(f"[INFO] {self.primary} 首 token 超过 {deadline:.1f}s，同时请求 {self.fallback}")
+                    else:
+                        print(f"[WARN] {self.primary} 首 token 超过 {deadline:.1f}s，改用 {self.fallback}")
+                        self.health[self.primary].record_failure()
+                        await self._cancel(pending)
+                    self._start(pending, self.fallback, fallback_factory)
+                    fallback_started = True
+                    continue
+
+                for task in done:
+                    name, stream, start = pending.pop(task)
+                    try:
+                        token = task.result()
+                    except StopAsyncIteration:
+                        token = self._END
+                    except Exception as e:
+                        error = e
+                        self.health[name].record_failure()
+                        print(f"[ERROR] {name} 调用失败: {e!r}")
+                        await stream.aclose()
+                        continue
+
+                    self.health[name].record_success(time.monotonic() - start)
+                    # 对冲中输掉的主后端同样记为失败（比截止时间 + 本地首 token 还慢）
+                    for loser, _, _ in pending.values():
+                        if loser == self.primary:
+                            self.health[loser].record_failure()
+                    return name, stream, token
+
+                if not pending and can_fallback and not fallback_started and self._allow_fallback():
+                    self._start(pending, self.fallback, fallback_factory)
+                    fallback_started = True
+        finally:
+            if pending:
+                await self._cancel(pending)
+
+        raise error
+
+    def snapshot(self) -> dict:
+        """各后端健康状态"""
+        return {name: health.snapshot() for name, health in self.health.items()}
@@ -0,0 +1,79 @@
+# AI成长机器人 - 流式回复分句
+# 把 LLM 逐 token 输出切成可以立刻送去 TTS 的句子/分句
+
+
+class SentenceSegmenter:
+    """
+    流式分句器
+
+    用法：
+        seg = SentenceSegmenter()
+        for token in stream:
+            for sentence in seg.push(token):
+                speak(sentence)
+        tail = seg.flush()
+    """
+
+    # 句末标点：遇到即切分
+    SENTENCE_ENDS = "。！？!?；;…\n"
+    # 分句标点：累计够长才切分（让首句尽快出声，又不至于太碎）
+    CLAUSE_ENDS = "，,、：:"
+    # 紧跟在句末标点后的收尾符号，应归入前一句
+    CLOSERS = "”’」』）)】~～"
+
+    def __init__(self, min_chars: int = 4, clause_chars: int = 12, max_chars: int = 60):
+        """
+        Args:
+            min_chars: 句子最少字符数，太短的句子并入下一句（避免"嗯。"单独合成）
+            clause_chars: 在逗号处切分所需的最少字符数
+            max_chars: 没有标点时的强制切分长度
+        """
+        self.min_chars = min_chars
+        self.clause_chars = clause_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+
+    def push(self, token: str) -> list:
+        """加入一段 token，返回已完整的句子列表（可能为空）"""
+        if not token:
+            return []
+        self.buffer += token
+
+        segments = []
+        start = 0
+        i = 0
+        n = len(self.buffer)
+        while i < n:
+            ch = self.buffer[i]
+            length = i + 1 - start
+            cut = False
+
+            if ch in self.SENTENCE_ENDS:
+                # 连续标点（"！！"、"..."）和收尾引号一并带上
+                while i + 1 < n and (self.buffer[i + 1] in self.SENTENCE_ENDS or
+                                     self.buffer[i + 1] in self.CLOSERS):
+                    i += 1
+                # 标点在缓冲区末尾时，后面可能还有收尾符号，等下一个 token 再决定
+                if i + 1 >= n:
+                    break
+                cut = i + 1 - start >= self.min_chars
+            elif ch in self.CLAUSE_ENDS:
+                cut = length >= self.clause_chars
+            elif length >= self.max_chars:
+                cut = True
+
+            if cut:
+                segment = self.buffer[start:i + 1].strip()
+                if segment:
+                    segments.append(segment)
+                start = i + 1
+            i += 1
+
+        self.buffer = self.buffer[start:]
+        return segments
+
+    def flush(self) -> str:
+        """返回缓冲区中剩余的文本并清空"""
+        tail = self.buffer.strip()
+        self.buffer = ""
+        return tail
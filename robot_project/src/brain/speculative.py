@@ -0,0 +1,114 @@
+# AI成长机器人 - 推测式记忆检索
+# 利用 ASR 中间结果提前搜索记忆，把 Chroma 查询从每轮对话的关键路径上拿掉
+
+import re
+import time
+from difflib import SequenceMatcher
+
+
+def normalize_text(text: str) -> str:
+    """去掉标点和空白（最终结果会补标点，中间结果通常没有）"""
+    return re.sub(r'[\s，,。.！!？?、；;：:“”"\'…~～]', '', text or '').lower()
+
+
+def text_similarity(a: str, b: str) -> float:
+    """两段文本的相似度（0~1，忽略标点）"""
+    a, b = normalize_text(a), normalize_text(b)
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+class SpeculativeRetriever:
+    """
+    推测式记忆检索
+
+    - update_partial(): ASR 每次给出中间结果时调用。中间结果"稳定"
+      （在上一条中间结果基础上继续增长、且足够长）时提交一次后台检索；
+      中间结果变化较大时取消未开始的旧检索并重新提交。
+    - take(): 拿到最终文本后调用。若推测检索的查询与最终文本足够相似，
+      返回该检索的 Future，否则返回 None（由调用方正常检索）。
+    """
+
+    def __init__(self, search_fn, executor, min_chars: int = 4,
+                 refresh_ratio: float = 0.9, reuse_ratio: float = 0.8, max_age: float = 10.0):
+        """
+        Args:
+            search_fn: 检索函数 query -> dict
+            executor: 执行检索的线程池（与记忆读写共用，保证顺序）
+            min_chars: 中间结果至少多少个字才开始推测
+            refresh_ratio: 中间结果与正在进行的推测查询相似度低于此值时重新检索
+            reuse_ratio: 最终文本与推测查询相似度不低于此值时复用结果
+            max_age: 推测结果的最长有效时间（秒）
+        """
+        self.search_fn = search_fn
+        self.executor = executor
+        self.min_chars = min_chars
+        self.refresh_ratio = refresh_ratio
+        self.reuse_ratio = reuse_ratio
+        self.max_age = max_age
+
+        self._last_partial = ""
+        self._query = None
+        self._future = None
+        self._started_at = 0.0
+
+        # 统计：提交次数 / 命中次数 / 未命中次数
+        self.stats = {"submitted": 0, "hits": 0, "misses": 0}
+
+    def _is_stable(self, text: str) -> bool:
+        """中间结果是否稳定：足够长，且是在上一条中间结果基础上的延续"""
+        current = normalize_text(text)
+        if len(current) < self.min_chars:
+            return False
+        previous = normalize_text(self._last_partial)
+        return bool(previous) and current.startswith(previous[:max(1, len(previous) - 1)])
+
+    def update_partial(self, text: str):
+        """收到 ASR 中间结果"""
+        stable = self._is_stable(text)
+        self._last_partial = text
+        if not stable:
+            return
+
+        # 正在进行的推测与当前中间结果足够接近，无需刷新
+        if self._query is not None and text_similarity(self._query, text) >= self.refresh_ratio:
+            return
+
+        self.cancel()
+        self._query = text
+        self._started_at = time.monotonic()
+        self._future = self.executor.submit(self.search_fn, text)
+        self.stats["submitted"] += 1
+
+    def take(self, final_text: str):
+        """
+        取出与最终文本匹配的推测检索
+
+        Returns:
+            concurrent.futures.Future 或 None
+        """
+        future, query = self._future, self._query
+        fresh = time.monotonic() - self._started_at <= self.max_age
+        self._future = None
+        self._query = None
+        self._last_partial = ""
+
+        if future is None:
+            return None
+        if fresh and not future.cancelled() and text_similarity(query, final_text) >= self.reuse_ratio:
+            self.stats["hits"] += 1
+            return future
+
+        future.cancel()
+        self.stats["misses"] += 1
+        return None
+
+    def cancel(self):
+        """放弃当前推测（未开始的检索会被取消，已开始的结果被丢弃）"""
+        if self._future is not None:
+            self._future.cancel()
+        self._future = None
+        self._query = None
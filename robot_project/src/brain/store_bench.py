@@ -0,0 +1,234 @@
+# AI成长机器人 - 记忆存储后端基准测试
+# 对比 ChromaDB 与 NumpyStore 的冷启动打开耗时、常驻内存（RSS）和检索延迟，每个后端在独立子进程中测量
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 支持 python src/brain/store_bench.py 直接运行（把项目根目录加入路径）
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
+BACKENDS = ["chroma", "numpy"]
+
+
+def _rss_mb() -> float:
+    """当前进程常驻内存（MB）"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+# ==================== 子进程：测量单个后端 ====================
+
+def run_worker(backend: str, path: str, collection_name: str, queries_file: str, n_results: int) -> dict:
+    """
+    在当前（全新的）进程里打开存储并检索
+
+    Returns:
+        {"backend", "open_ms", "rss_base_mb", "rss_open_mb", "rss_query_mb",
+         "first_query_ms", "p50_ms", "p95_ms", "ids"}
+    """
+    queries = np.load(queries_file)
+    rss_base = _rss_mb()
+
+    t0 = time.perf_counter()
+    if backend == "chroma":
+        import chromadb
+        collection = chromadb.PersistentClient(path=path).get_collection(collection_name)
+    else:
+        from src.brain.vector_store import NumpyStore
+        collection = NumpyStore(os.path.join(path, "vectors")).collection(collection_name)
+    open_ms = (time.perf_counter() - t0) * 1000
+    rss_open = _rss_mb()
+
+    latencies = []
+    ids = []
+    first_query_ms = None
+    for query in queries:
+        t0 = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=n_results,
+                                  include=["documents", "distances"])
+        elapsed = (time.perf_counter() - t0) * 1000
+        if first_query_ms is None:
+            first_query_ms = elapsed  # 首次检索包含索引加载
+        else:
+            latencies.append(elapsed)
+        ids.append(result["ids"][0])
+
+    return {
+        "backend": backend,
+        "open_ms": open_ms,
+        "rss_base_mb": rss_base,
+        "rss_open_mb": rss_open,
+        "rss_query_mb": _rss_mb(),
+        "first_query_ms": first_query_ms,
+        "p50_ms": _percentile(latencies, 50) if latencies else None,
+        "p95_ms": _percentile(latencies, 95) if latencies else None,
+        "ids": ids
+    }
+
+
+# ==================== 主进程 ====================
+
+def build_synthetic(path: str, docs: int, dim: int, seed: int = 0):
+    """生成合成数据（随机单位向量），同时写入 ChromaDB 和 NumpyStore"""
+    import chromadb
+    from src.brain.vector_store import NumpyStore
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((docs, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"conv_{i}" for i in range(docs)]
+    documents = [f"用户说：合成对话 {i}\n机器人回复：好的" for i in range(docs)]
+    metadatas = [{"time": f"2026-01-01T00:00:{i % 60:02d}", "type": "conv"} for i in range(docs)]
+
+    client = chromadb.PersistentClient(path=path)
+    chroma = client.get_or_create_collection("long_term_memory", metadata={"description": "对话记忆"})
+    numpy_store = NumpyStore(os.path.join(path, "vectors"))
+    store = numpy_store.collection("long_term_memory", "对话记忆")
+    batch = client.get_max_batch_size()
+    for start in range(0, docs, batch):
+        end = start + batch
+        chroma.add(ids=ids[start:end], documents=documents[start:end], metadatas=metadatas[start:end],
+                   embeddings=vectors[start:end])
+        store.add(ids[start:end], documents[start:end], metadatas[start:end], vectors[start:end])
+    numpy_store.close()
+
+
+def load_vectors(path: str, collection_name: str) -> tuple:
+    """从 ChromaDB 读出原始 float32 向量（作为精确检索的基准）"""
+    import chromadb
+    collection = chromadb.PersistentClient(path=path).get_collection(collection_name)
+    got = collection.get(include=["embeddings"])
+    if not got["ids"]:
+        raise RuntimeError(f"ChromaDB 中没有 {collection_name} 的数据")
+    return got["ids"], np.asarray(got["embeddings"], dtype=np.float32)
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int = 0) -> np.ndarray:
+    """从库中随机取向量加噪声作为查询（模拟与已有记忆相关的提问，不需要嵌入模型）"""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), count)]
+    queries = queries + rng.normal(0, 0.05, queries.shape).astype(np.float32)
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_top_k(ids: list, vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """float32 精确 L2 检索的 top-k id（召回率基准）"""
+    distances = (vectors ** 2).sum(axis=1)[None, :] - 2 * queries @ vectors.T
+    top = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    return [[ids[i] for i in row] for row in top]
+
+
+def run_benchmark(db_path: str = None, collection_name: str = "long_term_memory", docs: int = 5000,
+                  dim: int = 384, queries: int = 200, n_results: int = 3, seed: int = 0) -> dict:
+    """
+    Args:
+        db_path: 真实记忆库路径（需已用 migrate_store.py 迁移）；None 时使用合成数据
+        collection_name: 测量的集合
+        docs / dim: 合成数据的条数和维度
+        queries: 查询次数
+        n_results: 每次返回条数
+
+    Returns:
+        {"docs", "n_results", "backends": {后端: 结果（含 recall）}}
+    """
+    tmp_dir = tempfile.mkdtemp(prefix="store_bench_")
+    try:
+        path = db_path
+        if path is None:
+            path = os.path.join(tmp_dir, "memory")
+            print(f"🧪 生成合成数据: {docs} 条 × {dim} 维")
+            build_synthetic(path, docs, dim, seed)
+
+        ids, vectors = load_vectors(path, collection_name)
+        query_vectors = make_queries(vectors, queries, seed)
+        truth = exact_top_k(ids, vectors, query_vectors, n_results)
+        queries_file = os.path.join(tmp_dir, "queries.npy")
+        np.save(queries_file, query_vectors)
+
+        results = {}
+        for backend in BACKENDS:
+            proc = subprocess.run(
+                [sys.executable, "-m", "src.brain.store_bench", "--worker", backend, "--db-path", path,
+                 "--collection", collection_name, "--queries-file", queries_file, "--n-results", str(n_results)],
+                cwd=_PROJECT_ROOT, capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                raise RuntimeError(f"{backend} 测量失败:\n{proc.stderr}")
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            # recall@k：相对 float32 精确检索（HNSW 为近似检索，NumpyStore 存储为 float16）
+            hits = [len(set(got) & set(expected)) / max(1, len(expected))
+                    for got, expected in zip(result.pop("ids"), truth)]
+            result["recall"] = sum(hits) / len(hits) if hits else None
+            results[backend] = result
+
+        return {
+            "docs": len(ids),
+            "n_results": n_results,
+            "backends": results
+        }
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def print_report(report: dict):
+    print(f"📊 记忆存储后端对比（{report['docs']} 条，top-{report['n_results']}）")
+    print(f"   {'后端':<8}{'打开ms':>9}{'RSS增量MB':>11}{'检索后MB':>10}{'首次ms':>9}{'p50ms':>8}{'p95ms':>8}"
+          f"{'召回率':>8}")
+    for backend, r in report["backends"].items():
+        print(f"   {backend:<10}{r['open_ms']:>9.1f}{r['rss_open_mb'] - r['rss_base_mb']:>11.1f}"
+              f"{r['rss_query_mb'] - r['rss_base_mb']:>10.1f}{r['first_query_ms']:>9.2f}"
+              f"{r['p50_ms']:>8.3f}{r['p95_ms']:>8.3f}{r['recall']:>10.1%}")
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="记忆存储后端基准测试（ChromaDB vs NumpyStore）")
+    parser.add_argument("--db-path", default=None, help="真实记忆库路径（需先运行 migrate_store.py），默认使用合成数据")
+    parser.add_argument("--collection", default="long_term_memory", help="测量的集合")
+    parser.add_argument("--docs", type=int, default=5000, help="合成数据条数")
+    parser.add_argument("--dim", type=int, default=384, help="合成数据向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询次数")
+    parser.add_argument("--n-results", type=int, default=3, help="每次返回条数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--json", default=None, help="把报告写入 JSON 文件")
+    parser.add_argument("--worker", choices=BACKENDS, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--queries-file", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker, args.db_path, args.collection, args.queries_file, args.n_results)
+        print(json.dumps(result))
+        return
+
+    report = run_benchmark(args.db_path, args.collection, args.docs, args.dim, args.queries,
+                           args.n_results, args.seed)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# AI成长机器人 - HTTP 连接池
+# 云端大模型共用的长连接池：复用 TCP/TLS 连接、空闲时定期保活，并统计建连耗时
+
+import asyncio
+import threading
+import time
+
+import httpx
+
+try:
+    import h2  # noqa: F401  HTTP/2 需要 h2 包（pip install h2）
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# SSE 结束标记之后最多再读多少字节（通常只剩分块编码的结束块）
+_DRAIN_LIMIT = 64 * 1024
+
+# 保活请求的 extensions 标记：不计入请求数，建的连接单独统计
+_KEEP_WARM = "robot_keep_warm"
+
+
+class _SSEBody:
+    """
+    记录响应体末尾的字节，用于判断 SSE 流是否已经发送了 [DONE]
+
+    openai SDK 读到 [DONE] 就关闭响应，此时服务端的分块结束标记往往还没读，
+    httpcore 会认为响应没读完而直接断开连接，下一轮流式请求只能重新建连。
+    已经读到 [DONE] 时先把剩余的几个字节读完再关闭，连接就能回到连接池；
+    没读到（被打断、取消）时照常关闭，不等待剩余的生成内容。
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._tail = b""
+
+    def _seen(self, chunk: bytes):
+        self._tail = (self._tail + chunk)[-32:]
+
+    @property
+    def finished(self) -> bool:
+        return b"[DONE]" in self._tail
+
+
+class _DrainingStream(_SSEBody, httpx.SyncByteStream):
+    def __iter__(self):
+        for chunk in self._stream:
+            self._seen(chunk)
+            yield chunk
+
+    def close(self):
+        if self.finished:
+            drained = 0
+            for chunk in self._stream:
+                drained += len(chunk)
+                if drained > _DRAIN_LIMIT:
+                    break
+        self._stream.close()
+
+
+class _AsyncDrainingStream(_SSEBody, httpx.AsyncByteStream):
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._seen(chunk)
+            yield chunk
+
+    async def aclose(self):
+        if self.finished:
+            drained = 0
+            async for chunk in self._stream:
+                drained += len(chunk)
+                if drained > _DRAIN_LIMIT:
+                    break
+        await self._stream.aclose()
+
+
+class _PooledTransport(httpx.HTTPTransport):
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        response = super().handle_request(request)
+        response.stream = _DrainingStream(response.stream)
+        return response
+
+
+class _AsyncPooledTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await super().handle_async_request(request)
+        response.stream = _AsyncDrainingStream(response.stream)
+        return response
+
+
+class HTTPTransport:
+    """
+    OpenAI 兼容后端的共享 HTTP 传输层
+
+    同步和异步 OpenAI 客户端都使用这里的 httpx 客户端：
+    - 长连接池（max_connections / max_keepalive / keepalive_expiry），避免每轮重新 DNS + TCP + TLS
+    - 可用时启用 HTTP/2（一个连接上多路复用，对冲/并发请求不再额外建连）
+    - 连接超时与读取超时分开设置，网络不通时尽快失败（交给路由降级）
+    - 空闲超过 keep_warm_interval 秒时发一个轻量请求，防止连接被服务端或 NAT 回收
+    - 流式响应读到 [DONE] 后补读结束块，让连接回到连接池（见 _SSEBody）
+    - 通过 httpcore 的 trace 扩展统计新建连接数、TCP（含 DNS）和 TLS 耗时
+      （保活请求不计入请求数和复用数，它新建的连接记在 ping_connections）
+    """
+
+    def __init__(self, base_url: str, timeout: float = 20.0, connect_timeout: float = 5.0,
+                 http2: bool = True, max_connections: int = 10, max_keepalive: int = 5,
+                 keepalive_expiry: float = 120.0, keep_warm_interval: float = 60.0):
+        """
+        Args:
+            base_url: 后端地址（保活请求发往这里）
+            timeout: 读写/总超时（秒）
+            connect_timeout: 建连超时（秒）
+            http2: 是否启用 HTTP/2（未安装 h2 时自动回退 HTTP/1.1）
+            max_connections: 连接池最大连接数
+            max_keepalive: 最多保留多少个空闲长连接
+            keepalive_expiry: 空闲连接保留时间（秒），应大于 keep_warm_interval
+            keep_warm_interval: 空闲保活间隔（秒），0 表示不保活
+        """
+        self.base_url = base_url
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.keep_warm_interval = keep_warm_interval
+
+        timeout_config = httpx.Timeout(timeout, connect=connect_timeout)
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.client = httpx.Client(
+            transport=_PooledTransport(http2=self.http2, limits=limits),
+            timeout=timeout_config,
+            event_hooks={"request": [self._on_request]}
+        )
+        self.async_client = httpx.AsyncClient(
+            transport=_AsyncPooledTransport(http2=self.http2, limits=limits),
+            timeout=timeout_config,
+            event_hooks={"request": [self._aon_request]}
+        )
+
+        self._lock = threading.Lock()
+        # 同步/异步连接池各自的最近请求时间（两个池互不共享连接，分别保活）
+        self._last_request = {False: time.monotonic(), True: time.monotonic()}
+        self._keep_warm_stop = threading.Event()
+        self.stats = {
+            "requests": 0,
+            "connections": 0,
+            "connect_ms": 0.0,      # 累计 TCP 建连耗时（含 DNS）
+            "tls_ms": 0.0,          # 累计 TLS 握手耗时
+            "last_connect_ms": None,
+            "last_tls_ms": None,
+            "pings": 0,
+            "ping_failures": 0,
+            "ping_connections": 0   # 保活请求新建的连接（不计入 connections）
+        }
+
+    # ==================== 建连统计 ====================
+
+    def _record(self, name: str, elapsed_ms: float, keep_warm: bool = False):
+        with self._lock:
+            if keep_warm:
+                # 保活建连发生在空闲期，不算对话请求付出的建连开销
+                if name == "connection.connect_tcp":
+                    self.stats["ping_connections"] += 1
+            elif name == "connection.connect_tcp":
+                self.stats["connections"] += 1
+                self.stats["connect_ms"] += elapsed_ms
+                self.stats["last_connect_ms"] = round(elapsed_ms, 1)
+            elif name == "connection.start_tls":
+                self.stats["tls_ms"] += elapsed_ms
+                self.stats["last_tls_ms"] = round(elapsed_ms, 1)
+
+    def _make_trace(self, keep_warm: bool = False):
+        started = {}
+
+        def trace(event: str, info: dict):
+            name, _, phase = event.rpartition(".")
+            if phase == "started":
+                started[name] = time.perf_counter()
+            elif phase == "complete" and name in started:
+                self._record(name, (time.perf_counter() - started.pop(name)) * 1000, keep_warm)
+
+        return trace
+
+    def _count_request(self, request: httpx.Request, is_async: bool) -> bool:
+        """记录请求时间；返回是否为保活请求（保活请求不计入请求数）"""
+        keep_warm = bool(request.extensions.get(_KEEP_WARM))
+        with self._lock:
+            if not keep_warm:
+                self.stats["requests"] += 1
+            self._last_request[is_async] = time.monotonic()
+        return keep_warm
+
+    def _on_request(self, request: httpx.Request):
+        keep_warm = self._count_request(request, False)
+        request.extensions["trace"] = self._make_trace(keep_warm)
+
+    async def _aon_request(self, request: httpx.Request):
+        keep_warm = self._count_request(request, True)
+        trace = self._make_trace(keep_warm)
+
+        async def atrace(event: str, info: dict):
+            trace(event, info)
+
+        request.extensions["trace"] = atrace
+
+    def snapshot(self) -> dict:
+        """连接统计（平均值按新建连接数计算；请求数、复用数只含对话等业务请求）"""
+        with self._lock:
+            stats = dict(self.stats)
+        connections = stats["connections"]
+        stats["connect_ms"] = round(stats["connect_ms"] / connections, 1) if connections else None
+        stats["tls_ms"] = round(stats["tls_ms"] / connections, 1) if connections else None
+        stats["reused"] = max(0, stats["requests"] - connections)
+        stats["http2"] = self.http2
+        return stats
+
+    # ==================== 保活 ====================
+
+    def idle_seconds(self, is_async: bool = False) -> float:
+        """同步（或异步）连接池距最近一次请求的秒数"""
+        return time.monotonic() - self._last_request[is_async]
+
+    def _record_ping(self, ok: bool):
+        with self._lock:
+            self.stats["pings"] += 1
+            if not ok:
+                self.stats["ping_failures"] += 1
+
+    def ping(self) -> bool:
+        """同步保活请求（只关心连接是否可用，不关心状态码）"""
+        try:
+            self.client.head(self.base_url, extensions={_KEEP_WARM: True})
+            ok = True
+        except httpx.HTTPError:
+            ok = False
+        self._record_ping(ok)
+        return ok
+
+    async def aping(self) -> bool:
+        """异步保活请求"""
+        try:
+            await self.async_client.head(self.base_url, extensions={_KEEP_WARM: True})
+            ok = True
+        except httpx.HTTPError:
+            ok = False
+        self._record_ping(ok)
+        return ok
+
+    def start_keep_warm(self):
+        """启动同步连接池的保活线程（整理记忆等后台任务使用同步客户端）"""
+        if self.keep_warm_interval <= 0:
+            return
+        threading.Thread(target=self._keep_warm_loop, name="http-keep-warm", daemon=True).start()
+
+    def _keep_warm_loop(self):
+        while not self._keep_warm_stop.wait(self.keep_warm_interval):
+            if self.idle_seconds() >= self.keep_warm_interval:
+                self.ping()
+
+    async def akeep_warm(self):
+        """
+        异步连接池保活（在语音主循环的事件循环中作为后台任务运行，空闲监听期间保持连接）
+
+        对话请求使用异步客户端，连接池绑定在事件循环上，因此保活也必须在同一个循环里做。
+        """
+        if self.keep_warm_interval <= 0:
+            return
+        await self.aping()  # 启动时先建好连接，第一轮对话不再付建连开销
+        while not self._keep_warm_stop.is_set():
+            await asyncio.sleep(max(1.0, self.keep_warm_interval - self.idle_seconds(True)))
+            if self.idle_seconds(True) >= self.keep_warm_interval:
+                await self.aping()
+
+    def stop_keep_warm(self):
+        """停止保活（线程和异步任务在下一次检查时退出）"""
+        self._keep_warm_stop.set()
+
+    def close(self):
+        """停止保活并关闭同步连接池（异步连接池随事件循环结束回收）"""
+        self.stop_keep_warm()
+        self.client.close()
@@ -0,0 +1,599 @@
+# AI成长机器人 - 向量存储后端
+# Memory 只用到集合的 add / get / query / update / delete / count（ChromaDB 集合接口的子集），
+# 可以换成轻量的 NumpyStore：float16 内存映射矩阵 + SQLite 元数据，NumPy 向量化暴力检索
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+SPACES = ("l2", "cosine", "ip")
+
+# 索引参数 -> ChromaDB 集合元数据键（hnsw:* 元数据从 0.4 起各版本通用，1.x 会转换成 configuration）
+HNSW_METADATA_KEYS = {
+    "space": "hnsw:space",
+    "M": "hnsw:M",
+    "ef_construction": "hnsw:construction_ef",
+    "ef_search": "hnsw:search_ef",
+}
+
+# 未配置时 ChromaDB 使用的参数（0.x 的 hnswlib 默认值）
+HNSW_DEFAULTS = {"space": "l2", "M": 16, "ef_construction": 100, "ef_search": 10}
+
+NUMPY_STORE_UNSUPPORTED = '记忆库使用 numpy 存储后端（memory.store = "numpy"），本工具暂不支持，只能用于 ChromaDB 存储'
+
+
+def numpy_store_in_use(db_path: str, config_path: str = "config/api.json") -> bool:
+    """
+    记忆库当前是否使用 NumpyStore：配置 memory.store 为 numpy，或库里只有 <db_path>/vectors 而没有 ChromaDB 数据
+    （离线工具只支持 ChromaDB，迁移后 ChromaDB 数据已经过时，不能再改它）
+    """
+    if os.path.exists(config_path):
+        with open(config_path, "r", encoding="utf-8") as f:
+            if json.load(f).get("memory", {}).get("store", "chroma") == "numpy":
+                return True
+    return (not os.path.exists(os.path.join(db_path, "chroma.sqlite3"))
+            and os.path.exists(os.path.join(db_path, "vectors", "meta.sqlite3")))
+
+
+def hnsw_metadata(index: dict) -> dict:
+    """
+    索引参数 {"space", "M", "ef_construction", "ef_search"} -> ChromaDB 集合元数据
+
+    space / M / ef_construction 只在创建集合时生效，ef_search 之后可以修改
+    """
+    metadata = {}
+    for key, value in (index or {}).items():
+        if key not in HNSW_METADATA_KEYS:
+            raise ValueError(f"未知的索引参数: {key}（可用: {', '.join(HNSW_METADATA_KEYS)}）")
+        if key == "space" and value not in SPACES:
+            raise ValueError(f"未知的距离空间: {value}（可用: {', '.join(SPACES)}）")
+        if value is not None:
+            metadata[HNSW_METADATA_KEYS[key]] = value
+    return metadata
+
+
+def chroma_index_params(collection) -> dict:
+    """读取 ChromaDB 集合实际生效的索引参数"""
+    configuration = getattr(collection, "configuration", None)  # 1.x
+    hnsw = configuration.get("hnsw") if isinstance(configuration, dict) else None
+    if hnsw:
+        return {
+            "space": hnsw.get("space") or "l2",
+            "M": hnsw.get("max_neighbors"),
+            "ef_construction": hnsw.get("ef_construction"),
+            "ef_search": hnsw.get("ef_search"),
+        }
+    metadata = collection.metadata or {}
+    return {key: metadata.get(meta_key, HNSW_DEFAULTS[key]) for key, meta_key in HNSW_METADATA_KEYS.items()}
+
+
+def set_ef_search(collection, ef_search: int) -> bool:
+    """修改已有集合的 ef_search（需要 ChromaDB 1.x 的 configuration 接口），返回是否成功"""
+    try:
+        collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+    except TypeError:
+        return False
+    return True
+
+
+def l2_equivalent(distance: float, space: str) -> float:
+    """
+    把距离换算成单位向量下的平方 L2 距离
+
+    默认嵌入模型输出单位向量，此时 |a-b|² = 2 - 2cos，cosine / ip 距离（1 - cos）乘 2 即可，
+    相似度阈值统一按平方 L2 配置，切换距离空间不用改阈值
+    """
+    return distance if space == "l2" else 2 * distance
+
+
+class ChromaStore:
+    """ChromaDB 后端（默认）：集合直接使用 ChromaDB 的集合对象"""
+
+    def __init__(self, client, embedding_fn=None, index: dict = None):
+        """
+        Args:
+            client: chromadb.PersistentClient
+            embedding_fn: 集合的嵌入函数
+            index: 每个集合的索引参数 {集合名: {"space", "M", "ef_construction", "ef_search"}}，
+                   未配置的参数使用 ChromaDB 默认值
+        """
+        self.client = client
+        self.embedding_fn = embedding_fn
+        self.index = index or {}
+        self._params = {}
+
+    def collection(self, name: str, description: str = ""):
+        wanted = {key: value for key, value in self.index.get(name, {}).items() if value is not None}
+        existing = {c.name if hasattr(c, "name") else c for c in self.client.list_collections()}
+        if name not in existing:
+            collection = self.client.create_collection(
+                name=name,
+                metadata={"description": description, **hnsw_metadata(wanted)},
+                embedding_function=self.embedding_fn
+            )
+        else:
+            collection = self.client.get_collection(name=name, embedding_function=self.embedding_fn)
+            current = chroma_index_params(collection)
+            if "ef_search" in wanted and wanted["ef_search"] != current["ef_search"]:
+                if set_ef_search(collection, wanted["ef_search"]):
+                    print(f"[INFO] {name}: ef_search {current['ef_search']} → {wanted['ef_search']}")
+                else:
+                    print(f"[WARN] {name}: 当前 ChromaDB 版本不支持修改 ef_search，需要重建集合")
+            fixed = [key for key in ("space", "M", "ef_construction")
+                     if key in wanted and wanted[key] != current[key]]
+            if fixed:
+                changes = ", ".join(f"{key} {current[key]} → {wanted[key]}" for key in fixed)
+                alias = {"long_term_memory": "conversations", "important_facts": "facts"}.get(name, "all")
+                print(f"[WARN] {name}: {changes} 只在创建集合时生效，仍使用当前参数；"
+                      f"重建索引: python import_memory.py --reembed {alias}")
+        self._params[name] = chroma_index_params(collection)
+        return collection
+
+    def index_params(self, name: str) -> dict:
+        """集合实际生效的索引参数（collection() 之后可用）"""
+        return self._params[name]
+
+
+def match_where(metadata: dict, where: dict) -> bool:
+    """
+    元数据过滤（ChromaDB where 语法的常用子集）
+
+    支持 {"key": 值}、{"key": {"$eq" / "$ne" / "$in" / "$nin" / "$gt" / "$gte" / "$lt" / "$lte": 值}}、
+    {"$and": [...]}、{"$or": [...]}
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(match_where(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(match_where(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, expected in condition.items():
+            if op == "$eq":
+                ok = value == expected
+            elif op == "$ne":
+                ok = value != expected
+            elif op == "$in":
+                ok = value in expected
+            elif op == "$nin":
+                ok = value not in expected
+            elif value is None:
+                ok = False
+            elif op == "$gt":
+                ok = value > expected
+            elif op == "$gte":
+                ok = value >= expected
+            elif op == "$lt":
+                ok = value < expected
+            elif op == "$lte":
+                ok = value <= expected
+            else:
+                raise ValueError(f"不支持的过滤条件: {op}")
+            if not ok:
+                return False
+    return True
+
+
+class NumpyCollection:
+    """
+    NumpyStore 中的一个集合
+
+    - 向量：<name>.<版本>.f16.npy，float16 矩阵，按行追加，内存映射（只读入用到的页）；
+      扩容 / 压缩时写新文件，和行号变更在同一个事务里切换，中途断电不会错位
+    - 文档 / 元数据：SQLite 旁路表（元数据同时常驻内存，用于过滤）
+    - 距离：默认平方 L2，与 ChromaDB 默认的 l2 空间一致；也支持 cosine / ip（精确检索，随时可切换）
+    - 删除只做标记，废弃行超过一半时自动压缩
+    - 行数不超过 store.cache_rows 时，检索用常驻内存的 float32 副本（写入后重建），
+      否则逐块从 float16 映射中读取转换
+    """
+
+    MIN_CAPACITY = 1024
+    BLOCK_ROWS = 4096  # 分块把 float16 转成 float32 计算，避免整体复制矩阵
+
+    def __init__(self, store, name: str, metadata: dict = None, file: str = None, space: str = "l2"):
+        self._store = store
+        self._lock = store.lock
+        self.name = name
+        self.metadata = metadata or {}
+        self.space = space
+        self._file = file
+        self._cache = None  # float32 副本
+
+        self._matrix = None
+        if file:
+            self._matrix = np.load(os.path.join(store.path, file), mmap_mode="r+")
+
+        capacity = len(self._matrix) if self._matrix is not None else 0
+        self._row_of = {}                                   # id -> 行号
+        self._ids = [None] * capacity                        # 行号 -> id（已删除为 None）
+        self._metadatas = [None] * capacity                  # 行号 -> 元数据
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._size = 0                                       # 已使用的行数（含已删除）
+        for doc_id, row, meta in store.conn.execute(
+                "SELECT id, row, metadata FROM records WHERE collection = ?", (name,)):
+            self._row_of[doc_id] = row
+            self._ids[row] = doc_id
+            self._metadatas[row] = json.loads(meta) if meta else {}
+            self._alive[row] = True
+            self._size = max(self._size, row + 1)
+
+        # 平方范数（打开时计算一次，查询时 |q-x|² = |q|² + |x|² - 2q·x）
+        self._norms = np.zeros(capacity, dtype=np.float32)
+        for start in range(0, self._size, self.BLOCK_ROWS):
+            block = np.asarray(self._matrix[start:start + self.BLOCK_ROWS], dtype=np.float32)
+            self._norms[start:start + len(block)] = np.einsum("ij,ij->i", block, block)
+
+    @property
+    def dim(self):
+        return self._matrix.shape[1] if self._matrix is not None else None
+
+    def count(self) -> int:
+        return len(self._row_of)
+
+    def _float32_rows(self):
+        """已使用行的 float32 副本（行数超过 cache_rows 时返回 None）"""
+        if self._cache is None and self._matrix is not None and self._size <= self._store.cache_rows:
+            self._cache = np.asarray(self._matrix[:self._size], dtype=np.float32)
+        return self._cache
+
+    # ==================== 写入 ====================
+
+    def _new_matrix(self, capacity: int, dim: int):
+        """创建新版本的向量文件，返回 (文件名, 可写的内存映射)"""
+        file = f"{self.name}.{time.time_ns()}.f16.npy"
+        matrix = np.lib.format.open_memmap(os.path.join(self._store.path, file), mode="w+",
+                                           dtype=np.float16, shape=(capacity, dim))
+        return file, matrix
+
+    def _switch_file(self, file: str, matrix):
+        """
+        切换到新向量文件：调用方已在当前事务里写好行号变更，这里一起提交，再删除旧文件
+
+        提交之前中断：SQLite 回滚，仍是旧文件 + 旧行号；提交之后：新文件 + 新行号。
+        """
+        matrix.flush()
+        del matrix
+        self._store.conn.execute("UPDATE collections SET file = ? WHERE name = ?", (file, self.name))
+        self._store.conn.commit()
+        old_file, self._file = self._file, file
+        self._matrix = np.load(os.path.join(self._store.path, file), mmap_mode="r+")
+        if old_file:
+            try:
+                os.remove(os.path.join(self._store.path, old_file))
+            except OSError:
+                pass
+
+    def _ensure_capacity(self, dim: int, needed: int):
+        """容量不足时按倍数扩容"""
+        if self._matrix is not None and needed <= len(self._matrix):
+            return
+        capacity = max(self.MIN_CAPACITY, needed, 2 * (len(self._matrix) if self._matrix is not None else 0))
+        file, grown = self._new_matrix(capacity, dim)
+        if self._matrix is not None:
+            grown[:self._size] = self._matrix[:self._size]
+        self._switch_file(file, grown)
+
+        extra = capacity - len(self._ids)
+        self._ids.extend([None] * extra)
+        self._metadatas.extend([None] * extra)
+        self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+        self._norms = np.concatenate([self._norms, np.zeros(extra, dtype=np.float32)])
+
+    def add(self, ids: list, documents: list, metadatas: list = None, embeddings=None):
+        """追加文档（已存在的 id 跳过，同 ChromaDB）；未给向量时用嵌入函数计算"""
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            keep = [i for i, doc_id in enumerate(ids) if doc_id not in self._row_of]
+            if len(keep) < len(ids):
+                print(f"[WARN] {self.name}: 跳过 {len(ids) - len(keep)} 条已存在的 id")
+            if not keep:
+                return
+            if embeddings is None:
+                embeddings = self._store.embedding_fn([documents[i] for i in keep])
+                vectors = np.asarray(embeddings, dtype=np.float32)
+            else:
+                vectors = np.asarray([embeddings[i] for i in keep], dtype=np.float32)
+            if self.dim is not None and vectors.shape[1] != self.dim:
+                raise ValueError(f"{self.name}: 向量维度 {vectors.shape[1]} 与集合的 {self.dim} 不一致")
+
+            start = self._size
+            end = start + len(keep)
+            self._ensure_capacity(vectors.shape[1], end)
+            stored = vectors.astype(np.float16)
+            self._matrix[start:end] = stored
+            self._matrix.flush()  # 先落盘向量，SQLite 提交后这些行才算存在
+            self._cache = None
+
+            rows = []
+            for offset, i in enumerate(keep):
+                row = start + offset
+                rows.append((self.name, ids[i], row, documents[i],
+                             json.dumps(metadatas[i] or {}, ensure_ascii=False)))
+            self._store.conn.executemany(
+                "INSERT INTO records (collection, id, row, document, metadata) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._store.conn.commit()
+
+            stored32 = stored.astype(np.float32)
+            self._norms[start:end] = np.einsum("ij,ij->i", stored32, stored32)
+            for offset, i in enumerate(keep):
+                row = start + offset
+                self._row_of[ids[i]] = row
+                self._ids[row] = ids[i]
+                self._metadatas[row] = dict(metadatas[i] or {})
+                self._alive[row] = True
+            self._size = end
+
+    def upsert(self, ids: list, documents: list, metadatas: list = None, embeddings=None):
+        """存在则替换，不存在则追加"""
+        with self._lock:
+            self.delete(ids=[doc_id for doc_id in ids if doc_id in self._row_of], compact=False)
+            self.add(ids, documents, metadatas, embeddings)
+
+    def update(self, ids: list, metadatas: list = None, documents: list = None, embeddings=None):
+        """更新元数据（按键合并，同 ChromaDB）/ 文档 / 向量"""
+        with self._lock:
+            for i, doc_id in enumerate(ids):
+                row = self._row_of.get(doc_id)
+                if row is None:
+                    continue
+                if metadatas is not None:
+                    merged = dict(self._metadatas[row])
+                    merged.update(metadatas[i] or {})
+                    self._metadatas[row] = merged
+                    self._store.conn.execute(
+                        "UPDATE records SET metadata = ? WHERE collection = ? AND id = ?",
+                        (json.dumps(merged, ensure_ascii=False), self.name, doc_id)
+                    )
+                if documents is not None:
+                    self._store.conn.execute(
+                        "UPDATE records SET document = ? WHERE collection = ? AND id = ?",
+                        (documents[i], self.name, doc_id)
+                    )
+                if embeddings is not None or documents is not None:
+                    vector = (embeddings[i] if embeddings is not None
+                              else self._store.embedding_fn([documents[i]])[0])
+                    stored = np.asarray(vector, dtype=np.float16)
+                    self._matrix[row] = stored
+                    stored32 = stored.astype(np.float32)
+                    self._norms[row] = float(stored32 @ stored32)
+            if embeddings is not None or documents is not None:
+                self._matrix.flush()
+                self._cache = None
+            self._store.conn.commit()
+
+    def delete(self, ids: list = None, where: dict = None, compact: bool = True):
+        """删除（标记废弃行；废弃行超过一半时压缩）"""
+        with self._lock:
+            if ids is None:
+                ids = self.get(where=where, include=[])["ids"] if where else []
+            rows = [self._row_of.pop(doc_id) for doc_id in ids if doc_id in self._row_of]
+            if not rows:
+                return
+            self._store.conn.executemany(
+                "DELETE FROM records WHERE collection = ? AND id = ?",
+                [(self.name, self._ids[row]) for row in rows]
+            )
+            self._store.conn.commit()
+            for row in rows:
+                self._ids[row] = None
+                self._metadatas[row] = None
+                self._alive[row] = False
+            if compact and self._size - len(self._row_of) > max(self.MIN_CAPACITY // 4, len(self._row_of)):
+                self.compact()
+
+    def compact(self):
+        """去掉废弃行，重写向量文件和行号"""
+        with self._lock:
+            if self._matrix is None:
+                return
+            alive_rows = np.flatnonzero(self._alive[:self._size])
+            capacity = max(self.MIN_CAPACITY, len(alive_rows))
+            file, packed = self._new_matrix(capacity, self.dim)
+            for start in range(0, len(alive_rows), self.BLOCK_ROWS):
+                chunk = alive_rows[start:start + self.BLOCK_ROWS]
+                packed[start:start + len(chunk)] = self._matrix[chunk]
+
+            self._store.conn.executemany(
+                "UPDATE records SET row = ? WHERE collection = ? AND id = ?",
+                [(new_row, self.name, self._ids[old_row]) for new_row, old_row in enumerate(alive_rows)]
+            )
+            self._switch_file(file, packed)
+            self._cache = None
+
+            ids = [self._ids[row] for row in alive_rows]
+            metadatas = [self._metadatas[row] for row in alive_rows]
+            norms = self._norms[alive_rows]
+            self._ids = ids + [None] * (capacity - len(ids))
+            self._metadatas = metadatas + [None] * (capacity - len(ids))
+            self._alive = np.zeros(capacity, dtype=bool)
+            self._alive[:len(ids)] = True
+            self._norms = np.zeros(capacity, dtype=np.float32)
+            self._norms[:len(ids)] = norms
+            self._row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+            self._size = len(ids)
+
+    # ==================== 读取 ====================
+
+    def _rows(self, where: dict = None) -> np.ndarray:
+        """有效行号（按写入顺序），可按元数据过滤"""
+        rows = np.flatnonzero(self._alive[:self._size])
+        if where:
+            rows = np.asarray([row for row in rows if match_where(self._metadatas[row], where)], dtype=np.int64)
+        return rows
+
+    def _documents(self, rows) -> list:
+        ids = [self._ids[row] for row in rows]
+        found = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self._store.conn.execute(
+                f"SELECT id, document FROM records WHERE collection = ? AND id IN ({placeholders})",
+                [self.name] + chunk
+            ).fetchall())
+        return [found.get(doc_id) for doc_id in ids]
+
+    def get(self, ids: list = None, where: dict = None, limit: int = None, offset: int = None,
+            include: list = ("metadatas", "documents")) -> dict:
+        """按 id / 过滤条件读取（结果格式同 ChromaDB）"""
+        with self._lock:
+            if ids is not None:
+                rows = [self._row_of[doc_id] for doc_id in ids if doc_id in self._row_of]
+                if where:
+                    rows = [row for row in rows if match_where(self._metadatas[row], where)]
+            else:
+                rows = self._rows(where)
+            rows = list(rows)[(offset or 0):]
+            if limit is not None:
+                rows = rows[:limit]
+
+            result = {"ids": [self._ids[row] for row in rows], "documents": None,
+                      "metadatas": None, "embeddings": None}
+            if "documents" in include:
+                result["documents"] = self._documents(rows)
+            if "metadatas" in include:
+                result["metadatas"] = [dict(self._metadatas[row]) for row in rows]
+            if "embeddings" in include:
+                result["embeddings"] = (np.asarray(self._matrix[rows], dtype=np.float32) if rows
+                                        else np.zeros((0, self.dim or 0), dtype=np.float32))
+            return result
+
+    def _distances(self, dots: np.ndarray, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """点积 -> 距离（与 ChromaDB 各空间的定义一致）"""
+        if self.space == "ip":
+            return 1 - dots
+        query_norms = np.einsum("ij,ij->i", queries, queries)
+        if self.space == "cosine":
+            query_lengths = np.sqrt(np.maximum(query_norms, 1e-12))
+            row_lengths = np.sqrt(np.maximum(self._norms[rows], 1e-12))
+            return 1 - dots / (query_lengths[:, None] * row_lengths[None, :])
+        return self._norms[rows][None, :] - 2 * dots + query_norms[:, None]
+
+    def query(self, query_embeddings: list, n_results: int = 10, where: dict = None,
+              include: list = ("metadatas", "documents", "distances")) -> dict:
+        """最近邻检索（暴力计算，距离按集合的 space，结果格式同 ChromaDB）"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        with self._lock:
+            rows = self._rows(where)
+            result = {"ids": [], "documents": None, "metadatas": None, "distances": None}
+            if "documents" in include:
+                result["documents"] = []
+            if "metadatas" in include:
+                result["metadatas"] = []
+            if "distances" in include:
+                result["distances"] = []
+
+            dots = np.zeros((len(queries), len(rows)), dtype=np.float32)
+            dense = len(rows) == self._size  # 没有删除/过滤时按连续块读取
+            cached = self._float32_rows() if len(rows) else None
+            if cached is not None:
+                dots = queries @ (cached if dense else cached[rows]).T
+            elif len(rows):
+                for start in range(0, len(rows), self.BLOCK_ROWS):
+                    block_rows = rows[start:start + self.BLOCK_ROWS]
+                    if dense:
+                        block = self._matrix[block_rows[0]:block_rows[-1] + 1]
+                    else:
+                        block = self._matrix[block_rows]
+                    dots[:, start:start + len(block_rows)] = queries @ np.asarray(block, dtype=np.float32).T
+            distances = self._distances(dots, queries, rows)
+
+            k = min(n_results, len(rows))
+            for query_distances in distances:
+                if k == 0:
+                    top = np.zeros(0, dtype=np.int64)
+                elif k < len(rows):
+                    top = np.argpartition(query_distances, k - 1)[:k]
+                    top = top[np.argsort(query_distances[top])]
+                else:
+                    top = np.argsort(query_distances)
+                hit_rows = rows[top]
+                result["ids"].append([self._ids[row] for row in hit_rows])
+                if result["documents"] is not None:
+                    result["documents"].append(self._documents(hit_rows))
+                if result["metadatas"] is not None:
+                    result["metadatas"].append([dict(self._metadatas[row]) for row in hit_rows])
+                if result["distances"] is not None:
+                    floor = -np.inf if self.space == "ip" else 0.0  # 消除浮点误差带来的负距离
+                    result["distances"].append([max(floor, float(d)) for d in query_distances[top]])
+            return result
+
+
+class NumpyStore:
+    """
+    轻量向量存储：每个集合一个 float16 .npy 向量文件，文档和元数据放在一个 SQLite 文件里
+
+    面向几千条短文档的场景：不需要 HNSW 索引，NumPy 暴力检索在这个量级是亚毫秒级的，
+    向量按 float16 存储，文件和常驻内存都是 float32 的一半。
+    """
+
+    def __init__(self, path: str, embedding_fn=None, cache_rows: int = 20000, index: dict = None):
+        """
+        Args:
+            path: 存储目录
+            embedding_fn: 嵌入函数 list[str] -> list[向量]（add 时未提供向量才会用到）
+            cache_rows: 集合行数不超过此值时检索用内存中的 float32 副本
+                        （384 维约 1.5KB/行；float16 逐块转换比矩阵乘法本身慢得多）
+            index: 每个集合的索引参数，同 ChromaStore；精确检索只用到 space，HNSW 参数忽略
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.embedding_fn = embedding_fn
+        self.cache_rows = cache_rows
+        self.index = index or {}
+        self.lock = threading.RLock()  # 所有集合共用一个 SQLite 连接
+        self.conn = sqlite3.connect(os.path.join(path, "meta.sqlite3"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS collections (name TEXT PRIMARY KEY, metadata TEXT, file TEXT);"
+            "CREATE TABLE IF NOT EXISTS records ("
+            "  collection TEXT NOT NULL, id TEXT NOT NULL, row INTEGER NOT NULL,"
+            "  document TEXT, metadata TEXT, PRIMARY KEY (collection, id));"
+        )
+        self.conn.commit()
+        self._collections = {}
+
+    def collection(self, name: str, description: str = "") -> NumpyCollection:
+        with self.lock:
+            if name not in self._collections:
+                row = self.conn.execute("SELECT metadata, file FROM collections WHERE name = ?",
+                                        (name,)).fetchone()
+                if row is None:
+                    metadata, file = {"description": description}, None
+                    self.conn.execute("INSERT INTO collections (name, metadata) VALUES (?, ?)",
+                                      (name, json.dumps(metadata, ensure_ascii=False)))
+                    self.conn.commit()
+                else:
+                    metadata, file = (json.loads(row[0]) if row[0] else {}), row[1]
+                # 扩容 / 压缩中途断电留下的未启用版本
+                for stale in os.listdir(self.path):
+                    if stale.startswith(f"{name}.") and stale.endswith(".f16.npy") and stale != file:
+                        os.remove(os.path.join(self.path, stale))
+                space = self.index.get(name, {}).get("space") or "l2"
+                hnsw_metadata({"space": space})  # 校验
+                self._collections[name] = NumpyCollection(self, name, metadata, file, space)
+            return self._collections[name]
+
+    def index_params(self, name: str) -> dict:
+        return {"space": self._collections[name].space}
+
+    def list_collections(self) -> list:
+        return [name for (name,) in self.conn.execute("SELECT name FROM collections ORDER BY name")]
+
+    def close(self):
+        with self.lock:
+            self._collections.clear()
+            self.conn.close()
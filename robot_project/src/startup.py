@@ -0,0 +1,183 @@
+# AI成长机器人 - 并行启动编排
+# 互不依赖的子系统在各自的线程中同时初始化，慢路径（模型首次推理、云端建连）构建完成后在后台预热
+
+import asyncio
+import socket
+import ssl
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+
+def warm_up_endpoint(url: str, ssl_context: ssl.SSLContext = None, timeout: float = 5.0) -> dict:
+    """
+    预先解析域名并完成一次 TCP + TLS 握手（随即关闭）
+
+    首次对话时的 DNS 查询走系统缓存，连不上的问题在启动时就能暴露出来。
+
+    Returns:
+        {"host", "dns_ms", "connect_ms", "tls_ms"}
+    """
+    parsed = urlparse(url)
+    host = parsed.hostname
+    port = parsed.port or (443 if parsed.scheme in ("https", "wss") else 80)
+
+    t0 = time.perf_counter()
+    family, socktype, proto, _, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+    t_dns = time.perf_counter()
+    sock = socket.socket(family, socktype, proto)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(address)
+        t_connect = time.perf_counter()
+        t_tls = t_connect
+        if parsed.scheme in ("https", "wss"):
+            context = ssl_context or ssl.create_default_context()
+            sock = context.wrap_socket(sock, server_hostname=host)
+            t_tls = time.perf_counter()
+    finally:
+        sock.close()
+
+    return {
+        "host": host,
+        "dns_ms": (t_dns - t0) * 1000,
+        "connect_ms": (t_connect - t_dns) * 1000,
+        "tls_ms": (t_tls - t_connect) * 1000
+    }
+
+
+class StartupOrchestrator:
+    """
+    并行启动编排器
+
+    - add()：登记一个子系统（构建函数 + 依赖 + 可选的预热函数），立即在独立线程中开始构建
+    - 依赖的子系统构建完成后才开始构建，依赖的结果按顺序作为参数传给构建函数
+    - 构建完成即可使用（get / aget），预热在同一线程中随后进行，失败只告警
+    - print_table()：各子系统的开始时间、构建耗时、预热耗时
+    """
+
+    def __init__(self):
+        self._t0 = time.monotonic()
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def _elapsed_ms(self) -> float:
+        return (time.monotonic() - self._t0) * 1000
+
+    def add(self, name: str, build, after: tuple = (), warm_up=None, required: bool = True) -> Future:
+        """
+        登记并开始构建子系统
+
+        Args:
+            name: 子系统名（显示在耗时表中）
+            build: 构建函数，参数为 after 中各子系统的构建结果
+            after: 依赖的子系统名
+            warm_up: 预热函数 obj -> 附加信息（可选，obj 为 None 时跳过）
+            required: 构建失败时是否视为启动失败（仅影响耗时表中的状态显示）
+
+        Returns:
+            构建结果的 Future
+        """
+        task = {
+            "name": name, "after": tuple(after), "required": required,
+            "built": Future(), "warmed": Future(),
+            "start_ms": None, "build_ms": None, "warm_ms": None,
+            "status": "等待", "detail": ""
+        }
+        with self._lock:
+            if name in self._tasks:
+                raise ValueError(f"子系统重复登记: {name}")
+            self._tasks[name] = task
+
+        thread = threading.Thread(target=self._run, args=(task, build, warm_up),
+                                  name=f"startup-{name}", daemon=True)
+        thread.start()
+        return task["built"]
+
+    def _run(self, task: dict, build, warm_up):
+        try:
+            deps = [self._tasks[dep]["built"].result() for dep in task["after"]]
+        except Exception as e:
+            task["status"] = "依赖失败"
+            task["detail"] = repr(e)
+            task["built"].set_exception(e)
+            task["warmed"].set_result(None)
+            return
+
+        task["start_ms"] = self._elapsed_ms()
+        task["status"] = "构建中"
+        t0 = time.perf_counter()
+        try:
+            obj = build(*deps)
+        except Exception as e:
+            task["build_ms"] = (time.perf_counter() - t0) * 1000
+            task["status"] = "失败" if task["required"] else "不可用"
+            task["detail"] = repr(e)
+            task["built"].set_exception(e)
+            task["warmed"].set_result(None)
+            return
+        task["build_ms"] = (time.perf_counter() - t0) * 1000
+        task["built"].set_result(obj)
+
+        if warm_up is None or obj is None:
+            task["status"] = "就绪" if obj is not None else "未启用"
+            task["warmed"].set_result(None)
+            return
+
+        task["status"] = "预热中"
+        t0 = time.perf_counter()
+        try:
+            info = warm_up(obj)
+            task["status"] = "就绪"
+            if isinstance(info, dict):
+                info = " ".join(f"{k}={v:.0f}" if isinstance(v, float) else f"{k}={v}" for k, v in info.items())
+            if info:
+                task["detail"] = str(info)
+        except Exception as e:
+            task["status"] = "就绪(预热失败)"
+            task["detail"] = repr(e)
+        task["warm_ms"] = (time.perf_counter() - t0) * 1000
+        task["warmed"].set_result(None)
+
+    def get(self, name: str, timeout: float = None):
+        """等待子系统构建完成并返回（构建失败时抛出原异常）"""
+        return self._tasks[name]["built"].result(timeout)
+
+    async def aget(self, name: str):
+        """异步等待子系统构建完成"""
+        return await asyncio.wrap_future(self._tasks[name]["built"])
+
+    async def await_all(self):
+        """异步等待所有子系统构建和预热结束（不抛出异常）"""
+        await asyncio.gather(*(asyncio.wrap_future(task["warmed"]) for task in self._tasks.values()))
+
+    def report(self) -> list:
+        """各子系统的启动耗时 [{"name", "start_ms", "build_ms", "warm_ms", "ready_ms", "status", "detail"}]"""
+        rows = []
+        for task in self._tasks.values():
+            ready_ms = None
+            if task["start_ms"] is not None and task["build_ms"] is not None:
+                ready_ms = task["start_ms"] + task["build_ms"]
+            row = {key: task[key] for key in ("name", "start_ms", "build_ms", "warm_ms", "status", "detail")}
+            row["ready_ms"] = ready_ms
+            rows.append(row)
+        return rows
+
+    def print_table(self):
+        def fmt(value):
+            return "-" if value is None else f"{value:.0f}"
+
+        def pad(text, width):
+            # 中文字符占两列
+            used = sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+            return text + " " * max(0, width - used)
+
+        print("⏱️ 启动耗时（ms）:")
+        print(f"   {pad('子系统', 10)}{'开始':>6}{'构建':>6}{'就绪':>6}{'预热':>6}  状态")
+        for row in self.report():
+            print(f"   {pad(row['name'], 10)}{fmt(row['start_ms']):>8}{fmt(row['build_ms']):>8}"
+                  f"{fmt(row['ready_ms']):>8}{fmt(row['warm_ms']):>8}  {row['status']}"
+                  f"{'  ' + row['detail'] if row['detail'] else ''}")
+        print(f"   总计: {self._elapsed_ms():.0f}ms")
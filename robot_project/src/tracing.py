@@ -0,0 +1,141 @@
+# AI成长机器人 - 每轮对话延迟追踪
+# 给每轮语音对话的关键节点打单调时钟时间戳，写入滚动的 JSONL 文件（汇总见 trace_summary.py）
+
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+
+class TurnTrace:
+    """一轮对话的时间戳记录（相对本轮开始的毫秒数）"""
+
+    def __init__(self, turn_id: int, attrs: dict = None):
+        self.turn_id = turn_id
+        self.started_at = datetime.now().isoformat()
+        self._t0 = time.monotonic()
+        self.marks = {}
+        self.attrs = dict(attrs or {})
+
+    def mark(self, name: str, once: bool = True, **attrs):
+        """
+        记录节点时间
+
+        Args:
+            name: 节点名
+            once: 为 True 时只保留第一次（如首个中间结果），否则覆盖（如最后一个 token）
+            attrs: 附加属性（写入记录的 attrs）
+        """
+        if once and name in self.marks:
+            return
+        self.marks[name] = round((time.monotonic() - self._t0) * 1000, 1)
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {
+            "turn_id": self.turn_id,
+            "start": self.started_at,
+            "marks": self.marks,
+            "attrs": self.attrs
+        }
+
+
+class TurnTracer:
+    """
+    对话轮次追踪器
+
+    start_turn() 开始新的一轮（VAD 检测到说话时），各模块用 mark() 在当前轮次上打点，
+    end_turn() 把本轮写入 JSONL（按大小滚动）。未启用或没有进行中的轮次时 mark() 什么都不做。
+
+    节点名（按时间顺序）：
+        vad_trigger / asr_connected / asr_first_partial / asr_final /
+        speaker_id_start / speaker_id_done / memory_ready /
+        llm_first_token / llm_last_token / tts_connected / tts_first_audio / first_playback
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.current = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._logger = None
+
+    def configure(self, path: str = "logs/turns.jsonl", max_bytes: int = 5 * 1024 * 1024,
+                  backup_count: int = 3, enabled: bool = True):
+        """
+        Args:
+            path: JSONL 文件路径
+            max_bytes: 单个文件最大字节数，超过后滚动为 .1/.2/...
+            backup_count: 保留的历史文件数
+            enabled: 是否启用
+        """
+        self.enabled = enabled
+        if not enabled:
+            return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        logger = logging.getLogger("robot.turn_trace")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        self._logger = logger
+
+    def start_turn(self, **attrs) -> TurnTrace:
+        """开始新的一轮（上一轮未结束时以 status=abandoned 写入）"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            previous = self.current
+            self.current = TurnTrace(next(self._ids), attrs)
+        if previous is not None:
+            self._write(previous, status="abandoned")
+        return self.current
+
+    def mark(self, name: str, once: bool = True, **attrs):
+        """在当前轮次上打点"""
+        turn = self.current
+        if turn is not None:
+            turn.mark(name, once=once, **attrs)
+
+    def end_turn(self, status: str = "ok", **attrs):
+        """结束当前轮次并写入文件"""
+        with self._lock:
+            turn, self.current = self.current, None
+        if turn is not None:
+            turn.attrs.update(attrs)
+            self._write(turn, status)
+
+    def _write(self, turn: TurnTrace, status: str):
+        if self._logger is None:
+            return
+        record = turn.to_dict()
+        record["status"] = status
+        self._logger.info(json.dumps(record, ensure_ascii=False))
+
+
+_tracer = TurnTracer()
+
+
+def get_tracer() -> TurnTracer:
+    """全局追踪器（语音模块和大脑共用）"""
+    return _tracer
+
+
+def configure_tracing(config: dict = None) -> TurnTracer:
+    """按配置（speech.json 的 tracing 段）启用追踪"""
+    config = config or {}
+    _tracer.configure(
+        path=config.get("path", "logs/turns.jsonl"),
+        max_bytes=config.get("max_bytes", 5 * 1024 * 1024),
+        backup_count=config.get("backup_count", 3),
+        enabled=config.get("enabled", True)
+    )
+    return _tracer
@@ -6,11 +6,32 @@
 - vad: 语音活动检测
 - asr: 语音识别（豆包ASR）
 - tts: 语音合成（豆包TTS）
+
+各类在首次访问时才导入对应子模块（PEP 562），
+import src.voice 或只用其中一个子模块时，不会连带加载 pyaudio / webrtcvad / websockets。
 """
 
-from .audio_device import AudioDevice
-from .vad import VADDetector
-from .asr import VolcengineASR
-from .tts import VolcengineTTS
+import importlib
+
+# 公开名称 -> 所在子模块
+_LAZY_ATTRS = {
+    'AudioDevice': '.audio_device',
+    'VADDetector': '.vad',
+    'VolcengineASR': '.asr',
+    'VolcengineTTS': '.tts',
+}
 
 __all__ = ['AudioDevice', 'VADDetector', 'VolcengineASR', 'VolcengineTTS']
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # 之后直接命中，不再走 __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -13,11 +13,26 @@ import asyncio
 import json
 import uuid
 import gzip
-import websockets
 import ssl
 from typing import Optional, AsyncGenerator, Callable
 from dataclasses import dataclass
 
+from src.tracing import get_tracer
+from src.startup import warm_up_endpoint
+
+
+# websockets 延迟导入（import src.voice.asr 时不加载，首次建连时才导入）
+websockets = None
+
+
+def get_websockets():
+    """延迟加载 websockets"""
+    global websockets
+    if websockets is None:
+        import websockets as _websockets
+        websockets = _websockets
+    return websockets
+
 
 @dataclass
 class ASRResult:
@@ -102,6 +117,10 @@ class VolcengineASR:
         print(f"   采样率: {self.sample_rate} Hz")
         print(f"   热词: {', '.join(self.hotwords[:5])}...")
 
+    def warm_up(self) -> dict:
+        """启动预热：提前解析服务域名并握手一次（同步，在启动线程中调用）"""
+        return warm_up_endpoint(self.WSS_URL, self.ssl_context)
+
     def _post_correct(self, text: str) -> str:
         """后处理纠错"""
         if not text:
@@ -295,6 +314,7 @@ class VolcengineASR:
         Returns:
             最终识别结果文本
         """
+        websockets = get_websockets()
         request_id = str(uuid.uuid4())
 
         headers = {
@@ -306,6 +326,7 @@ class VolcengineASR:
 
         final_text = ""
         ws = None
+        tracer = get_tracer()
 
         try:
             ws = await websockets.connect(
@@ -315,6 +336,7 @@ class VolcengineASR:
                 max_size=1000000000,
                 ping_interval=None
             )
+            tracer.mark("asr_connected")
 
             # 发送首包
             full_request = self._build_full_request(request_id, end_window_size)
@@ -362,6 +384,11 @@ class VolcengineASR:
                         result = self._extract_result(resp_data)
                         if result:
                             final_text = result.text
+                            if result.is_final:
+                                # 最终结果在用户停止说话 end_window_size 毫秒后才到达
+                                tracer.mark("asr_final", end_window_ms=end_window_size)
+                            else:
+                                tracer.mark("asr_first_partial")
                             on_result(result)
 
                             if result.is_final:
@@ -412,6 +439,7 @@ class VolcengineASR:
         Returns:
             识别结果文本
         """
+        websockets = get_websockets()
         request_id = str(uuid.uuid4())
 
         headers = {
@@ -3,7 +3,6 @@
 使用 PyAudio 管理麦克风录音和扬声器播放
 """
 
-import pyaudio
 import wave
 import time
 from typing import Generator, Optional
@@ -11,6 +10,18 @@ import io
 
 from src.voice.aec import EcAecConfig, EcEchoCanceller
 
+# PyAudio 延迟导入（创建 AudioDevice 时才加载 PortAudio）
+pyaudio = None
+
+
+def get_pyaudio():
+    """延迟加载 pyaudio"""
+    global pyaudio
+    if pyaudio is None:
+        import pyaudio as _pyaudio
+        pyaudio = _pyaudio
+    return pyaudio
+
 
 class AudioDevice:
     """音频设备管理器"""
@@ -55,7 +66,7 @@ class AudioDevice:
             )
 
         # PyAudio 实例
-        self.pyaudio = pyaudio.PyAudio()
+        self.pyaudio = get_pyaudio().PyAudio()
         self.stream = None
 
         print(f"📢 音频设备初始化:")
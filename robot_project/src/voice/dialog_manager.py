@@ -11,19 +11,20 @@
 import asyncio
 import threading
 import struct
-import re
 import sys
 from typing import Optional
 from queue import Queue, Empty
 
 # 导入 ASR 结果类型
 from src.voice.asr import ASRResult
+from src.voice.name_intent import NameIntentClassifier, extract_name
+from src.tracing import get_tracer
 
 
 class VoiceDialogManager:
     """双向语音对话管理器"""
 
-    def __init__(self, brain, audio_device, vad, asr, tts, speaker_id=None):
+    def __init__(self, brain, audio_device, vad, asr, tts, speaker_id=None, name_intent_threshold: float = 0.75):
         """
         初始化对话管理器
 
@@ -34,6 +35,7 @@ class VoiceDialogManager:
             asr: ASR识别器实例
             tts: TTS合成器实例
             speaker_id: 声纹识别器实例（可选）
+            name_intent_threshold: 本地名字意图识别的置信度阈值，低于阈值时才请求大模型
         """
         self.brain = brain
         self.audio_device = audio_device
@@ -41,6 +43,7 @@ class VoiceDialogManager:
         self.asr = asr
         self.tts = tts
         self.speaker_id = speaker_id
+        self.tracer = get_tracer()  # 每轮延迟追踪（main_voice 中按配置启用）
 
         # 状态控制
         self.is_speaking = False  # TTS是否在播放
@@ -52,6 +55,8 @@ class VoiceDialogManager:
         # 声纹识别状态
         self.current_speaker_name = None  # 当前说话人名字
         self.awaiting_name = False  # 是否在等待用户告知名字
+        self.name_intent_threshold = name_intent_threshold
+        self._name_intent = None  # 本地名字意图分类器（首次询问名字时在后台训练）
 
         # 实时识别相关
         self.audio_queue = None  # 音频数据队列（用于实时 ASR）
@@ -75,6 +80,9 @@ class VoiceDialogManager:
         print("=" * 50)
         print()
 
+        # 云端连接预先建好，空闲监听期间定期保活
+        keep_warm_task = asyncio.create_task(self.brain.akeep_warm())
+
         # 自我介绍
         intro = self.brain.introduce()
         print(f"🤖 {self.brain.persona.persona['name']}: {intro}")
@@ -99,8 +107,9 @@ class VoiceDialogManager:
             print("\n\n正在退出...")
         finally:
             self.running = False
+            keep_warm_task.cancel()
             self.audio_device.stop_stream()
-            self.brain.memory.save_remaining()
+            self.brain.save_memory()
             print("💾 记忆已保存")
             print("👋 再见！")
 
@@ -140,12 +149,15 @@ class VoiceDialogManager:
 
                 if not final_text:
                     print("⚠️ 未识别到有效内容")
+                    self.tracer.end_turn(status="no_text")
                     continue
 
                 # 处理识别结果
                 await self._handle_speech(final_text, audio_data)
+                self.tracer.end_turn()
 
             except Exception as e:
+                self.tracer.end_turn(status="error", error=repr(e))
                 print(f"⚠️ 处理错误: {e}")
                 import traceback
                 traceback.print_exc()
@@ -204,6 +216,9 @@ class VoiceDialogManager:
                 if is_speech:
                     consecutive_speech += 1
                     if consecutive_speech >= speech_threshold:
+                        # 本轮从 VAD 触发开始计时
+                        self.tracer.start_turn()
+                        self.tracer.mark("vad_trigger")
                         return True, pre_buffer
                 else:
                     consecutive_speech = 0
@@ -257,6 +272,9 @@ class VoiceDialogManager:
             if result.is_final:
                 final_text = result.text
                 print()  # 换行
+            else:
+                # 中间结果稳定后提前检索记忆，最终结果出来时直接复用
+                self.brain.prefetch_memory(result.text)
 
         # 启动音频发送任务
         audio_task = asyncio.create_task(self._send_audio_to_asr())
@@ -340,19 +358,19 @@ class VoiceDialogManager:
 
         # 退出检测
         if any(kw in user_text for kw in self.exit_keywords):
-            farewell = self.brain.chat("再见", speaker=speaker_name, debug=False)
+            farewell = await self.brain.achat("再见", speaker=speaker_name, debug=False)
             print(f"\n🤖 {self.brain.persona.persona['name']}: {farewell}")
             await self._speak(farewell, interruptible=False)
             self.running = False
             return
 
-        # 对话
-        reply = self.brain.chat(user_text, speaker=speaker_name, debug=False)
+        # 对话（流式：第一句生成出来就开始合成播放）
+        reply = await self._speak_stream(
+            self.brain.achat_stream(user_text, speaker=speaker_name, debug=False),
+            interruptible=True
+        )
         print(f"\n🤖 {self.brain.persona.persona['name']}: {reply}")
 
-        # 播放
-        await self._speak(reply, interruptible=True)
-
         print("\n" + "-" * 30)
 
     async def _identify_speaker(self, audio_data: bytes, user_text: str) -> Optional[str]:
@@ -360,8 +378,13 @@ class VoiceDialogManager:
         if self.speaker_id is None or not audio_data:
             return self.current_speaker_name
 
-        # 声纹识别
-        speaker_id_result, similarity, embedding = self.speaker_id.identify(audio_data)
+        # 声纹识别（模型推理较慢，放到线程中执行）
+        loop = asyncio.get_event_loop()
+        self.tracer.mark("speaker_id_start")
+        speaker_id_result, similarity, embedding = await loop.run_in_executor(
+            None, self.speaker_id.identify, audio_data
+        )
+        self.tracer.mark("speaker_id_done")
 
         if speaker_id_result:
             name = self.speaker_id.get_speaker_name(speaker_id_result)
@@ -384,6 +407,9 @@ class VoiceDialogManager:
     async def _ask_for_name(self):
         """询问陌生人的名字"""
         self.awaiting_name = True
+        # 播放询问的同时在后台准备本地意图分类器
+        if self._name_intent is None:
+            self._name_intent = asyncio.get_event_loop().run_in_executor(None, NameIntentClassifier)
         ask_text = "你好呀~我好像还不认识你呢，你叫什么名字呀？"
         print(f"\n🤖 {self.brain.persona.persona['name']}: {ask_text}")
         await self._speak(ask_text, interruptible=False)
@@ -392,36 +418,33 @@ class VoiceDialogManager:
         """处理用户告知名字的回复"""
         print(f"\n👤 你: {user_text}")
 
-        # 先尝试正则提取
-        name = self._extract_name(user_text)
-
-        # 如果正则失败，用AI理解意图
-        if not name:
-            result = await self._ai_understand_name(user_text)
-            if result.get('is_name'):
-                name = result.get('name')
-            elif result.get('skip'):
-                # 用户不想说名字，跳过注册
-                print(f"📝 用户跳过注册")
-                self.awaiting_name = False
-                if self.speaker_id:
-                    self.speaker_id.cancel_registration()
-                reply = result.get('reply', "好的，那我们先聊别的吧~")
+        # 本地意图识别（正则 + 分类器），置信度不足时才请求大模型
+        result = await self._understand_name(user_text)
+        name = None
+        if result.get('is_name'):
+            name = result.get('name')
+        elif result.get('skip'):
+            # 用户不想说名字，跳过注册
+            print(f"📝 用户跳过注册")
+            self.awaiting_name = False
+            if self.speaker_id:
+                self.speaker_id.cancel_registration()
+            reply = result.get('reply', "好的，那我们先聊别的吧~")
+            print(f"\n🤖 {self.brain.persona.persona['name']}: {reply}")
+            await self._speak(reply, interruptible=False)
+            return
+        elif result.get('other_intent'):
+            # 用户在说别的事情，先回应再继续问名字
+            print(f"📝 用户在说其他事情")
+            reply = result.get('reply', "")
+            if reply:
                 print(f"\n🤖 {self.brain.persona.persona['name']}: {reply}")
                 await self._speak(reply, interruptible=False)
-                return
-            elif result.get('other_intent'):
-                # 用户在说别的事情，先回应再继续问名字
-                print(f"📝 用户在说其他事情")
-                reply = result.get('reply', "")
-                if reply:
-                    print(f"\n🤖 {self.brain.persona.persona['name']}: {reply}")
-                    await self._speak(reply, interruptible=False)
-                # 继续问名字
-                ask_text = "对了，你还没告诉我你叫什么名字呢~"
-                print(f"\n🤖 {self.brain.persona.persona['name']}: {ask_text}")
-                await self._speak(ask_text, interruptible=False)
-                return
+            # 继续问名字
+            ask_text = "对了，你还没告诉我你叫什么名字呢~"
+            print(f"\n🤖 {self.brain.persona.persona['name']}: {ask_text}")
+            await self._speak(ask_text, interruptible=False)
+            return
 
         print(f"📝 提取名字: {name if name else '未识别到'}")
 
@@ -443,6 +466,22 @@ class VoiceDialogManager:
             print(f"\n🤖 {self.brain.persona.persona['name']}: {retry_text}")
             await self._speak(retry_text, interruptible=False)
 
+    async def _understand_name(self, user_text: str) -> dict:
+        """理解用户对"你叫什么名字"的回答：本地分类器置信度足够时直接返回，否则请求大模型"""
+        if self._name_intent is None:
+            self._name_intent = asyncio.get_event_loop().run_in_executor(None, NameIntentClassifier)
+        classifier = await self._name_intent
+        local = classifier.classify(user_text)
+        if local["confidence"] >= self.name_intent_threshold:
+            print(f"📝 本地意图识别 (置信度 {local['confidence']:.2f})")
+            return local
+
+        result = await self._ai_understand_name(user_text)
+        # 大模型调用失败时退回本地结果（本地提取到了名字则照常注册）
+        if not any(result.get(key) for key in ('is_name', 'skip', 'other_intent')):
+            return local
+        return result
+
     async def _ai_understand_name(self, user_text: str) -> dict:
         """用AI理解用户是否在说名字"""
         prompt = f"""用户刚才被问"你叫什么名字"，回答了："{user_text}"
@@ -456,69 +495,33 @@ class VoiceDialogManager:
 {{"is_name": true/false, "name": "名字或null", "skip": true/false, "other_intent": true/false, "reply": "如果用户在说其他事情，简短回应"}}"""
 
         try:
-            # 调用AI（使用较短的max_tokens加快响应）
-            from openai import OpenAI
             import json
 
-            # 复用brain的客户端配置
-            if hasattr(self.brain, 'client') and self.brain.client:
-                response = self.brain.client.chat.completions.create(
-                    model=self.brain.model,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.3,
-                    max_tokens=150
-                )
-                result_text = response.choices[0].message.content.strip()
-
-                # 解析JSON
-                # 处理可能的markdown代码块
-                if result_text.startswith('```'):
-                    result_text = result_text.split('```')[1]
-                    if result_text.startswith('json'):
-                        result_text = result_text[4:]
-                    result_text = result_text.strip()
-
-                return json.loads(result_text)
+            # 调用AI（异步，使用较短的max_tokens加快响应）
+            result_text = await self.brain.acomplete(
+                [{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=150
+            )
+            result_text = result_text.strip()
+
+            # 解析JSON
+            # 处理可能的markdown代码块
+            if result_text.startswith('```'):
+                result_text = result_text.split('```')[1]
+                if result_text.startswith('json'):
+                    result_text = result_text[4:]
+                result_text = result_text.strip()
+
+            return json.loads(result_text)
         except Exception as e:
-            print(f"⚠️ AI理解失败: {e}")
+            print(f"⚠️ AI理解失败: {e!r}")
 
         return {"is_name": False, "name": None, "skip": False, "other_intent": False}
 
     def _extract_name(self, text: str) -> Optional[str]:
         """从文本中提取名字"""
-        text = text.strip()
-        text = re.sub(r'(我是|我叫){2,}', r'\1', text)
-
-        patterns = [
-            r"我(?:是|叫|的名字是|名叫)[\s]*([^\s,，。！!？?我是叫]{2,4})",
-            r"叫我[\s]*([^\s,，。！!？?]{2,4})",
-            r"^([^\s,，。！!？?我是叫]{2,4})$",
-        ]
-
-        # 无效词列表
-        skip_words = [
-            '什么', '谁', '你好', '嗯', '啊', '哦', '呃', '那个', '这个',
-            '干嘛', '怎么', '好的', '知道', '可以', '不是', '没有',
-            '退出', '再见', '拜拜', '结束', '停止', '关闭'
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, text)
-            if match:
-                name = match.group(1).strip()
-                # 去掉标点后检查
-                clean_name = re.sub(r'[？?！!。，,、]', '', name)
-                if 1 < len(clean_name) <= 4:
-                    if clean_name not in skip_words and not clean_name.endswith('吗'):
-                        return clean_name
-
-        clean_text = re.sub(r'^(我是|我叫|叫我|我的名字是)+', '', text).strip()
-        clean_text = re.sub(r'[？?！!。，,、]', '', clean_text)
-        if 2 <= len(clean_text) <= 4:
-            if clean_text not in skip_words and not clean_text.endswith('吗'):
-                return clean_text
-
-        return None
+        return extract_name(text)
 
     async def _speak(self, text: str, interruptible: bool = True):
         """语音播放"""
@@ -534,6 +537,7 @@ class VoiceDialogManager:
                 buffer += chunk
 
                 if len(buffer) >= buffer_threshold:
+                    self.tracer.mark("first_playback")
                     self.audio_device.play_audio(buffer)
                     buffer = b''
 
@@ -541,9 +545,11 @@ class VoiceDialogManager:
                     if interruptible and self._aec_enabled and self.audio_stream:
                         if await self._barge_in_check():
                             print("\n⚡ 检测到插话，停止播报")
+                            self.tracer.mark("barge_in")
                             break
 
             if buffer:
+                self.tracer.mark("first_playback")
                 self.audio_device.play_audio(buffer)
 
             print("✅ 播放完成")
@@ -559,6 +565,81 @@ class VoiceDialogManager:
             else:
                 self.wait_after_speak = 0.5
 
+    async def _speak_stream(self, segments, interruptible: bool = True) -> str:
+        """
+        流式语音播放：句子边生成边合成边播放
+
+        Args:
+            segments: 异步句子迭代器（来自 Brain.achat_stream）
+            interruptible: 是否允许插话打断
+
+        Returns:
+            实际生成的完整回复文本
+        """
+        self.is_speaking = True
+        spoken = []
+
+        async def collect():
+            async for segment in segments:
+                spoken.append(segment)
+                print(f"🗣️ 播放: {segment[:30]}...")
+                yield segment
+
+        tts_stream = self.tts.synthesize_text_stream(collect())
+        interrupted = False
+        try:
+            try:
+                buffer = b''
+                buffer_threshold = 3200
+
+                async for chunk in tts_stream:
+                    buffer += chunk
+
+                    if len(buffer) >= buffer_threshold:
+                        self.tracer.mark("first_playback")
+                        self.audio_device.play_audio(buffer)
+                        buffer = b''
+
+                        # AEC 启用时尝试“可插话”：播报期间快速做 VAD 检测
+                        if interruptible and self._aec_enabled and self.audio_stream:
+                            if await self._barge_in_check():
+                                print("\n⚡ 检测到插话，停止播报")
+                                self.tracer.mark("barge_in")
+                                interrupted = True
+                                break
+
+                if buffer:
+                    self.tracer.mark("first_playback")
+                    self.audio_device.play_audio(buffer)
+
+                print("✅ 播放完成")
+
+            except Exception as e:
+                print(f"⚠️ TTS播放失败: {e}")
+
+            finally:
+                # 关闭 TTS 会话
+                await tts_stream.aclose()
+
+            if not interrupted:
+                # TTS 连接失败或中途出错时句子流可能没有读完：照样生成完，回复才能显示并写入记忆
+                async for segment in segments:
+                    spoken.append(segment)
+                    print(f"🗣️ 未播放: {segment[:30]}...")
+
+        finally:
+            # 关闭句子流（插话打断时停止后续生成）
+            await segments.aclose()
+
+            self.is_speaking = False
+            # 无 AEC 时等待回声消散；启用 AEC 则不再依赖等待策略
+            if self._aec_enabled:
+                self.wait_after_speak = 0
+            else:
+                self.wait_after_speak = 0.5
+
+        return "".join(spoken)
+
     async def _barge_in_check(self) -> bool:
         """
         播放期间快速检测是否有人插话。
@@ -0,0 +1,192 @@
+"""
+名字意图识别模块（本地快速通道）
+陌生人注册时判断用户的回答是"告诉名字 / 不想说 / 说别的事"，
+置信度足够时直接给出结果，不必为一次分类调用云端大模型。
+
+实现：字符 n-gram + 正则特征的多分类逻辑回归（numpy），
+训练数据为内置的注册场景短语，创建时训练（约 0.1~0.2 秒）。
+"""
+
+import re
+from typing import Optional
+
+import numpy as np
+
+
+# 名字提取用的正则（原 VoiceDialogManager._extract_name）
+NAME_PATTERNS = [
+    r"我(?:是|叫|的名字是|名叫)[\s]*([^\s,，。！!？?我是叫]{2,4})",
+    r"叫我[\s]*([^\s,，。！!？?]{2,4})",
+    r"^([^\s,，。！!？?我是叫]{2,4})$",
+]
+
+# 不可能是名字的词
+SKIP_WORDS = [
+    '什么', '谁', '你好', '嗯', '啊', '哦', '呃', '那个', '这个',
+    '干嘛', '怎么', '好的', '知道', '可以', '不是', '没有',
+    '退出', '再见', '拜拜', '结束', '停止', '关闭'
+]
+
+_PUNCT = re.compile(r'[？?！!。，,、\s]')
+_TRAILING_PARTICLES = re.compile(r'(?:就好|就行|就可以|[呀啊哦吧呢啦嘛哈])+$')
+
+
+def _valid_name(name: str) -> Optional[str]:
+    clean_name = _PUNCT.sub('', name)
+    # 去掉句尾语气词（"我叫小明呀" / "叫我小明就行" → "小明"）
+    stripped = _TRAILING_PARTICLES.sub('', clean_name)
+    if len(stripped) >= 2:
+        clean_name = stripped
+    if 1 < len(clean_name) <= 4 and clean_name not in SKIP_WORDS and not clean_name.endswith('吗'):
+        return clean_name
+    return None
+
+
+def extract_name(text: str) -> Optional[str]:
+    """从文本中提取名字（纯正则），提取不到返回 None"""
+    text = text.strip()
+    text = re.sub(r'(我是|我叫){2,}', r'\1', text)
+
+    for pattern in NAME_PATTERNS:
+        match = re.search(pattern, text)
+        if match:
+            name = _valid_name(match.group(1).strip())
+            if name:
+                return name
+
+    clean_text = re.sub(r'^(我是|我叫|叫我|我的名字是)+', '', text).strip()
+    if 2 <= len(_PUNCT.sub('', clean_text)) <= 4:
+        return _valid_name(clean_text)
+
+    return None
+
+
+# ==================== 训练数据 ====================
+
+_TRAIN_NAMES = [
+    "小明", "张伟", "李娜", "王芳", "乐乐", "豆豆", "朵朵", "陈晨", "刘洋", "杨帆",
+    "赵磊", "周杰", "吴敏", "天天", "小红", "妞妞", "浩浩", "思思", "子涵", "一诺",
+]
+
+_NAME_TEMPLATES = [
+    "{}", "{}呀", "我叫{}", "我是{}", "我叫{}呀", "我是{}啊", "叫我{}", "叫我{}就行",
+    "你叫我{}吧", "我的名字是{}", "我名叫{}", "嗯我叫{}", "我是{}哦", "大家都叫我{}",
+]
+
+_SKIP_PHRASES = [
+    "算了", "算了吧", "算啦", "不说了", "不想说", "我不想说", "我不想告诉你", "不告诉你",
+    "就不告诉你", "保密", "这是秘密", "秘密哦", "跳过", "跳过吧", "下次再说", "以后再告诉你",
+    "不用了", "没必要", "不要问了", "别问了", "我不说", "先不说了", "不重要", "无所谓啦",
+    "不想讲", "我不要说", "不想说名字", "名字不重要", "下次吧", "改天再说", "以后再说吧",
+]
+
+_OTHER_PHRASES = [
+    "今天天气怎么样", "你会唱歌吗", "现在几点了", "给我讲个故事", "你是谁", "你叫什么名字",
+    "我想听音乐", "我饿了", "你好呀", "妈妈在哪里", "我们玩游戏吧", "你喜欢什么颜色",
+    "讲个笑话", "帮我定个闹钟", "我今天很开心", "为什么天是蓝的", "你几岁了", "我要去上学了",
+    "外面下雨了吗", "你在干什么", "明天星期几", "我不知道", "什么", "你说什么", "听不清",
+    "再说一遍", "我想看电视", "你能陪我玩吗", "好无聊啊", "我们去公园吧", "你吃饭了吗",
+    "打开灯", "声音大一点", "现在几点", "几点啦", "你叫啥",
+]
+
+
+def training_examples() -> list:
+    """内置训练数据 [(文本, 标签)]，标签为 name / skip / other"""
+    examples = [(template.format(name), "name") for template in _NAME_TEMPLATES for name in _TRAIN_NAMES]
+    # 三类样本数量大致均衡
+    repeat = max(1, len(examples) // (3 * len(_SKIP_PHRASES)))
+    examples += [(text, "skip") for text in _SKIP_PHRASES] * repeat
+    repeat = max(1, len(examples) // (3 * len(_OTHER_PHRASES)))
+    examples += [(text, "other") for text in _OTHER_PHRASES] * repeat
+    return examples
+
+
+class NameIntentClassifier:
+    """
+    名字意图分类器
+
+    classify() 返回与大模型理解结果相同的字典，外加置信度：
+        {"is_name", "name", "skip", "other_intent", "reply", "confidence"}
+    判为"告诉名字"但正则提取不出名字时置信度为 0，交给大模型处理。
+    """
+
+    LABELS = ["name", "skip", "other"]
+    SKIP_REPLY = "好的，那我们先聊别的吧~"
+
+    def __init__(self, examples: list = None, max_ngram: int = 3, epochs: int = 150,
+                 learning_rate: float = 4.0, l2: float = 1e-4):
+        """
+        Args:
+            examples: 训练数据 [(文本, 标签)]，默认使用内置数据
+            max_ngram: 字符 n-gram 最大长度
+            epochs: 梯度下降轮数
+            learning_rate: 学习率
+            l2: L2 正则系数
+        """
+        self.max_ngram = max_ngram
+        examples = examples or training_examples()
+
+        vocab = {}
+        for text, _ in examples:
+            for feature in self._features(text):
+                vocab.setdefault(feature, len(vocab))
+        self.vocab = vocab
+
+        x = np.stack([self._vectorize(text) for text, _ in examples])
+        y = np.zeros((len(examples), len(self.LABELS)), dtype=np.float32)
+        for i, (_, label) in enumerate(examples):
+            y[i, self.LABELS.index(label)] = 1.0
+
+        self.weights = np.zeros((len(vocab), len(self.LABELS)), dtype=np.float32)
+        self.bias = np.zeros(len(self.LABELS), dtype=np.float32)
+        for _ in range(epochs):
+            probs = self._softmax(x @ self.weights + self.bias)
+            grad = probs - y
+            self.weights -= learning_rate * (x.T @ grad / len(x) + l2 * self.weights)
+            self.bias -= learning_rate * grad.mean(axis=0)
+
+    def _features(self, text: str) -> list:
+        """字符 1~max_ngram 元组 + 长度桶 + 正则是否能提取出名字"""
+        clean = _PUNCT.sub('', text)
+        padded = f"^{clean}$"
+        features = [padded[i:i + n] for n in range(1, self.max_ngram + 1) for i in range(len(padded) - n + 1)]
+        features.append(f"<len:{min(len(clean), 8)}>")
+        if extract_name(text):
+            features.append("<re>")
+        return features
+
+    def _vectorize(self, text: str):
+        vector = np.zeros(len(self.vocab), dtype=np.float32)
+        for feature in self._features(text):
+            index = self.vocab.get(feature)
+            if index is not None:
+                vector[index] = 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @staticmethod
+    def _softmax(logits):
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def predict(self, text: str) -> tuple:
+        """返回 (标签, 概率)"""
+        probs = self._softmax(self._vectorize(text) @ self.weights + self.bias)
+        best = int(np.argmax(probs))
+        return self.LABELS[best], float(probs[best])
+
+    def classify(self, text: str) -> dict:
+        """分类并提取名字（结果格式同 VoiceDialogManager._ai_understand_name）"""
+        label, confidence = self.predict(text)
+        name = extract_name(text) if label == "name" else None
+        if label == "name" and not name:
+            confidence = 0.0
+        return {
+            "is_name": label == "name",
+            "name": name,
+            "skip": label == "skip",
+            "other_intent": label == "other",
+            "reply": self.SKIP_REPLY if label == "skip" else "",
+            "confidence": confidence
+        }
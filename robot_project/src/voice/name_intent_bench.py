@@ -0,0 +1,148 @@
+"""
+名字意图识别基准测试
+统计本地分类器在注册场景短语上的准确率、延迟，以及低于置信度阈值需要交给大模型的比例。
+
+默认使用内置评测集（名字均不在训练数据中），也可以用 --data 指定录下来的注册回答
+（JSONL，每行 {"text": "...", "label": "name|skip|other", "name": "名字（label 为 name 时）"}）。
+
+用法:
+    python -m src.voice.name_intent_bench
+    python -m src.voice.name_intent_bench --threshold 0.8 --data logs/enrollment.jsonl
+"""
+
+import argparse
+import json
+import time
+
+from src.voice.name_intent import NameIntentClassifier
+
+# (文本, 标签, 名字)
+EVAL_PHRASES = [
+    ("我叫孙悦", "name", "孙悦"),
+    ("欣欣", "name", "欣欣"),
+    ("我是马超呀", "name", "马超"),
+    ("叫我果果", "name", "果果"),
+    ("我的名字是林峰", "name", "林峰"),
+    ("小宝", "name", "小宝"),
+    ("我叫梓萱。", "name", "梓萱"),
+    ("黄蓉", "name", "黄蓉"),
+    ("嗯，我叫周周", "name", "周周"),
+    ("叫我明明就好", "name", "明明"),
+    ("我名叫安琪", "name", "安琪"),
+    ("我是贝贝哦", "name", "贝贝"),
+    ("算了不说了", "skip", None),
+    ("我不想说名字", "skip", None),
+    ("不告诉你哦", "skip", None),
+    ("保密保密", "skip", None),
+    ("下回再说吧", "skip", None),
+    ("别问啦", "skip", None),
+    ("跳过这个", "skip", None),
+    ("不想告诉你", "skip", None),
+    ("你会跳舞吗", "other", None),
+    ("几点了", "other", None),
+    ("我想看动画片", "other", None),
+    ("给我讲个笑话吧", "other", None),
+    ("你叫什么", "other", None),
+    ("我饿了想吃饭", "other", None),
+    ("今天星期几", "other", None),
+    ("放首歌听听", "other", None),
+    ("你说啥", "other", None),
+    ("外面好冷啊", "other", None),
+]
+
+
+def load_phrases(path: str) -> list:
+    phrases = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                phrases.append((item["text"], item["label"], item.get("name")))
+    return phrases
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_benchmark(phrases: list, threshold: float = 0.75, repeat: int = 20) -> dict:
+    """
+    Args:
+        phrases: [(文本, 标签, 名字)]
+        threshold: 置信度阈值（低于阈值的交给大模型）
+        repeat: 每条短语重复分类次数（用于统计延迟）
+
+    Returns:
+        {"train_ms", "count", "accuracy", "confident", "confident_accuracy", "llm_rate", "latency_us", "errors"}
+    """
+    t0 = time.perf_counter()
+    classifier = NameIntentClassifier()
+    train_ms = (time.perf_counter() - t0) * 1000
+
+    correct = confident = confident_correct = 0
+    latencies = []
+    errors = []
+    for text, label, name in phrases:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = classifier.classify(text)
+            latencies.append((time.perf_counter() - t0) * 1e6)
+
+        predicted = "name" if result["is_name"] else "skip" if result["skip"] else "other"
+        ok = predicted == label and (label != "name" or result["name"] == name)
+        correct += ok
+        if result["confidence"] >= threshold:
+            confident += 1
+            confident_correct += ok
+        if not ok:
+            errors.append({"text": text, "label": label, "predicted": predicted,
+                           "name": result["name"], "confidence": round(result["confidence"], 2)})
+
+    count = len(phrases)
+    return {
+        "train_ms": train_ms,
+        "count": count,
+        "accuracy": correct / count,
+        "confident": confident,
+        "confident_accuracy": confident_correct / confident if confident else None,
+        "llm_rate": 1 - confident / count,
+        "latency_us": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+                       "max": max(latencies)},
+        "errors": errors
+    }
+
+
+def print_report(report: dict, threshold: float):
+    print(f"📊 名字意图识别: {report['count']} 条短语（训练耗时 {report['train_ms']:.0f}ms）")
+    print(f"   总体准确率: {report['accuracy']:.1%}")
+    confident_accuracy = report["confident_accuracy"]
+    print(f"   置信度 ≥ {threshold}: {report['confident']} 条，准确率 "
+          f"{'-' if confident_accuracy is None else f'{confident_accuracy:.1%}'}")
+    print(f"   交给大模型: {report['llm_rate']:.1%}")
+    latency = report["latency_us"]
+    print(f"   单次延迟: p50 {latency['p50']:.0f}µs, p95 {latency['p95']:.0f}µs, max {latency['max']:.0f}µs")
+    for error in report["errors"]:
+        print(f"   ❌ {error['text']}: 应为 {error['label']}，识别为 {error['predicted']} "
+              f"({error['name']}, {error['confidence']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="名字意图识别基准测试")
+    parser.add_argument("--data", default=None, help="评测数据 JSONL（默认使用内置评测集）")
+    parser.add_argument("--threshold", type=float, default=0.75, help="置信度阈值")
+    parser.add_argument("--repeat", type=int, default=20, help="每条短语重复次数")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    args = parser.parse_args()
+
+    phrases = load_phrases(args.data) if args.data else EVAL_PHRASES
+    report = run_benchmark(phrases, args.threshold, args.repeat)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,20 +8,26 @@
 3. 声纹渐进式更新（适应声音变化）
 """
 
+import importlib.util
 import os
 import json
+import time
 import numpy as np
 from typing import Optional, Tuple, Dict, List
 from pathlib import Path
 
-# 尝试导入 resemblyzer
-try:
-    from resemblyzer import VoiceEncoder, preprocess_wav
-    RESEMBLYZER_AVAILABLE = True
-except ImportError:
-    RESEMBLYZER_AVAILABLE = False
-    print("⚠️ resemblyzer 未安装，声纹识别功能不可用")
-    print("   安装命令: pip install resemblyzer")
+# resemblyzer 依赖 torch，导入要好几秒：模块导入时只检查是否安装，创建 SpeakerIdentifier 时才真正导入
+RESEMBLYZER_AVAILABLE = importlib.util.find_spec("resemblyzer") is not None
+VoiceEncoder = None
+
+
+def get_voice_encoder():
+    """延迟加载 resemblyzer.VoiceEncoder"""
+    global VoiceEncoder
+    if VoiceEncoder is None:
+        from resemblyzer import VoiceEncoder as _VoiceEncoder
+        VoiceEncoder = _VoiceEncoder
+    return VoiceEncoder
 
 
 class SpeakerIdentifier:
@@ -46,8 +52,11 @@ class SpeakerIdentifier:
         self.encoder = None
         if RESEMBLYZER_AVAILABLE:
             print("🔊 加载声纹识别模型...")
-            self.encoder = VoiceEncoder()
+            self.encoder = get_voice_encoder()()
             print("✅ 声纹识别模型加载完成")
+        else:
+            print("⚠️ resemblyzer 未安装，声纹识别功能不可用")
+            print("   安装命令: pip install resemblyzer")
 
         # 加载已注册的说话人
         self.speakers: Dict[str, dict] = {}
@@ -99,6 +108,20 @@ class SpeakerIdentifier:
         emb_file = self.embeddings_dir / f"{speaker_id}.npy"
         np.save(emb_file, embedding)
 
+    def warm_up(self) -> dict:
+        """
+        启动预热：用一段合成音频做一次推理（首次推理要初始化计算图，明显慢于之后）
+
+        Returns:
+            {"infer_ms"}
+        """
+        if self.encoder is None:
+            return {}
+        wav = np.random.default_rng(0).uniform(-0.1, 0.1, 16000 * 2).astype(np.float32)
+        t0 = time.perf_counter()
+        self.encoder.embed_utterance(wav)
+        return {"infer_ms": (time.perf_counter() - t0) * 1000}
+
     def extract_embedding(self, audio_data: bytes, sample_rate: int = 16000) -> Optional[np.ndarray]:
         """
         从音频数据提取声纹特征
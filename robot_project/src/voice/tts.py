@@ -6,12 +6,28 @@
 """
 
 import asyncio
+import contextlib
 import json
 import uuid
 import gzip
-import websockets
 import ssl
-from typing import Optional, AsyncGenerator
+from typing import Optional, AsyncGenerator, AsyncIterator
+
+from src.tracing import get_tracer
+from src.startup import warm_up_endpoint
+
+
+# websockets 延迟导入（import src.voice.tts 时不加载，首次建连时才导入）
+websockets = None
+
+
+def get_websockets():
+    """延迟加载 websockets"""
+    global websockets
+    if websockets is None:
+        import websockets as _websockets
+        websockets = _websockets
+    return websockets
 
 
 class VolcengineTTS:
@@ -56,6 +72,10 @@ class VolcengineTTS:
         print(f"   音色: {self.speaker}")
         print(f"   语速: {self.speed_ratio}x")
 
+    def warm_up(self) -> dict:
+        """启动预热：提前解析服务域名并握手一次（同步，在启动线程中调用）"""
+        return warm_up_endpoint(self.WSS_URL, self.ssl_context)
+
     def _build_header(self, msg_type: int = 1, msg_flags: int = 0, 
                       serialization: int = 1, compression: int = 0) -> bytes:
         """
@@ -171,6 +191,26 @@ class VolcengineTTS:
         Yields:
             音频数据块（PCM格式）
         """
+        async def single_text():
+            yield text
+
+        async for chunk in self.synthesize_text_stream(single_text()):
+            yield chunk
+
+    async def synthesize_text_stream(self, texts: AsyncIterator[str]) -> AsyncGenerator[bytes, None]:
+        """
+        V3 双向流式合成：文本边到边合成
+
+        同一个会话内逐段发送 TaskRequest，第一句文本到达就开始合成，
+        适合配合 LLM 流式输出使用（第一句先响，后面的句子还在生成）。
+
+        Args:
+            texts: 异步文本迭代器，每个元素是一句/一个分句
+
+        Yields:
+            音频数据块（PCM格式）
+        """
+        websockets = get_websockets()
         request_id = str(uuid.uuid4())
 
         # V3 使用 HTTP Header 鉴权
@@ -181,6 +221,9 @@ class VolcengineTTS:
             "X-Api-Connect-Id": request_id
         }
 
+        send_task = None
+        stop_sending = asyncio.Event()
+        tracer = get_tracer()
         try:
             async with websockets.connect(
                 self.WSS_URL,
@@ -204,147 +247,173 @@ class VolcengineTTS:
                 # 等待 SessionStarted (event=150)
                 response = await asyncio.wait_for(ws.recv(), timeout=10)
                 print(f"✅ 会话已开始")
+                tracer.mark("tts_connected")
 
-                # 2. 发送 TaskRequest (文本)
-                text_request = self._build_text_request(text, request_id)
-                await ws.send(text_request)
+                # 2. 边收文本边发送 TaskRequest，文本结束后发送 FinishSession
+                #    接收提前结束（错误帧 / 超时）时只停止发送，不取消任务：任务可能正停在上游
+                #    texts 的 __anext__ 里，取消会中断 LLM 生成；剩下的句子由调用方读完
+                async def send_texts():
+                    try:
+                        async for text in texts:
+                            if stop_sending.is_set():
+                                break
+                            if text and text.strip():
+                                tracer.mark("tts_first_text")
+                                await ws.send(self._build_text_request(text, request_id))
+                    finally:
+                        try:
+                            await ws.send(self._build_finish_request(request_id))
+                        except Exception:
+                            pass
+
+                send_task = asyncio.create_task(send_texts())
+
+                # 3. 接收音频数据（与发送并行）
+                async for audio_data in self._receive_audio(ws):
+                    tracer.mark("tts_first_audio")
+                    yield audio_data
+
+        except (GeneratorExit, asyncio.CancelledError):
+            # 调用方提前关闭（插话打断）或任务被取消：连同上游生成一起停止
+            if send_task is not None:
+                send_task.cancel()
+            raise
 
-                # 3. 发送 FinishSession (告诉服务器没有更多文本了)
-                finish_request = self._build_finish_request(request_id)
-                await ws.send(finish_request)
+        except Exception as e:
+            import traceback
+            print(f"❌ TTS连接失败: {e}")
+            print(f"详细错误:\n{traceback.format_exc()}")
 
-                # 4. 接收音频数据
-                total_audio_bytes = 0
-                while True:
+        finally:
+            # 等发送任务真正结束再返回：调用方随后会关闭 texts，任务还停在 __anext__ 里时
+            # aclose() 会抛 "asynchronous generator is already running"
+            if send_task is not None:
+                stop_sending.set()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await send_task
+
+    async def _receive_audio(self, ws) -> AsyncGenerator[bytes, None]:
+        """接收一个会话的音频帧，直到 SessionFinished / 错误 / 超时"""
+        websockets = get_websockets()
+        total_audio_bytes = 0
+        while True:
+            try:
+                response = await asyncio.wait_for(ws.recv(), timeout=30)
+
+                if len(response) < 4:
+                    continue
+
+                # 正确解析 msg_type（高4位）和 msg_flags（低4位）
+                msg_type = (response[1] >> 4) & 0x0F
+                msg_flags = response[1] & 0x0F
+                header_size = 4  # 固定4字节
+
+                # 音频响应 (msg_type=0xB)
+                if msg_type == self.MSG_AUDIO_RESPONSE:
+                    # 音频帧格式: header(4) + event(4) + session_id_len(4) + session_id + payload_size(4) + audio
+                    offset = 4  # 跳过 header
+
+                    # 跳过 event (4 bytes)
+                    offset += 4
+
+                    # 读取 session_id_len
+                    if len(response) < offset + 4:
+                        continue
+                    session_id_len = int.from_bytes(response[offset:offset+4], 'big')
+                    offset += 4
+
+                    # 跳过 session_id
+                    offset += session_id_len
+
+                    # 读取 payload_size
+                    if len(response) < offset + 4:
+                        continue
+                    payload_size = int.from_bytes(response[offset:offset+4], 'big')
+                    offset += 4
+
+                    # 读取音频数据
+                    audio_data = response[offset:offset+payload_size]
+                    if audio_data:
+                        total_audio_bytes += len(audio_data)
+                        yield audio_data
+
+                    # 不再根据 msg_flags 判断结束
+                    # 长文本会分多句，每句最后的音频帧都带结束标志
+                    # 只通过 event=152 (SessionFinished) 判断真正结束
+
+                # 错误响应 (msg_type=0xF)
+                elif msg_type == self.MSG_ERROR_RESPONSE:
                     try:
-                        response = await asyncio.wait_for(ws.recv(), timeout=30)
+                        # 错误帧格式: header(4) + error_code(4) + payload_size(4) + error_message
+                        offset = 4  # 跳过 header
+
+                        # 读取 error_code
+                        error_code = int.from_bytes(response[offset:offset+4], 'big')
+                        offset += 4
+
+                        # 读取 payload_size
+                        payload_size = int.from_bytes(response[offset:offset+4], 'big')
+                        offset += 4
+
+                        # 读取错误消息
+                        error_data = response[offset:offset+payload_size]
+                        error_msg = json.loads(error_data.decode('utf-8'))
+                        print(f"❌ TTS错误 [code={error_code}]: {error_msg}")
+                    except Exception as e:
+                        print(f"❌ TTS错误响应解析失败: {e}")
+                    break
+
+                # JSON 响应（Full-server response, msg_type=0x9）
+                elif msg_type == 0x9:
+                    try:
+                        # JSON帧格式: header(4) + event(4) + session_id_len(4) + session_id + payload_size(4) + json
+                        offset = 4  # 跳过 header
 
-                        if len(response) < 4:
-                            continue
+                        # 读取 event
+                        event = int.from_bytes(response[offset:offset+4], 'big')
+                        offset += 4
 
-                        # 正确解析 msg_type（高4位）和 msg_flags（低4位）
-                        msg_type = (response[1] >> 4) & 0x0F
-                        msg_flags = response[1] & 0x0F
-                        header_size = 4  # 固定4字节
-
-                        # 音频响应 (msg_type=0xB)
-                        if msg_type == self.MSG_AUDIO_RESPONSE:
-                            # 音频帧格式: header(4) + event(4) + session_id_len(4) + session_id + payload_size(4) + audio
-                            offset = 4  # 跳过 header
-
-                            # 跳过 event (4 bytes)
-                            offset += 4
-
-                            # 读取 session_id_len
-                            if len(response) < offset + 4:
-                                continue
-                            session_id_len = int.from_bytes(response[offset:offset+4], 'big')
-                            offset += 4
-
-                            # 跳过 session_id
-                            offset += session_id_len
-
-                            # 读取 payload_size
-                            if len(response) < offset + 4:
-                                continue
-                            payload_size = int.from_bytes(response[offset:offset+4], 'big')
-                            offset += 4
-
-                            # 读取音频数据
-                            audio_data = response[offset:offset+payload_size]
-                            if audio_data:
-                                total_audio_bytes += len(audio_data)
-                                yield audio_data
-
-                            # 不再根据 msg_flags 判断结束
-                            # 长文本会分多句，每句最后的音频帧都带结束标志
-                            # 只通过 event=152 (SessionFinished) 判断真正结束
-
-                        # 错误响应 (msg_type=0xF)
-                        elif msg_type == self.MSG_ERROR_RESPONSE:
-                            try:
-                                # 错误帧格式: header(4) + error_code(4) + payload_size(4) + error_message
-                                offset = 4  # 跳过 header
-
-                                # 读取 error_code
-                                error_code = int.from_bytes(response[offset:offset+4], 'big')
-                                offset += 4
-
-                                # 读取 payload_size
-                                payload_size = int.from_bytes(response[offset:offset+4], 'big')
-                                offset += 4
-
-                                # 读取错误消息
-                                error_data = response[offset:offset+payload_size]
-                                error_msg = json.loads(error_data.decode('utf-8'))
-                                print(f"❌ TTS错误 [code={error_code}]: {error_msg}")
-                            except Exception as e:
-                                print(f"❌ TTS错误响应解析失败: {e}")
-                            break
+                        # 读取 session_id_len
+                        if len(response) < offset + 4:
+                            continue
+                        session_id_len = int.from_bytes(response[offset:offset+4], 'big')
+                        offset += 4
 
-                        # JSON 响应（Full-server response, msg_type=0x9）
-                        elif msg_type == 0x9:
-                            try:
-                                # JSON帧格式: header(4) + event(4) + session_id_len(4) + session_id + payload_size(4) + json
-                                offset = 4  # 跳过 header
-
-                                # 读取 event
-                                event = int.from_bytes(response[offset:offset+4], 'big')
-                                offset += 4
-
-                                # 读取 session_id_len
-                                if len(response) < offset + 4:
-                                    continue
-                                session_id_len = int.from_bytes(response[offset:offset+4], 'big')
-                                offset += 4
-
-                                # 跳过 session_id
-                                offset += session_id_len
-
-                                # 读取 payload_size
-                                if len(response) < offset + 4:
-                                    continue
-                                payload_size = int.from_bytes(response[offset:offset+4], 'big')
-                                offset += 4
-
-                                # 读取 JSON 数据
-                                json_data = response[offset:offset+payload_size]
-                                resp_json = json.loads(json_data.decode('utf-8'))
-
-                                # 检查事件类型
-                                # event=350: TTSSentenceStart（句子开始）
-                                # event=351: TTSSentenceEnd（句子结束）- 但可能还有后续句子
-                                # event=152: SessionFinished（会话结束）- 所有句子都完成
-                                if event == 350:
-                                    # 句子开始，显示文本
-                                    text = resp_json.get('text', '')
-                                    if text:
-                                        print(f"📝 合成中: {text[:50]}...")
-                                elif event == 152:
-                                    # 会话结束，退出循环
-                                    print(f"✅ 合成完成")
-                                    break
-                                # event=351 不退出，继续接收下一句
-                            except Exception as e:
-                                print(f"⚠️ JSON解析失败: {e}")
-
-                    except asyncio.TimeoutError:
-                        print("⚠️ TTS响应超时")
-                        break
-                    except websockets.ConnectionClosed:
-                        break
-
-                # 4. 发送结束会话请求
-                try:
-                    finish_request = self._build_finish_request(request_id)
-                    await ws.send(finish_request)
-                except:
-                    pass
+                        # 跳过 session_id
+                        offset += session_id_len
 
-        except Exception as e:
-            import traceback
-            print(f"❌ TTS连接失败: {e}")
-            print(f"详细错误:\n{traceback.format_exc()}")
+                        # 读取 payload_size
+                        if len(response) < offset + 4:
+                            continue
+                        payload_size = int.from_bytes(response[offset:offset+4], 'big')
+                        offset += 4
+
+                        # 读取 JSON 数据
+                        json_data = response[offset:offset+payload_size]
+                        resp_json = json.loads(json_data.decode('utf-8'))
+
+                        # 检查事件类型
+                        # event=350: TTSSentenceStart（句子开始）
+                        # event=351: TTSSentenceEnd（句子结束）- 但可能还有后续句子
+                        # event=152: SessionFinished（会话结束）- 所有句子都完成
+                        if event == 350:
+                            # 句子开始，显示文本
+                            text = resp_json.get('text', '')
+                            if text:
+                                print(f"📝 合成中: {text[:50]}...")
+                        elif event == 152:
+                            # 会话结束，退出循环
+                            print(f"✅ 合成完成")
+                            break
+                        # event=351 不退出，继续接收下一句
+                    except Exception as e:
+                        print(f"⚠️ JSON解析失败: {e}")
+
+            except asyncio.TimeoutError:
+                print("⚠️ TTS响应超时")
+                break
+            except websockets.ConnectionClosed:
+                break
 
     async def synthesize(self, text: str) -> Optional[bytes]:
         """
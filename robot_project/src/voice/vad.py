@@ -3,10 +3,21 @@
 使用 webrtcvad 实现实时语音检测（持续监听核心）
 """
 
-import webrtcvad
 import collections
 from typing import Iterator, Optional
 
+# webrtcvad 延迟导入（创建 VADDetector 时才加载）
+webrtcvad = None
+
+
+def get_webrtcvad():
+    """延迟加载 webrtcvad"""
+    global webrtcvad
+    if webrtcvad is None:
+        import webrtcvad as _webrtcvad
+        webrtcvad = _webrtcvad
+    return webrtcvad
+
 
 class VADDetector:
     """语音活动检测器"""
@@ -23,7 +34,7 @@ class VADDetector:
                            3: 最严格（推荐，减少误触发）
             sample_rate: 采样率（必须是 8000, 16000, 32000, 48000 之一）
         """
-        self.vad = webrtcvad.Vad(aggressiveness)
+        self.vad = get_webrtcvad().Vad(aggressiveness)
         self.sample_rate = sample_rate
 
         # 验证采样率
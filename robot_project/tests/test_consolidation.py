@@ -0,0 +1,103 @@
+"""
+长期记忆整理测试（NumpyStore 后端，对话向量直接写入）
+
+运行：
+    python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from src.brain.brain import Memory
+from src.brain.consolidation import MemoryConsolidator
+
+NOW = datetime(2026, 10, 1, 20, 0)
+
+
+def topic_vector(topic: int, dim: int = 8) -> list:
+    vector = [0.0] * dim
+    vector[topic] = 1.0
+    return vector
+
+
+class ConsolidationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.db_path, ignore_errors=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.memory = Memory(db_path=self.db_path, store="numpy")
+        # 摘要的向量由嵌入函数计算，这里用固定向量代替（不需要下载模型）
+        self.memory.store.embedding_fn = lambda documents: [topic_vector(7) for _ in documents]
+        # 30 天前起每天 3 条对话：两条聊天气、一条聊学校
+        ids, documents, metadatas, embeddings = [], [], [], []
+        for day in range(10):
+            for i, topic in enumerate((0, 0, 1)):
+                time = NOW - timedelta(days=30 - day, hours=-i)
+                ids.append(f"conv_{day}_{i}")
+                documents.append(f"第{day}天第{i}条")
+                metadatas.append({"time": time.isoformat(), "type": Memory.TYPE_CONVERSATION,
+                                  "speaker": Memory.SPEAKER_SHARED})
+                embeddings.append(topic_vector(topic))
+        self.memory.conversations.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        self.memory._conv_count = len(ids)
+        self.memory._conv_speaker_counts = {Memory.SPEAKER_SHARED: len(ids)}
+
+    def consolidator(self, **kwargs) -> MemoryConsolidator:
+        return MemoryConsolidator(self.memory, lambda documents: "摘要", **kwargs)
+
+    def test_paged_plan_matches_single_page(self):
+        whole = self.consolidator(page_size=1000).plan(NOW)
+        paged = self.consolidator(page_size=4).plan(NOW)
+        self.assertEqual([[r["id"] for r in c] for c in paged], [[r["id"] for r in c] for c in whole])
+        self.assertEqual(len(whole), 10)
+
+    def test_reads_are_bounded_by_page_size(self):
+        reads = []
+        get = self.memory.conversations.get
+
+        def spy(*args, **kwargs):
+            result = get(*args, **kwargs)
+            reads.append((len(result["ids"]), "embeddings" in kwargs.get("include", ())))
+            return result
+
+        self.memory.conversations.get = spy
+        self.consolidator(page_size=4).plan(NOW)
+        self.assertTrue(all(count <= 4 for count, _ in reads))
+        self.assertEqual(sum(count for count, with_vectors in reads if with_vectors), 30)
+
+    def test_max_plan_size_takes_oldest_first(self):
+        clusters = self.consolidator(page_size=4, max_plan_size=6).plan(NOW)
+        self.assertEqual([[r["id"] for r in c] for c in clusters],
+                         [["conv_0_0", "conv_0_1"], ["conv_1_0", "conv_1_1"]])
+
+    def test_replace_conversations_is_idempotent(self):
+        old_ids = ["conv_0_0", "conv_0_1"]
+        metadata = {"time": NOW.isoformat(), "type": Memory.TYPE_DIGEST}
+        self.memory.replace_conversations(old_ids, "摘要", metadata)
+        # 模拟上次整理写完摘要后中断：原对话还在，重新整理同一批
+        self.memory.conversations.add(ids=["conv_0_0"], documents=["第0天第0条"],
+                                      metadatas=[{"time": NOW.isoformat(), "speaker": Memory.SPEAKER_SHARED}],
+                                      embeddings=[topic_vector(0)])
+        self.memory._conv_count += 1
+        self.memory.replace_conversations(old_ids, "摘要", metadata)
+        self.memory.replace_conversations(old_ids, "摘要", metadata)
+
+        digests = self.memory.conversations.get(where={"type": Memory.TYPE_DIGEST}, include=[])["ids"]
+        self.assertEqual(len(digests), 1)
+        self.assertEqual(self.memory.conversations.count(), 29)
+        self.assertEqual(self.memory._conv_count, 29)
+
+    def test_run_consolidates_each_cluster_once(self):
+        report = self.consolidator(page_size=4).run(now=NOW)
+        self.assertEqual(report["clusters"], 10)
+        self.assertEqual(report["after"], 20)
+        self.assertEqual(self.consolidator(page_size=4).run(now=NOW)["clusters"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
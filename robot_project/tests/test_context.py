@@ -0,0 +1,98 @@
+"""
+上下文 token 预算测试（TokenCounter 缓存 / ContextPacker 打包）
+
+运行：
+    python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import unittest
+
+from src.brain.context import ContextPacker, TokenCounter
+
+
+class CharCounter:
+    """一个字一个 token，便于手算预算"""
+
+    def count(self, text: str) -> int:
+        return len(text)
+
+
+def turn(user: str, reply: str) -> list:
+    return [{"role": "user", "content": user, "tokens": len(user)},
+            {"role": "assistant", "content": reply, "tokens": len(reply)}]
+
+
+class TokenCounterTest(unittest.TestCase):
+
+    def test_estimate(self):
+        counter = TokenCounter()
+        self.assertEqual(counter.name, "estimate")
+        self.assertEqual(counter.count("你好你好你好"), 4)
+        self.assertEqual(counter.count("hello world!"), 3)
+        self.assertEqual(counter.count(""), 0)
+
+    def test_real_tokenizer_counts_are_cached(self):
+        counter = TokenCounter(cache_size=2)
+        calls = []
+        counter._encode = lambda text: calls.append(text) or list(text)
+        self.assertEqual(counter.count("一二三"), 3)
+        self.assertEqual(counter.count("一二三"), 3)
+        self.assertEqual(calls, ["一二三"])
+
+        # 超出 cache_size 后淘汰最久未用的
+        counter.count("四五")
+        counter.count("六")
+        counter.count("一二三")
+        self.assertEqual(calls, ["一二三", "四五", "六", "一二三"])
+
+    def test_unknown_tokenizer_falls_back_to_estimate(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            counter = TokenCounter("nope:model")
+        self.assertEqual(counter.name, "estimate")
+        self.assertEqual(counter.count("你好你好你好"), 4)
+
+
+class ContextPackerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.packer = ContextPacker(CharCounter(), total_budget=100)
+
+    def test_fixed_texts_are_always_charged(self):
+        packed = self.packer.pack(["人" * 40, "", "问" * 10], [], [], [])
+        self.assertEqual(packed["used_tokens"], 40 + 10 + 2 * ContextPacker.MESSAGE_OVERHEAD)
+        self.assertEqual(packed["budget"], 100)
+
+    def test_priority_facts_then_short_term_then_conversations(self):
+        # 固定 20 + 4 → 剩 76；事实 18+2 → 剩 56；一轮短期对话 20+20+8 → 剩 8；历史对话放不下
+        packed = self.packer.pack(
+            ["人" * 20],
+            ["事" * 18],
+            turn("问" * 20, "答" * 20),
+            ["旧" * 10]
+        )
+        self.assertEqual(packed["facts"], ["事" * 18])
+        self.assertEqual(len(packed["short_term"]), 2)
+        self.assertEqual(packed["conversations"], [])
+        self.assertEqual(packed["used_tokens"], 92)
+
+    def test_short_term_keeps_whole_turns_from_newest(self):
+        short_term = turn("早" * 10, "早" * 10) + turn("中" * 10, "中" * 10) + turn("晚" * 10, "晚" * 10)
+        packed = self.packer.pack(["人" * 40], [], short_term, [])
+        # 剩 56：最新两轮各 28 正好放下，最早一轮整轮丢弃，不会只留半轮
+        self.assertEqual([e["content"][0] for e in packed["short_term"]], ["中", "中", "晚", "晚"])
+
+    def test_stops_at_first_item_that_does_not_fit(self):
+        # 事实按相关度排序：放不下的那条之后即使有更短的也不再往后挑
+        packed = self.packer.pack([], ["事" * 95, "短短", "短"], [], ["旧"])
+        self.assertEqual(packed["facts"], ["事" * 95])
+        self.assertEqual(packed["conversations"], ["旧"])
+
+    def test_never_exceeds_budget(self):
+        packed = self.packer.pack(["人" * 10], ["事" * 30] * 5, turn("问" * 15, "答" * 15) * 3, ["旧" * 20] * 5)
+        self.assertLessEqual(packed["used_tokens"], packed["budget"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+事实关键词索引（BM25）和倒数排名融合测试
+
+运行：
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from src.brain.keyword_index import KeywordIndex, reciprocal_rank_fusion, tokenize
+
+
+class TokenizeTest(unittest.TestCase):
+
+    def test_chinese_chars_and_bigrams(self):
+        self.assertEqual(tokenize("生日快"), ["生", "日", "快", "生日", "日快"])
+
+    def test_ascii_words_and_punctuation(self):
+        self.assertEqual(tokenize("Wi-Fi 密码123！"), ["wi", "fi", "密", "码", "密码", "123"])
+        self.assertEqual(tokenize(""), [])
+        self.assertEqual(tokenize(None), [])
+
+
+class KeywordIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = KeywordIndex()
+        self.index.add_many(
+            ["f1", "f2", "f3", "f4"],
+            ["小明的生日是5月3日", "小明对花生过敏", "妈妈喜欢喝绿茶", "爸爸的生日是十月"]
+        )
+
+    def test_exact_terms_rank_first(self):
+        hits = self.index.search("花生过敏")
+        self.assertEqual(hits[0]["id"], "f2")
+        self.assertEqual(hits[0]["coverage"], 1.0)
+
+    def test_coverage_counts_key_terms(self):
+        hits = {hit["id"]: hit for hit in self.index.search("小明的生日", n_results=4)}
+        self.assertEqual(hits["f1"]["coverage"], 1.0)
+        self.assertLess(hits["f4"]["coverage"], 1.0)
+        self.assertGreater(hits["f1"]["score"], hits["f4"]["score"])
+
+    def test_accept_filters_documents(self):
+        hits = self.index.search("生日", n_results=4, accept=lambda doc_id: doc_id != "f1")
+        self.assertEqual(hits[0]["id"], "f4")
+        self.assertNotIn("f1", [hit["id"] for hit in hits])
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search("恐龙"), [])
+        self.assertEqual(self.index.search("！？"), [])
+        self.assertEqual(KeywordIndex().search("生日"), [])
+
+    def test_remove(self):
+        self.index.remove("f2")
+        self.index.remove("不存在")
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn("f2", [hit["id"] for hit in self.index.search("小明花生", n_results=4)])
+        # 移除后其余文档的排序不受影响
+        self.assertEqual(self.index.search("生日")[0]["id"], "f1")
+
+
+class ReciprocalRankFusionTest(unittest.TestCase):
+
+    def test_documents_in_both_rankings_win(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]])
+        self.assertEqual(fused[0], "c")
+        self.assertEqual(set(fused), {"a", "b", "c", "d"})
+
+    def test_single_ranking_keeps_order(self):
+        self.assertEqual(reciprocal_rank_fusion([["x", "y", "z"], []]), ["x", "y", "z"])
+
+    def test_top_rank_outweighs_lower_ranks_with_small_k(self):
+        self.assertEqual(reciprocal_rank_fusion([["a", "b"], ["b", "a"], ["a"]], k=1)[0], "a")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+"""
+记忆系统测试（NumpyStore 后端，嵌入用按字哈希的假模型，不需要下载模型）
+
+运行：
+    python -m unittest discover tests
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from src.brain.brain import Memory
+from src.brain.memory_writer import MemoryWriter
+
+
+class HashEmbedding:
+    """按单字和二字组哈希到固定维度的假嵌入（字面相近的文本向量相近），记录嵌入了多少条文本"""
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+        self.calls = 0
+
+    def _embed(self, text: str):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for term in list(text) + [text[i:i + 2] for i in range(len(text) - 1)]:
+            vector[int(hashlib.md5(term.encode("utf-8")).hexdigest(), 16) % self.dim] += 1
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def __call__(self, input: list) -> list:
+        self.calls += len(input)
+        return [self._embed(text) for text in input]
+
+
+def make_memory(db_path: str, **kwargs) -> Memory:
+    with contextlib.redirect_stdout(io.StringIO()):
+        memory = Memory(db_path=db_path, store="numpy", **kwargs)
+    memory.embedding_fn = memory.store.embedding_fn = HashEmbedding()
+    return memory
+
+
+class MemoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.db_path, ignore_errors=True)
+        patcher = mock.patch.object(MemoryWriter, "_RETRY_INTERVAL", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class RetrievalCacheTest(MemoryTestCase):
+    """查询只嵌入一次；重复查询命中结果缓存；写入后缓存失效"""
+
+    def setUp(self):
+        super().setUp()
+        self.memory = make_memory(self.db_path, keyword_search=False, fact_dedup_threshold=0)
+        self.memory.add_fact("小明喜欢吃苹果")
+        self.assertTrue(self.memory.flush(timeout=5))
+        self.embed = self.memory.embedding_fn
+        self.embed.calls = 0
+
+    def test_query_embedded_once_and_results_cached(self):
+        first = self.memory.search_memory("小明喜欢吃什么")
+        self.assertEqual(self.embed.calls, 1)
+        self.assertEqual(first["facts"], ["小明喜欢吃苹果"])
+
+        # 只差标点的查询直接命中结果缓存，不再嵌入也不再查询向量库
+        with mock.patch.object(self.memory.facts, "query") as query:
+            self.assertEqual(self.memory.search_memory("小明喜欢吃什么？"), first)
+            query.assert_not_called()
+        self.assertEqual(self.embed.calls, 1)
+
+    def test_returned_result_is_a_copy(self):
+        self.memory.search_memory("小明喜欢吃什么")["facts"].append("被调用方改掉")
+        self.assertEqual(self.memory.search_memory("小明喜欢吃什么")["facts"], ["小明喜欢吃苹果"])
+
+    def test_write_invalidates_results_but_keeps_query_vector(self):
+        self.memory.search_memory("小明喜欢吃什么")
+        self.memory.add_fact("小明喜欢吃西瓜")
+        self.assertTrue(self.memory.flush(timeout=5))
+        self.embed.calls = 0
+
+        result = self.memory.search_memory("小明喜欢吃什么")
+        self.assertIn("小明喜欢吃西瓜", result["facts"])
+        self.assertEqual(self.embed.calls, 0)
+
+
+class SpeakerPartitionTest(MemoryTestCase):
+    """说话人分区：只检索本人和共享的记忆；说话人名单 speakers.json"""
+
+    def setUp(self):
+        super().setUp()
+        self.memory = make_memory(self.db_path, fact_dedup_threshold=0, similarity_threshold=4.0)
+        self.memory.add_fact("我对花生过敏", "小明")
+        self.memory.add_fact("我对芒果过敏", "妈妈")
+        self.memory.add_fact("我们家住在北京", "妈妈")
+        for i in range(self.memory.max_short_term + 2):
+            self.memory.add_conversation(f"今天画了第{i}幅画", "真棒", "小明" if i % 2 else "妈妈")
+        self.assertTrue(self.memory.flush(timeout=5))
+
+    def registry(self) -> list:
+        with open(os.path.join(self.db_path, "speakers.json"), encoding="utf-8") as f:
+            return json.load(f)["speakers"]
+
+    def test_household_fact_is_shared(self):
+        self.assertEqual(self.memory._fact_speaker_counts, {"小明": 1, "妈妈": 1, Memory.SPEAKER_SHARED: 1})
+
+    def test_vector_search_sees_own_and_shared(self):
+        result = self.memory.search_memory("我对什么东西过敏，家住在哪个城市呢", n_results=10, speaker="小明")
+        self.assertIn("我对花生过敏", result["facts"])
+        self.assertIn("我们家住在北京", result["facts"])
+        self.assertNotIn("我对芒果过敏", result["facts"])
+        self.assertTrue(result["conversations"])
+        self.assertTrue(all(int(doc.split("第")[1].split("幅")[0]) % 2 for doc in result["conversations"]))
+
+    def test_keyword_shortcut_is_filtered(self):
+        self.assertNotIn("我对芒果过敏", self.memory.search_memory("芒果过敏", speaker="小明")["facts"])
+        self.assertEqual(self.memory.search_memory("芒果过敏", speaker="妈妈")["facts"], ["我对芒果过敏"])
+
+    def test_unknown_speaker_searches_everything(self):
+        facts = self.memory.search_memory("过敏", n_results=10)["facts"]
+        self.assertEqual(sorted(facts), ["我对芒果过敏", "我对花生过敏"])
+
+    def test_registry_written_and_used_on_reopen(self):
+        self.assertEqual(self.registry(), sorted(["小明", "妈妈", Memory.SPEAKER_SHARED]))
+        self.memory.store.close()
+
+        with mock.patch.object(Memory, "_scan_speakers") as scan:
+            reopened = make_memory(self.db_path)
+        scan.assert_not_called()
+        self.assertEqual(reopened._fact_speaker_counts, self.memory._fact_speaker_counts)
+        self.assertEqual(reopened._conv_speaker_counts, self.memory._conv_speaker_counts)
+        self.assertEqual(reopened._fact_speakers, self.memory._fact_speakers)
+
+    def test_stale_registry_triggers_scan(self):
+        self.memory.store.close()
+        with open(os.path.join(self.db_path, "speakers.json"), "w", encoding="utf-8") as f:
+            json.dump({"speakers": ["小明"]}, f)
+
+        reopened = make_memory(self.db_path)
+        self.assertEqual(reopened._fact_speaker_counts, self.memory._fact_speaker_counts)
+        self.assertEqual(self.registry(), sorted(["小明", "妈妈", Memory.SPEAKER_SHARED]))
+
+    def test_partition_disabled(self):
+        self.memory.speaker_partition = False
+        facts = self.memory.search_memory("过敏", n_results=10, speaker="小明")["facts"]
+        self.assertIn("我对芒果过敏", facts)
+
+
+class FailedFactWriteTest(MemoryTestCase):
+    """事实批次写入失败被丢弃后，待写记录和关键词索引都要撤销"""
+
+    def setUp(self):
+        super().setUp()
+        self.memory = make_memory(self.db_path)
+
+    def test_dropped_fact_is_forgotten(self):
+        with mock.patch.object(self.memory.facts, "add", side_effect=IOError("SD 卡忙")), \
+                contextlib.redirect_stdout(io.StringIO()):
+            self.memory.add_fact("我对花生过敏", "小明")
+            self.assertEqual(len(self.memory.keyword_index), 1)
+            self.assertFalse(self.memory.flush(timeout=5))
+
+        self.assertEqual(self.memory._pending_facts, set())
+        self.assertEqual(self.memory._fact_speakers, {})
+        self.assertEqual(self.memory.keyword_index.search("花生过敏"), [])
+
+        # 同样的事实可以重新保存
+        self.memory.add_fact("我对花生过敏", "小明")
+        self.assertTrue(self.memory.flush(timeout=5))
+        self.assertEqual(self.memory.facts.count(), 1)
+        self.assertEqual(len(self.memory.keyword_index), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
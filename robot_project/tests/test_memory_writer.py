@@ -0,0 +1,120 @@
+"""
+记忆批量写入队列测试
+
+运行：
+    python -m unittest discover tests
+"""
+
+import threading
+import unittest
+from unittest import mock
+
+from src.brain.memory_writer import MemoryWriter
+
+
+class FlakyCollection:
+    """前 failures 次 add() 抛异常的假集合"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.ids = []
+
+    def add(self, ids, documents, metadatas, embeddings=None):
+        if self.failures > 0:
+            self.failures -= 1
+            raise IOError("SD 卡忙")
+        self.ids.extend(ids)
+        self.embeddings = embeddings
+
+
+class MemoryWriterFlushTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(MemoryWriter, "_RETRY_INTERVAL", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush_retries_until_written(self):
+        collection = FlakyCollection(failures=2)
+        writer = MemoryWriter(batch_size=100, flush_interval=60, max_retries=3)
+        writer.enqueue(collection, "a", "文档", {})
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(collection.ids, ["a"])
+        writer.close()
+
+    def test_flush_reports_dropped_batch(self):
+        collection = FlakyCollection(failures=10)
+        writer = MemoryWriter(batch_size=100, flush_interval=60, max_retries=2)
+        writer.enqueue(collection, "a", "文档", {})
+        self.assertFalse(writer.flush(timeout=5))
+        self.assertEqual(writer.pending_count(), 0)
+        writer.close()
+
+    def test_queued_flushes_wait_for_write(self):
+        collection = FlakyCollection(failures=1)
+        writer = MemoryWriter(batch_size=100, flush_interval=60, max_retries=3)
+        writer.enqueue(collection, "a", "文档", {})
+
+        # 同时排队的多个 flush 会被第一个一起取出，必须等文档真正写入后才返回
+        results = []
+
+        def flush():
+            ok = writer.flush(timeout=5)
+            results.append((ok, list(collection.ids)))
+
+        flushers = [threading.Thread(target=flush) for _ in range(3)]
+        for t in flushers:
+            t.start()
+        for t in flushers:
+            t.join()
+        self.assertEqual(results, [(True, ["a"])] * 3)
+        writer.close()
+
+
+class MemoryWriterPrepareTest(unittest.TestCase):
+
+    def setUp(self):
+        self.collection = FlakyCollection()
+        self.writer = MemoryWriter(batch_size=100, flush_interval=60)
+        self.addCleanup(self.writer.close)
+
+    def test_prepare_runs_on_writer_thread(self):
+        threads = []
+
+        def prepare():
+            threads.append(threading.current_thread().name)
+            return [0.5, 0.5]
+
+        self.writer.enqueue(self.collection, "a", "文档", {}, prepare=prepare)
+        self.assertTrue(self.writer.flush(timeout=5))
+        self.assertEqual(threads, ["memory-writer"])
+        self.assertEqual(self.collection.ids, ["a"])
+        self.assertEqual(self.collection.embeddings, [[0.5, 0.5]])
+
+    def test_prepare_returning_none_skips_document(self):
+        self.writer.enqueue(self.collection, "a", "重复", {}, prepare=lambda: None)
+        self.writer.enqueue(self.collection, "b", "文档", {})
+        self.assertTrue(self.writer.flush(timeout=5))
+        self.assertEqual(self.collection.ids, ["b"])
+
+    def test_dropped_batch_calls_on_failed(self):
+        failed = []
+        writer = MemoryWriter(batch_size=100, flush_interval=60, max_retries=1,
+                              on_failed=lambda collection, ids, documents, metadatas: failed.extend(ids))
+        writer.enqueue(FlakyCollection(failures=10), "a", "文档", {})
+        self.assertFalse(writer.flush(timeout=5))
+        self.assertEqual(failed, ["a"])
+        writer.close()
+
+    def test_failed_prepare_still_writes(self):
+        def prepare():
+            raise RuntimeError("嵌入模型未加载")
+
+        self.writer.enqueue(self.collection, "a", "文档", {}, prepare=prepare)
+        self.assertTrue(self.writer.flush(timeout=5))
+        self.assertEqual(self.collection.ids, ["a"])
+        self.assertIsNone(self.collection.embeddings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+本地 Ollama 常驻与人格前缀预填充测试（假的 ollama 模块，不需要本地服务）
+
+运行：
+    python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import types
+import unittest
+from unittest import mock
+
+from src.brain import brain as brain_module
+from src.brain.brain import Brain
+from src.brain.context import TokenCounter
+
+SYSTEM_PROMPT = "你是小智，一个陪伴孩子成长的机器人。"
+
+
+class FakeOllama:
+    """记录 generate / chat 调用，返回带耗时统计的响应"""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, **kwargs):
+        self.calls.append(("generate", kwargs))
+        return {"load_duration": 1_500_000_000}
+
+    def chat(self, **kwargs):
+        self.calls.append(("chat", kwargs))
+        return {"prompt_eval_count": 20, "prompt_eval_duration": 300_000_000,
+                "message": {"content": "好"}}
+
+
+def make_brain(backend: str = "deepseek", fallback: str = Brain.LOCAL_ROUTE, num_keep="auto"):
+    """只带预热所需属性的 Brain（不连接后端、不打开记忆库）"""
+    brain = types.SimpleNamespace(
+        BACKEND_OLLAMA=Brain.BACKEND_OLLAMA,
+        backend=backend,
+        model="qwen2:7b",
+        local_model="qwen2:0.5b",
+        router=types.SimpleNamespace(fallback=fallback),
+        keep_alive=-1,
+        ollama_options={"num_ctx": 4096},
+        _num_keep=num_keep,
+        token_counter=TokenCounter(),
+        persona=types.SimpleNamespace(get_system_prompt=lambda: SYSTEM_PROMPT),
+    )
+    brain._warm_model = lambda: Brain._warm_model(brain)
+    brain._ollama_kwargs = lambda **options: Brain._ollama_kwargs(brain, **options)
+    return brain
+
+
+class OllamaKwargsTest(unittest.TestCase):
+
+    def test_keep_alive_and_options(self):
+        brain = make_brain()
+        self.assertEqual(Brain._ollama_kwargs(brain), {"keep_alive": -1, "options": {"num_ctx": 4096}})
+        self.assertEqual(Brain._ollama_kwargs(brain, num_ctx=2048, num_predict=1),
+                         {"keep_alive": -1, "options": {"num_ctx": 2048, "num_predict": 1}})
+        self.assertEqual(brain.ollama_options, {"num_ctx": 4096})
+
+    def test_no_options(self):
+        brain = make_brain()
+        brain.ollama_options = {}
+        self.assertEqual(Brain._ollama_kwargs(brain), {"keep_alive": -1})
+
+
+class WarmUpLocalTest(unittest.TestCase):
+
+    def warm_up(self, brain):
+        ollama = FakeOllama()
+        with mock.patch.object(brain_module, "get_ollama", lambda: ollama), \
+                contextlib.redirect_stdout(io.StringIO()):
+            report = Brain.warm_up_local(brain)
+        return report, ollama.calls
+
+    def test_loads_fallback_model_and_prefills_persona(self):
+        brain = make_brain()
+        report, calls = self.warm_up(brain)
+
+        self.assertEqual([name for name, _ in calls], ["generate", "chat"])
+        self.assertEqual(calls[0][1], {"model": "qwen2:0.5b", "prompt": "", "keep_alive": -1})
+        chat = calls[1][1]
+        self.assertEqual(chat["messages"], [{"role": "system", "content": SYSTEM_PROMPT}])
+        self.assertEqual(chat["keep_alive"], -1)
+        self.assertEqual(chat["options"]["num_predict"], 1)
+        self.assertEqual(report, {"model": "qwen2:0.5b", "load_ms": 1500.0,
+                                  "prefill_tokens": 20, "prefill_ms": 300.0})
+
+    def test_auto_num_keep_protects_persona_prefix(self):
+        brain = make_brain()
+        self.warm_up(brain)
+        expected = TokenCounter().count(SYSTEM_PROMPT)
+        self.assertEqual(brain.ollama_options["num_keep"], expected)
+        # 之后的每次请求都带上 num_keep
+        self.assertEqual(Brain._ollama_kwargs(brain)["options"]["num_keep"], expected)
+
+    def test_fixed_num_keep_is_not_overridden(self):
+        brain = make_brain(num_keep=64)
+        brain.ollama_options["num_keep"] = 64
+        self.warm_up(brain)
+        self.assertEqual(brain.ollama_options["num_keep"], 64)
+
+    def test_ollama_backend_warms_main_model(self):
+        report, calls = self.warm_up(make_brain(backend=Brain.BACKEND_OLLAMA, fallback=None))
+        self.assertEqual(report["model"], "qwen2:7b")
+        self.assertEqual(calls[0][1]["model"], "qwen2:7b")
+
+    def test_cloud_without_fallback_does_nothing(self):
+        report, calls = self.warm_up(make_brain(fallback=None))
+        self.assertEqual(report, {})
+        self.assertEqual(calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
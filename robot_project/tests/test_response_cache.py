@@ -0,0 +1,62 @@
+"""
+语义回复缓存测试
+
+嵌入用一个只认意图关键词的假模型：同一意图的问句向量完全相同，相当于最坏情况下
+嵌入模型（如英文 MiniLM 处理中文）分不开只差一个字的问句，由对比词挡住近似但意思不同的输入。
+
+运行：
+    python -m unittest discover tests
+"""
+
+import unittest
+
+import numpy as np
+
+from src.brain.response_cache import ResponseCache
+
+INTENT_WORDS = ("好", "嗨", "哈喽", "再见", "拜拜", "晚安", "走了", "叫什么", "你是谁", "岁", "星期", "几号")
+
+# (缓存过的输入, 近似但回复不能复用的输入)
+NEAR_MISSES = [
+    ("今天星期几", "明天星期几"),
+    ("今天几号", "昨天几号"),
+    ("你叫什么名字", "我叫什么名字"),
+    ("你几岁了", "他几岁了"),
+    ("早上好", "晚上好"),
+]
+
+
+def intent_embed(text: str):
+    vector = np.array([1.0 if word in text else 0.0 for word in INTENT_WORDS] + [0.01])
+    return vector / np.linalg.norm(vector)
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(intent_embed)
+
+    def test_same_question_hits(self):
+        self.cache.store("今天星期几", "小明", "今天星期三")
+        self.assertEqual(self.cache.lookup("今天星期几？", "小明"), "今天星期三")
+
+    def test_chinese_near_misses_do_not_hit(self):
+        for cached, other in NEAR_MISSES:
+            with self.subTest(cached=cached, other=other):
+                self.cache.store(cached, "小明", f"回复：{cached}")
+                self.assertGreaterEqual(float(intent_embed(cached) @ intent_embed(other)), self.cache.threshold)
+                self.assertIsNone(self.cache.lookup(other, "小明"))
+                self.assertEqual(self.cache.lookup(cached, "小明"), f"回复：{cached}")
+
+    def test_other_speaker_does_not_hit(self):
+        self.cache.store("你好", "小明", "小明你好")
+        self.assertIsNone(self.cache.lookup("你好", "妈妈"))
+
+    def test_non_intent_input_is_not_cached(self):
+        self.cache.store("讲个故事", "小明", "从前有座山")
+        self.assertEqual(self.cache.stats["stores"], 0)
+        self.assertIsNone(self.cache.lookup("讲个故事", "小明"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+"""
+后端路由 / 熔断器测试
+
+运行：
+    python -m unittest discover tests
+"""
+
+import asyncio
+import unittest
+
+from src.brain.router import BackendHealth, BackendRouter, CircuitOpenError
+
+
+def _open_breaker(router: BackendRouter) -> BackendHealth:
+    """让主后端熔断，且熔断立即到期（下一次 allow() 进入半开）"""
+    health = router.health[router.primary]
+    for _ in range(health.failure_threshold):
+        health.record_failure()
+    return health
+
+
+async def _never_first_token():
+    await asyncio.Event().wait()
+    yield "永远不会到"
+
+
+class BackendHealthTest(unittest.TestCase):
+
+    def test_half_open_allows_single_probe(self):
+        health = BackendHealth("cloud", failure_threshold=1, open_seconds=0)
+        health.record_failure()
+        self.assertTrue(health.allow())
+        self.assertFalse(health.allow())
+
+    def test_release_lets_next_probe_through(self):
+        health = BackendHealth("cloud", failure_threshold=1, open_seconds=0)
+        health.record_failure()
+        self.assertTrue(health.allow())
+        health.release()
+        self.assertEqual(health.state, BackendHealth.HALF_OPEN)
+        self.assertTrue(health.allow())
+
+
+def _fail():
+    raise ConnectionError("云端不可用")
+
+
+def _tokens(*tokens):
+    yield from tokens
+
+
+async def _atokens(*tokens):
+    for token in tokens:
+        yield token
+
+
+class RouteResultTest(unittest.TestCase):
+    """路由随结果返回，不依赖路由器上的共享状态"""
+
+    def setUp(self):
+        self.router = BackendRouter("cloud", "local")
+
+    def test_call_returns_route(self):
+        self.assertEqual(self.router.call(lambda: "云端", lambda: "本地"), ("cloud", "云端"))
+        self.assertEqual(self.router.call(_fail, lambda: "本地"), ("local", "本地"))
+
+    def test_acall_returns_route(self):
+        async def primary():
+            return "云端"
+
+        async def fallback():
+            return "本地"
+
+        self.assertEqual(asyncio.run(self.router.acall(primary, fallback)), ("cloud", "云端"))
+
+    def test_stream_yields_route(self):
+        def broken():
+            raise ConnectionError("云端不可用")
+            yield
+
+        tokens = list(self.router.stream(broken, lambda: _tokens("你", "好")))
+        self.assertEqual(tokens, [("local", "你"), ("local", "好")])
+
+    def test_concurrent_fallback_does_not_change_stream_route(self):
+        # 对话流进行中，后台任务的一次调用降级到本地，不影响对话流的路由
+        async def run():
+            stream = self.router.astream(lambda: _atokens("云", "端"))
+            first = await stream.__anext__()
+            background = self.router.call(_fail, lambda: "本地")
+            rest = [item async for item in stream]
+            return first, background, rest
+
+        first, background, rest = asyncio.run(run())
+        self.assertEqual(first, ("cloud", "云"))
+        self.assertEqual(background, ("local", "本地"))
+        self.assertEqual(rest, [("cloud", "端")])
+
+
+class FallbackBreakerTest(unittest.TestCase):
+    """降级后端熔断中时不再降级过去"""
+
+    def setUp(self):
+        self.router = BackendRouter("cloud", "local", first_token_deadline=0.01, min_deadline=0.01,
+                                    failure_threshold=1, open_seconds=60)
+        self.router.health["local"].record_failure()
+        self.fallback_calls = 0
+
+    def fallback(self):
+        self.fallback_calls += 1
+        return "本地"
+
+    def fallback_stream(self):
+        self.fallback_calls += 1
+        return _atokens("本地")
+
+    def test_call_raises_primary_error(self):
+        with self.assertRaises(ConnectionError):
+            self.router.call(_fail, self.fallback)
+        self.assertEqual(self.fallback_calls, 0)
+
+    def test_both_open_raises_circuit_open(self):
+        _open_breaker(self.router)
+        with self.assertRaises(CircuitOpenError):
+            self.router.call(lambda: "云端", self.fallback)
+        with self.assertRaises(CircuitOpenError):
+            list(self.router.stream(lambda: _tokens("云端"), lambda: _tokens("本地")))
+
+        async def consume():
+            return [item async for item in self.router.astream(lambda: _atokens("云端"), self.fallback_stream)]
+
+        with self.assertRaises(CircuitOpenError):
+            asyncio.run(consume())
+        self.assertEqual(self.fallback_calls, 0)
+
+    def test_slow_primary_is_kept_when_fallback_open(self):
+        async def slow():
+            await asyncio.sleep(0.05)
+            yield "云端"
+
+        async def consume():
+            return [item async for item in self.router.astream(slow, self.fallback_stream)]
+
+        self.assertEqual(asyncio.run(consume()), [("cloud", "云端")])
+        self.assertEqual(self.fallback_calls, 0)
+        self.assertEqual(self.router.health["cloud"].state, BackendHealth.CLOSED)
+
+
+class ProbeCancelTest(unittest.TestCase):
+
+    def test_cancelled_async_probe_is_released(self):
+        router = BackendRouter("cloud", failure_threshold=1, open_seconds=0)
+        health = _open_breaker(router)
+
+        async def consume():
+            async for _ in router.astream(_never_first_token):
+                pass
+
+        async def run():
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.05)
+            self.assertTrue(health._probing)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertEqual(health.state, BackendHealth.HALF_OPEN)
+        self.assertTrue(health.allow())
+
+    def test_cancelled_hedged_probe_is_released(self):
+        router = BackendRouter("cloud", "local", first_token_deadline=0.01, min_deadline=0.01,
+                               hedge=True, failure_threshold=1, open_seconds=0)
+        health = _open_breaker(router)
+
+        async def consume():
+            async for _ in router.astream(_never_first_token, _never_first_token):
+                pass
+
+        async def run():
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertTrue(health.allow())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+流式分句器测试
+
+运行：
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from src.brain.segmenter import SentenceSegmenter
+
+
+def segment(tokens: list, **kwargs) -> list:
+    """逐 token 推入，返回全部切出的句子（含 flush 的结尾）"""
+    seg = SentenceSegmenter(**kwargs)
+    segments = []
+    for token in tokens:
+        segments.extend(seg.push(token))
+    tail = seg.flush()
+    if tail:
+        segments.append(tail)
+    return segments
+
+
+class SentenceSegmenterTest(unittest.TestCase):
+
+    def test_splits_on_sentence_ends(self):
+        self.assertEqual(segment(["今天天气不错。", "我们去公园吧！", "好吗？"]),
+                         ["今天天气不错。", "我们去公园吧！", "好吗？"])
+
+    def test_token_boundaries_do_not_matter(self):
+        text = "今天天气不错。我们去公园吧！你想带风筝吗？"
+        whole = segment([text])
+        self.assertEqual(segment(list(text)), whole)
+        self.assertEqual(segment([text[:5], text[5:13], text[13:]]), whole)
+
+    def test_short_sentence_merges_into_next(self):
+        self.assertEqual(segment(["嗯。", "这个问题很有意思。"]), ["嗯。这个问题很有意思。"])
+
+    def test_closing_quote_stays_with_sentence(self):
+        # 句末标点恰好在 token 末尾时，等下一个 token 看是否有收尾引号
+        self.assertEqual(segment(["他说：“我饿了。", "”然后走了。"]), ["他说：“我饿了。”", "然后走了。"])
+
+    def test_repeated_punctuation_kept_together(self):
+        self.assertEqual(segment(["太好了！！", "我们出发吧。"]), ["太好了！！", "我们出发吧。"])
+
+    def test_clause_split_needs_enough_chars(self):
+        self.assertEqual(segment(["好的，", "我知道了。"]), ["好的，我知道了。"])
+        self.assertEqual(segment(["今天下午我们先去公园放风筝，", "然后回家。"]),
+                         ["今天下午我们先去公园放风筝，", "然后回家。"])
+
+    def test_forced_split_without_punctuation(self):
+        segments = segment(["啊" * 25], max_chars=10)
+        self.assertEqual(segments, ["啊" * 10, "啊" * 10, "啊" * 5])
+
+    def test_flush_returns_tail_and_resets(self):
+        seg = SentenceSegmenter()
+        self.assertEqual(seg.push("还没说完"), [])
+        self.assertEqual(seg.flush(), "还没说完")
+        self.assertEqual(seg.flush(), "")
+        self.assertEqual(seg.push(""), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+流式播报（LLM 句子流 → 双向流式 TTS → 播放）测试
+
+用假的 websocket 连接模拟 TTS 服务，检查插话打断、TTS 中途出错时回复的生成和保存。
+
+运行：
+    python -m unittest discover tests
+"""
+
+import asyncio
+import contextlib
+import io
+import types
+import unittest
+from unittest import mock
+
+from src.voice import tts as tts_module
+from src.voice.dialog_manager import VoiceDialogManager
+from src.voice.tts import VolcengineTTS
+
+SENTENCES = ["你好。", "今天天气不错。", "我们去公园吧。", "带上风筝。", "记得喝水。", "晚饭前回家。"]
+FULL_REPLY = "".join(SENTENCES)
+
+
+class FakeWebSocket:
+    """握手直接成功；发出的文本请求放进队列，由假的 _receive_audio 按句返回音频"""
+
+    def __init__(self):
+        self.sent = asyncio.Queue()
+
+    async def send(self, message):
+        await self.sent.put(message)
+
+    async def recv(self):
+        return b"ok"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def fake_websockets(fail_connect: bool = False):
+    def connect(url, **kwargs):
+        if fail_connect:
+            raise ConnectionError("refused")
+        return FakeWebSocket()
+    return types.SimpleNamespace(connect=connect)
+
+
+def make_tts(max_sentences: int = None) -> VolcengineTTS:
+    """max_sentences：收到这么多句后像收到错误帧一样停止接收（None 表示正常收完）"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        tts = VolcengineTTS({})
+    tts._build_start_connection_request = lambda: ("start_connection",)
+    tts._build_start_session_request = lambda request_id: ("start_session",)
+    tts._build_text_request = lambda text, request_id: ("text", text)
+    tts._build_finish_request = lambda request_id: ("finish",)
+
+    async def receive_audio(ws):
+        received = 0
+        while True:
+            message = await ws.sent.get()
+            if message[0] == "finish":
+                return
+            if message[0] != "text":
+                continue
+            received += 1
+            yield b"\0" * 4000
+            if max_sentences is not None and received >= max_sentences:
+                return
+
+    tts._receive_audio = receive_audio
+    return tts
+
+
+class FakeReply:
+    """模拟 Brain.achat_stream：逐句生成，结束、被关闭或被取消时保存已生成的部分"""
+
+    def __init__(self):
+        self.saved = []
+
+    async def stream(self):
+        produced = []
+        try:
+            for sentence in SENTENCES:
+                await asyncio.sleep(0.01)
+                produced.append(sentence)
+                yield sentence
+        finally:
+            self.saved.append("".join(produced))
+
+
+def make_manager(tts, barge_in: bool = False):
+    async def barge_in_check():
+        return barge_in
+
+    return types.SimpleNamespace(
+        tts=tts,
+        tracer=mock.Mock(),
+        audio_device=mock.Mock(),
+        audio_stream=object(),
+        _aec_enabled=True,
+        _barge_in_check=barge_in_check,
+        is_speaking=False,
+        wait_after_speak=-1,
+    )
+
+
+class SpeakStreamTest(unittest.TestCase):
+
+    def speak(self, manager, reply: FakeReply) -> str:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return asyncio.run(VoiceDialogManager._speak_stream(manager, reply.stream()))
+
+    def test_full_playback(self):
+        reply = FakeReply()
+        manager = make_manager(make_tts())
+        self.assertEqual(self.speak(manager, reply), FULL_REPLY)
+        self.assertEqual(reply.saved, [FULL_REPLY])
+        self.assertEqual(manager.audio_device.play_audio.call_count, len(SENTENCES))
+
+    def test_barge_in_stops_generation_and_saves_partial_reply(self):
+        reply = FakeReply()
+        manager = make_manager(make_tts(), barge_in=True)
+        spoken = self.speak(manager, reply)
+        self.assertFalse(manager.is_speaking)
+        self.assertEqual(manager.wait_after_speak, 0)
+        self.assertEqual(len(reply.saved), 1)
+        self.assertTrue(reply.saved[0])
+        self.assertTrue(FULL_REPLY.startswith(reply.saved[0]))
+        self.assertLess(len(reply.saved[0]), len(FULL_REPLY))
+        self.assertTrue(reply.saved[0].startswith(spoken))
+
+    def test_tts_error_frame_keeps_full_reply(self):
+        reply = FakeReply()
+        manager = make_manager(make_tts(max_sentences=2))
+        self.assertEqual(self.speak(manager, reply), FULL_REPLY)
+        self.assertEqual(reply.saved, [FULL_REPLY])
+        self.assertEqual(manager.audio_device.play_audio.call_count, 2)
+
+    def test_tts_connection_failure_keeps_full_reply(self):
+        reply = FakeReply()
+        manager = make_manager(make_tts())
+        with mock.patch.object(tts_module, "get_websockets", lambda: fake_websockets(fail_connect=True)):
+            self.assertEqual(self.speak(manager, reply), FULL_REPLY)
+        self.assertEqual(reply.saved, [FULL_REPLY])
+        manager.audio_device.play_audio.assert_not_called()
+
+
+def setUpModule():
+    patcher = mock.patch.object(tts_module, "get_websockets", fake_websockets)
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+HTTP 连接池统计测试
+
+在本机起一个支持长连接的 HTTP 服务，检查保活请求不计入请求数和复用数。
+
+运行：
+    python -m unittest discover tests
+"""
+
+import asyncio
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.brain.transport import HTTPTransport
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _reply(self, body: bytes):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._reply(b"")
+
+    def do_GET(self):
+        self._reply(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class KeepWarmStatsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.transport = HTTPTransport(self.base_url, http2=False, keep_warm_interval=0)
+        self.addCleanup(self.transport.close)
+
+    def test_ping_not_counted_as_request(self):
+        self.assertTrue(self.transport.ping())
+        for _ in range(2):
+            self.transport.client.get(self.base_url)
+
+        stats = self.transport.snapshot()
+        self.assertEqual(stats["pings"], 1)
+        self.assertEqual(stats["ping_connections"], 1)
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["connections"], 0)
+        self.assertEqual(stats["reused"], 2)
+
+    def test_pings_alone_leave_reuse_at_zero(self):
+        for _ in range(3):
+            self.transport.ping()
+        stats = self.transport.snapshot()
+        self.assertEqual(stats["pings"], 3)
+        self.assertEqual(stats["requests"], 0)
+        self.assertEqual(stats["reused"], 0)
+
+    def test_async_ping_not_counted_as_request(self):
+        async def run():
+            await self.transport.aping()
+            await self.transport.async_client.get(self.base_url)
+            await self.transport.async_client.aclose()
+
+        asyncio.run(run())
+        stats = self.transport.snapshot()
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["ping_connections"], 1)
+        self.assertEqual(stats["reused"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
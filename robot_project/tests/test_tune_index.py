@@ -0,0 +1,137 @@
+"""
+向量索引参数与调参工具测试（tune_index.py）
+
+运行：
+    python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import types
+import unittest
+
+import numpy as np
+
+import tune_index
+from src.brain.vector_store import HNSW_DEFAULTS, hnsw_metadata, l2_equivalent
+
+
+def unit_vectors(n: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class IndexParamsTest(unittest.TestCase):
+
+    def test_hnsw_metadata(self):
+        self.assertEqual(hnsw_metadata({"space": "cosine", "M": 32, "ef_construction": 200, "ef_search": None}),
+                         {"hnsw:space": "cosine", "hnsw:M": 32, "hnsw:construction_ef": 200})
+        self.assertEqual(hnsw_metadata(None), {})
+        with self.assertRaises(ValueError):
+            hnsw_metadata({"efSearch": 10})
+        with self.assertRaises(ValueError):
+            hnsw_metadata({"space": "hamming"})
+        self.assertEqual(set(HNSW_DEFAULTS), {"space", "M", "ef_construction", "ef_search"})
+
+    def test_l2_equivalent_for_unit_vectors(self):
+        a, b = unit_vectors(2)
+        cos = float(a @ b)
+        squared_l2 = float(((a - b) ** 2).sum())
+        self.assertAlmostEqual(l2_equivalent(squared_l2, "l2"), squared_l2, places=5)
+        self.assertAlmostEqual(l2_equivalent(1 - cos, "cosine"), squared_l2, places=5)
+        self.assertAlmostEqual(l2_equivalent(1 - cos, "ip"), squared_l2, places=5)
+
+
+class ExactSearchTest(unittest.TestCase):
+
+    def test_distances_per_space(self):
+        vectors, queries = unit_vectors(20), unit_vectors(3, seed=1)
+        brute_l2 = ((queries[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+        np.testing.assert_allclose(tune_index.distances(vectors, queries, "l2"), brute_l2, atol=1e-5)
+        np.testing.assert_allclose(tune_index.distances(vectors, queries, "ip"), 1 - queries @ vectors.T, atol=1e-6)
+        np.testing.assert_allclose(tune_index.distances(vectors * 3, queries, "cosine"),
+                                   1 - queries @ vectors.T, atol=1e-5)
+
+    def test_exact_top_k(self):
+        vectors = unit_vectors(30)
+        ids = [f"doc{i}" for i in range(30)]
+        truth = tune_index.exact_top_k(ids, vectors, vectors[[4, 17]], 3, "l2")
+        self.assertEqual([row[0] for row in truth], ["doc4", "doc17"])
+        self.assertEqual([len(row) for row in truth], [3, 3])
+
+
+class MeasureTest(unittest.TestCase):
+
+    def test_recall_against_truth(self):
+        answers = iter([["a", "b"], ["a", "b"], ["c", "x"]])  # 第一次调用是加载索引
+
+        def query(query_embeddings, n_results, include):
+            return {"ids": [next(answers)]}
+
+        result = tune_index.measure(types.SimpleNamespace(query=query), unit_vectors(2),
+                                    [["a", "b"], ["c", "d"]], k=2)
+        self.assertAlmostEqual(result["recall"], 0.75)
+        self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+
+    def test_recommend(self):
+        results = [
+            {"backend": "numpy", "recall": 1.0, "p95_ms": 0.1},
+            {"backend": "chroma", "M": 8, "recall": 0.90, "p95_ms": 0.2},
+            {"backend": "chroma", "M": 16, "recall": 0.97, "p95_ms": 0.5},
+            {"backend": "chroma", "M": 32, "recall": 0.99, "p95_ms": 0.9},
+        ]
+        self.assertEqual(tune_index.recommend(results, 0.95)["M"], 16)
+        self.assertEqual(tune_index.recommend(results, 0.999)["M"], 32)
+        self.assertIsNone(tune_index.recommend(results[:1], 0.95))
+
+
+class LoadQueriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.log = os.path.join(self.tmp, "queries.jsonl")
+
+    def write(self, path: str, queries: list):
+        with open(path, "w", encoding="utf-8") as f:
+            for query in queries:
+                f.write(json.dumps({"query": query}, ensure_ascii=False) + "\n")
+            f.write("不是 JSON\n")
+
+    def test_rotated_logs_deduplicated_newest_last(self):
+        self.write(self.log + ".1", ["你好", "今天星期几"])
+        self.write(self.log, ["今天星期几？", "讲个故事"])
+        queries, source = tune_index.load_queries(self.log, [], limit=10)
+        self.assertEqual(queries, ["你好", "今天星期几？", "讲个故事"])
+        self.assertEqual(source, self.log)
+        self.assertEqual(tune_index.load_queries(self.log, [], limit=2)[0], ["今天星期几？", "讲个故事"])
+
+    def test_falls_back_to_user_lines(self):
+        documents = ["用户说：我喜欢恐龙\n机器人回复：真棒", "用户说：晚安\n机器人回复：晚安"]
+        queries, source = tune_index.load_queries(self.log, documents, limit=10)
+        self.assertEqual(sorted(queries), ["我喜欢恐龙", "晚安"])
+        self.assertEqual(source, "对话记忆中的用户原话")
+
+
+class SweepTest(unittest.TestCase):
+
+    def test_small_sweep(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        vectors = unit_vectors(200, dim=16)
+        data = {"ids": [f"doc{i}" for i in range(200)], "documents": [""] * 200, "vectors": vectors, "space": "l2"}
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = tune_index.sweep(data, vectors[:20], k=3, spaces=["l2"], ms=[16],
+                                       ef_constructions=[100], ef_searches=[10, 100], tmp_dir=tmp)
+        self.assertEqual([r["backend"] for r in results], ["numpy", "chroma", "chroma"])
+        self.assertEqual(results[0]["recall"], 1.0)
+        self.assertGreaterEqual(results[2]["recall"], 0.95)
+        self.assertEqual(tune_index.recommend(results, 0.9)["backend"], "chroma")
+
+
+if __name__ == "__main__":
+    unittest.main()
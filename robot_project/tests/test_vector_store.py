@@ -0,0 +1,178 @@
+"""
+NumpyStore 向量存储测试（float16 内存映射 + SQLite 元数据）
+
+运行：
+    python -m unittest discover tests
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from src.brain.vector_store import NumpyStore, match_where
+
+DIM = 16
+
+
+def random_vectors(n: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class NumpyStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path, ignore_errors=True)
+        self.store = self.open()
+
+    def open(self, **kwargs) -> NumpyStore:
+        store = NumpyStore(self.path, embedding_fn=lambda docs: random_vectors(len(docs), seed=99), **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def fill(self, collection, n: int = 50):
+        vectors = random_vectors(n)
+        collection.add(
+            ids=[f"doc{i}" for i in range(n)],
+            documents=[f"文档{i}" for i in range(n)],
+            metadatas=[{"speaker": ("小明", "妈妈", "shared")[i % 3], "n": i} for i in range(n)],
+            embeddings=vectors
+        )
+        return vectors
+
+
+class NumpyCollectionTest(NumpyStoreTestCase):
+
+    def test_query_matches_brute_force(self):
+        for space in ("l2", "cosine", "ip"):
+            with self.subTest(space=space):
+                store = NumpyStore(os.path.join(self.path, space), index={"c": {"space": space}})
+                self.addCleanup(store.close)
+                collection = store.collection("c")
+                vectors = self.fill(collection)
+                query = random_vectors(1, seed=1)[0]
+
+                result = collection.query(query_embeddings=[query], n_results=5)
+                stored = vectors.astype(np.float16).astype(np.float32)
+                if space == "l2":
+                    expected = ((stored - query) ** 2).sum(axis=1)
+                else:
+                    expected = 1 - stored @ query
+                order = np.argsort(expected)[:5]
+                self.assertEqual(result["ids"][0], [f"doc{i}" for i in order])
+                np.testing.assert_allclose(result["distances"][0], expected[order], atol=1e-3)
+                self.assertEqual(result["documents"][0][0], f"文档{order[0]}")
+
+    def test_filtered_query(self):
+        collection = self.store.collection("c")
+        self.fill(collection)
+        query = random_vectors(1, seed=1)[0]
+        result = collection.query(query_embeddings=[query], n_results=100,
+                                  where={"speaker": {"$in": ["小明", "shared"]}})
+        self.assertEqual(len(result["ids"][0]), 33)
+        self.assertTrue(all(m["speaker"] != "妈妈" for m in result["metadatas"][0]))
+        self.assertEqual(collection.query(query_embeddings=[query], where={"speaker": "爷爷"})["ids"], [[]])
+
+    def test_get_with_paging_and_filter(self):
+        collection = self.store.collection("c")
+        self.fill(collection, n=10)
+        page = collection.get(limit=3, offset=2, include=["metadatas"])
+        self.assertEqual(page["ids"], ["doc2", "doc3", "doc4"])
+        self.assertIsNone(page["documents"])
+        filtered = collection.get(where={"n": {"$gte": 8}}, include=["documents", "embeddings"])
+        self.assertEqual(filtered["documents"], ["文档8", "文档9"])
+        self.assertEqual(filtered["embeddings"].shape, (2, DIM))
+        self.assertEqual(collection.get(ids=["doc9", "没有", "doc1"], include=[])["ids"], ["doc9", "doc1"])
+
+    def test_add_update_upsert_delete(self):
+        collection = self.store.collection("c")
+        self.fill(collection, n=5)
+        with contextlib.redirect_stdout(io.StringIO()):
+            collection.add(ids=["doc0"], documents=["重复"], embeddings=random_vectors(1))
+        self.assertEqual(collection.get(ids=["doc0"])["documents"], ["文档0"])
+
+        collection.update(ids=["doc1"], metadatas=[{"count": 2}])
+        self.assertEqual(collection.get(ids=["doc1"])["metadatas"], [{"speaker": "妈妈", "n": 1, "count": 2}])
+
+        collection.upsert(ids=["doc2", "new"], documents=["替换", "新的"], metadatas=[{}, {}])
+        self.assertEqual(collection.count(), 6)
+        self.assertEqual(collection.get(ids=["doc2", "new"])["documents"], ["替换", "新的"])
+
+        collection.delete(ids=["doc3"])
+        collection.delete(where={"speaker": "小明"})
+        self.assertEqual(sorted(collection.get(include=[])["ids"]), ["doc1", "doc2", "doc4", "new"])
+
+    def test_dimension_mismatch(self):
+        collection = self.store.collection("c")
+        self.fill(collection, n=2)
+        with self.assertRaises(ValueError):
+            collection.add(ids=["x"], documents=["x"], embeddings=[[1.0, 0.0]])
+
+
+class NumpyStoreReopenTest(NumpyStoreTestCase):
+
+    def test_reopen_keeps_rows_metadata_and_results(self):
+        collection = self.store.collection("c")
+        self.fill(collection)
+        query = random_vectors(1, seed=1)[0]
+        where = {"speaker": {"$in": ["妈妈", "shared"]}}
+        before = collection.query(query_embeddings=[query], n_results=5, where=where)
+        self.store.close()
+
+        reopened = self.open().collection("c")
+        self.assertEqual(reopened.count(), 50)
+        self.assertEqual(reopened.get(ids=["doc7"])["metadatas"], [{"speaker": "妈妈", "n": 7}])
+        self.assertEqual(reopened.query(query_embeddings=[query], n_results=5, where=where), before)
+
+    def test_reopen_after_delete_and_compact(self):
+        collection = self.store.collection("c")
+        self.fill(collection, n=20)
+        collection.delete(ids=[f"doc{i}" for i in range(0, 20, 2)], compact=False)
+        collection.compact()
+        query = random_vectors(1, seed=2)[0]
+        before = collection.query(query_embeddings=[query], n_results=3)
+        self.store.close()
+
+        reopened = self.open().collection("c")
+        self.assertEqual(sorted(reopened.get(include=[])["ids"]), sorted(f"doc{i}" for i in range(1, 20, 2)))
+        self.assertEqual(reopened.query(query_embeddings=[query], n_results=3), before)
+
+    def test_growth_and_memmap_blocks(self):
+        # 超过初始容量需要扩容；cache_rows=0 时检索走内存映射分块计算
+        collection = self.open(cache_rows=0).collection("big")
+        vectors = self.fill(collection, n=1500)
+        query = vectors[1234]
+        result = collection.query(query_embeddings=[query], n_results=1)
+        self.assertEqual(result["ids"], [["doc1234"]])
+
+    def test_stale_vector_file_removed_on_open(self):
+        self.fill(self.store.collection("c"), n=3)
+        self.store.close()
+        stale = os.path.join(self.path, "c.123.f16.npy")
+        np.save(stale, np.zeros((1, DIM), dtype=np.float16))
+        self.assertEqual(self.open().collection("c").count(), 3)
+        self.assertFalse(os.path.exists(stale))
+
+
+class MatchWhereTest(unittest.TestCase):
+
+    def test_operators(self):
+        meta = {"speaker": "小明", "count": 3}
+        self.assertTrue(match_where(meta, {"speaker": "小明"}))
+        self.assertTrue(match_where(meta, {"count": {"$gt": 2, "$lte": 3}}))
+        self.assertFalse(match_where(meta, {"speaker": {"$nin": ["小明"]}}))
+        self.assertFalse(match_where(meta, {"missing": {"$gt": 0}}))
+        self.assertTrue(match_where(meta, {"$or": [{"speaker": "妈妈"}, {"count": 3}]}))
+        self.assertFalse(match_where(meta, {"$and": [{"speaker": "小明"}, {"count": {"$ne": 3}}]}))
+        with self.assertRaises(ValueError):
+            match_where(meta, {"count": {"$like": 3}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+每轮延迟汇总工具
+
+读取 main_voice.py 写入的 logs/turns.jsonl（含滚动出的 .1/.2/... 历史文件），
+按阶段打印 p50/p90/p95/p99，找出每轮对话的时间花在了哪里。
+
+嘴到耳（mouth-to-ear）：用户说完话 → 机器人第一段语音写入播放设备。
+ASR 最终结果在用户停止说话 end_window_ms 后才到达，因此用户说完的时刻按
+asr_final - end_window_ms 估算。
+
+用法:
+    python trace_summary.py                  # 汇总全部记录
+    python trace_summary.py --last 50        # 只看最近 50 轮
+    python trace_summary.py --json           # 输出 JSON
+"""
+
+import argparse
+import json
+import os
+
+# (阶段名, 起点, 终点)
+STAGES = [
+    ("ASR 建连", "vad_trigger", "asr_connected"),
+    ("ASR 首个中间结果", "vad_trigger", "asr_first_partial"),
+    ("声纹识别", "speaker_id_start", "speaker_id_done"),
+    ("记忆检索", "asr_final", "memory_ready"),
+    ("LLM 首 token", "memory_ready", "llm_first_token"),
+    ("LLM 生成", "llm_first_token", "llm_last_token"),
+    ("TTS 建连", "asr_final", "tts_connected"),
+    ("TTS 首包音频", "tts_first_text", "tts_first_audio"),
+    ("首包 → 播放", "tts_first_audio", "first_playback"),
+    ("识别完成 → 播放", "asr_final", "first_playback"),
+]
+
+
+def load_turns(path: str = "logs/turns.jsonl") -> list:
+    """读取追踪记录（按时间从旧到新）"""
+    # RotatingFileHandler 的历史文件：.1 最新，编号越大越旧
+    files = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.insert(0, f"{path}.{index}")
+        index += 1
+    if os.path.exists(path):
+        files.append(path)
+
+    turns = []
+    for file_path in files:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    turns.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return turns
+
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def mouth_to_ear(turn: dict) -> float:
+    """用户说完话到第一段回复开始播放（毫秒），缺少节点时返回 None"""
+    marks = turn.get("marks", {})
+    if "asr_final" not in marks or "first_playback" not in marks:
+        return None
+    end_window = turn.get("attrs", {}).get("end_window_ms", 0)
+    return marks["first_playback"] - marks["asr_final"] + end_window
+
+
+def summarize(turns: list) -> dict:
+    """
+    Returns:
+        {"turns", "status": {状态: 轮数}, "routes": {后端: 轮数}, "stages": {阶段名: {"count", "p50", ...}}}
+    """
+    samples = {name: [] for name, _, _ in STAGES}
+    samples["嘴到耳"] = []
+    status, routes = {}, {}
+
+    for turn in turns:
+        status[turn.get("status", "ok")] = status.get(turn.get("status", "ok"), 0) + 1
+        route = turn.get("attrs", {}).get("route")
+        if route:
+            routes[route] = routes.get(route, 0) + 1
+        marks = turn.get("marks", {})
+        for name, start, end in STAGES:
+            if start in marks and end in marks:
+                samples[name].append(marks[end] - marks[start])
+        m2e = mouth_to_ear(turn)
+        if m2e is not None:
+            samples["嘴到耳"].append(m2e)
+
+    stages = {}
+    for name, values in samples.items():
+        if not values:
+            continue
+        stages[name] = {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values)
+        }
+    return {"turns": len(turns), "status": status, "routes": routes, "stages": stages}
+
+
+def print_summary(summary: dict):
+    print(f"📊 共 {summary['turns']} 轮  状态: {summary['status']}  后端: {summary['routes']}")
+    print(f"{'阶段':<16}{'次数':>6}{'p50':>10}{'p90':>10}{'p95':>10}{'p99':>10}{'max':>10}   (ms)")
+    for name, s in summary["stages"].items():
+        print(f"{name:<16}{s['count']:>6}{s['p50']:>10.0f}{s['p90']:>10.0f}"
+              f"{s['p95']:>10.0f}{s['p99']:>10.0f}{s['max']:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="每轮延迟汇总")
+    parser.add_argument("--path", default="logs/turns.jsonl", help="追踪文件路径")
+    parser.add_argument("--last", type=int, default=0, help="只统计最近 N 轮（0 为全部）")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    args = parser.parse_args()
+
+    turns = load_turns(args.path)
+    if args.last > 0:
+        turns = turns[-args.last:]
+    if not turns:
+        print(f"⚠️ 没有追踪记录: {args.path}")
+        return
+
+    summary = summarize(turns)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == "__main__":
+    main()
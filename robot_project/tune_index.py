@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+向量索引调参工具（离线）
+
+在记忆库快照上回放记录下来的查询，扫描 HNSW 参数（space × M × ef_construction × ef_search），
+测量每组参数的 recall@k（相对 float32 精确检索）和 p95 检索延迟，画出召回率-延迟曲线，
+按自己的数据量挑参数。NumpyStore 精确检索作为参考点一起测量。
+
+- 快照：先把 --db-path 复制到临时目录再读取，不影响运行中的机器人
+- 查询：memory.query_log 记录的查询（在 config/api.json 中设置
+  "memory": {"query_log": "logs/memory_queries.jsonl"} 开启记录）；
+  没有记录时从对话记忆里抽取用户原话
+- 选好的参数写到 config/api.json 的 memory.index.<集合名>，例如
+      "memory": {"index": {"long_term_memory": {"M": 16, "ef_construction": 100, "ef_search": 40}}}
+  ef_search 重启后即生效；space / M / ef_construction 需要 python import_memory.py --reembed 重建
+
+用法:
+    python tune_index.py
+    python tune_index.py --collection facts --k 3 --m 8,16,32 --ef-search 10,20,50,100
+    python tune_index.py --space l2,cosine --plot logs/index_tuning.png --json logs/index_tuning.json
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from import_memory import COLLECTIONS
+from src.brain.brain import load_api_config
+from src.brain.embedding import make_embedding_function
+from src.brain.speculative import normalize_text
+from src.brain.vector_store import NumpyStore, chroma_index_params, hnsw_metadata
+
+
+def _percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def _int_list(text: str) -> list:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+# ==================== 数据 ====================
+
+def load_snapshot(db_path: str, collection_name: str, store: str, tmp_dir: str) -> dict:
+    """
+    复制记忆库到临时目录，读出集合的全部向量
+
+    Returns:
+        {"ids", "documents", "vectors"(float32), "space"}
+    """
+    snapshot = os.path.join(tmp_dir, "snapshot")
+    shutil.copytree(db_path, snapshot)
+    if store == "numpy":
+        numpy_store = NumpyStore(os.path.join(snapshot, "vectors"))
+        got = numpy_store.collection(collection_name).get(include=["documents", "embeddings"])
+        numpy_store.close()
+        space = "l2"
+    else:
+        collection = chromadb.PersistentClient(path=snapshot).get_collection(collection_name)
+        got = collection.get(include=["documents", "embeddings"])
+        space = chroma_index_params(collection)["space"]
+    if not got["ids"]:
+        raise RuntimeError(f"集合 {collection_name} 为空")
+    return {"ids": got["ids"], "documents": got["documents"],
+            "vectors": np.asarray(got["embeddings"], dtype=np.float32), "space": space}
+
+
+def load_queries(log_path: str, documents: list, limit: int, seed: int = 0) -> tuple:
+    """
+    读取记录的查询（含滚动出去的 .1/.2/... 文件，去重后取最近的 limit 条）
+
+    Returns:
+        (查询文本列表, 来源说明)
+    """
+    paths = [f"{log_path}.{i}" for i in range(9, 0, -1)] + [log_path]  # 从旧到新
+    queries = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    query = json.loads(line).get("query")
+                except json.JSONDecodeError:
+                    continue
+                if query:
+                    key = normalize_text(query) or query
+                    queries.pop(key, None)
+                    queries[key] = query
+    if queries:
+        return list(queries.values())[-limit:], log_path
+
+    # 没有记录：用对话记忆里的用户原话代替
+    samples = []
+    for document in documents:
+        first_line = (document or "").split("\n", 1)[0]
+        if first_line.startswith("用户说："):
+            samples.append(first_line[len("用户说："):])
+    if not samples:
+        samples = [document for document in documents if document]
+    random.Random(seed).shuffle(samples)
+    return samples[:limit], "对话记忆中的用户原话"
+
+
+def distances(vectors: np.ndarray, queries: np.ndarray, space: str) -> np.ndarray:
+    """精确距离（与 ChromaDB 各空间的定义一致）"""
+    dots = queries @ vectors.T
+    if space == "ip":
+        return 1 - dots
+    if space == "cosine":
+        lengths = np.linalg.norm(vectors, axis=1)
+        query_lengths = np.linalg.norm(queries, axis=1)
+        return 1 - dots / np.maximum(query_lengths[:, None] * lengths[None, :], 1e-12)
+    return (vectors ** 2).sum(axis=1)[None, :] - 2 * dots + (queries ** 2).sum(axis=1)[:, None]
+
+
+def exact_top_k(ids: list, vectors: np.ndarray, queries: np.ndarray, k: int, space: str) -> list:
+    """float32 精确检索的 top-k id（召回率基准）"""
+    top = np.argsort(distances(vectors, queries, space), axis=1, kind="stable")[:, :k]
+    return [[ids[i] for i in row] for row in top]
+
+
+# ==================== 测量 ====================
+
+def measure(collection, queries: np.ndarray, truth: list, k: int) -> dict:
+    """逐条查询，返回 {"recall", "p50_ms", "p95_ms"}"""
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=k, include=[])  # 加载索引
+    latencies = []
+    hits = []
+    for query, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+        latencies.append((time.perf_counter() - t0) * 1000)
+        hits.append(len(set(result["ids"][0]) & set(expected)) / max(1, len(expected)))
+    return {"recall": sum(hits) / len(hits), "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95)}
+
+
+def build_hnsw(client, name: str, data: dict, index: dict) -> tuple:
+    """用给定参数新建 ChromaDB 集合并写入全部向量，返回 (集合, 构建秒数)"""
+    try:
+        client.delete_collection(name)
+    except Exception:
+        pass
+    collection = client.create_collection(name=name, metadata=hnsw_metadata(index), embedding_function=None)
+    batch = client.get_max_batch_size()
+    t0 = time.perf_counter()
+    for start in range(0, len(data["ids"]), batch):
+        end = start + batch
+        collection.add(ids=data["ids"][start:end], embeddings=data["vectors"][start:end])
+    return collection, time.perf_counter() - t0
+
+
+def sweep(data: dict, queries: np.ndarray, k: int, spaces: list, ms: list, ef_constructions: list,
+          ef_searches: list, tmp_dir: str) -> list:
+    """
+    扫描参数组合
+
+    ef_search 在进程内修改后要到下次加载索引才生效，所以每组参数都重新构建一次
+
+    Returns:
+        [{"backend", "space", "M", "ef_construction", "ef_search", "build_s", "recall", "p50_ms", "p95_ms"}]
+    """
+    client = chromadb.PersistentClient(path=os.path.join(tmp_dir, "sweep"))
+    results = []
+    for space in spaces:
+        truth = exact_top_k(data["ids"], data["vectors"], queries, k, space)
+
+        # 参考点：NumpyStore 精确检索
+        numpy_store = NumpyStore(os.path.join(tmp_dir, f"numpy_{space}"), index={"bench": {"space": space}})
+        exact = numpy_store.collection("bench")
+        exact.add(data["ids"], [""] * len(data["ids"]), [{}] * len(data["ids"]), data["vectors"])
+        results.append({"backend": "numpy", "space": space, "M": None, "ef_construction": None,
+                        "ef_search": None, "build_s": None, **measure(exact, queries, truth, k)})
+        numpy_store.close()
+        print(f"   [{space}] numpy 精确检索（参考）"
+              f"  recall {results[-1]['recall']:.1%}  p95 {results[-1]['p95_ms']:.3f}ms")
+
+        for m in ms:
+            for ef_construction in ef_constructions:
+                for ef_search in ef_searches:
+                    index = {"space": space, "M": m, "ef_construction": ef_construction, "ef_search": ef_search}
+                    collection, build_s = build_hnsw(client, "tune_index", data, index)
+                    result = {"backend": "chroma", **index, "build_s": build_s,
+                              **measure(collection, queries, truth, k)}
+                    results.append(result)
+                    print(f"   [{space}] M={m:<3} ef_construction={ef_construction:<4} ef_search={ef_search:<4}"
+                          f" recall {result['recall']:.1%}  p95 {result['p95_ms']:.3f}ms", flush=True)
+    return results
+
+
+def recommend(results: list, target_recall: float) -> dict:
+    """达到目标召回率的 HNSW 参数里 p95 最低的一组（都达不到时取召回率最高的）"""
+    candidates = [r for r in results if r["backend"] == "chroma"]
+    if not candidates:
+        return None
+    good = [r for r in candidates if r["recall"] >= target_recall]
+    if good:
+        return min(good, key=lambda r: (r["p95_ms"], -r["recall"]))
+    return max(candidates, key=lambda r: (r["recall"], -r["p95_ms"]))
+
+
+def plot(results: list, k: int, path: str):
+    """召回率-p95 延迟散点图（需要 matplotlib）"""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("⚠️  未安装 matplotlib，跳过绘图（pip install matplotlib）")
+        return
+    fig, ax = plt.subplots(figsize=(8, 5))
+    series = {}
+    for r in results:
+        label = "numpy (exact)" if r["backend"] == "numpy" else f"{r['space']} M={r['M']} efc={r['ef_construction']}"
+        series.setdefault(label, []).append(r)
+    for label, points in series.items():
+        points.sort(key=lambda r: r["p95_ms"])
+        marker = "*" if points[0]["backend"] == "numpy" else "o"
+        ax.plot([r["p95_ms"] for r in points], [r["recall"] for r in points], marker=marker, label=label)
+        for r in points:
+            if r["ef_search"] is not None:
+                ax.annotate(str(r["ef_search"]), (r["p95_ms"], r["recall"]), fontsize=7,
+                            textcoords="offset points", xytext=(3, 3))
+    ax.set_xlabel("p95 latency (ms)")
+    ax.set_ylabel(f"recall@{k}")
+    ax.set_title("HNSW recall vs latency (labels: ef_search)")
+    ax.grid(True, alpha=0.3)
+    ax.legend(fontsize=7)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fig.savefig(path, dpi=120, bbox_inches="tight")
+    print(f"📈 曲线已保存: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量索引调参：回放查询，扫描 HNSW 参数（召回率 vs p95 延迟）")
+    parser.add_argument("--db-path", default=None, help="记忆库路径（默认取配置中的 memory.db_path）")
+    parser.add_argument("--collection", choices=list(COLLECTIONS), default="conversations", help="调参的集合")
+    parser.add_argument("--config", default="config/api.json", help="配置文件")
+    parser.add_argument("--queries", default=None, help="查询记录 JSONL（默认取配置中的 memory.query_log）")
+    parser.add_argument("--max-queries", type=int, default=300, help="最多回放多少条查询")
+    parser.add_argument("--embedding", default=None,
+                        help="嵌入函数: default 或 st:<模型名>（默认取配置中的 memory.embedding）")
+    parser.add_argument("--k", type=int, default=3, help="recall@k 的 k（Memory 检索条数）")
+    parser.add_argument("--space", default=None, help="距离空间，逗号分隔（默认集合当前的空间）")
+    parser.add_argument("--m", default="8,16,32", help="HNSW M，逗号分隔")
+    parser.add_argument("--ef-construction", default="50,100,200", help="ef_construction，逗号分隔")
+    parser.add_argument("--ef-search", default="10,20,40,80,160", help="ef_search，逗号分隔")
+    parser.add_argument("--target-recall", type=float, default=0.95, help="推荐参数的最低召回率")
+    parser.add_argument("--plot", default="logs/index_tuning.png", help="曲线图输出路径")
+    parser.add_argument("--json", default=None, help="把全部结果写入 JSON 文件")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    memory_config = load_api_config(args.config).get("memory", {})
+    db_path = args.db_path or memory_config.get("db_path", "data/memory")
+    collection_name = COLLECTIONS[args.collection][0]
+    tmp_dir = tempfile.mkdtemp(prefix="tune_index_")
+    try:
+        data = load_snapshot(db_path, collection_name, memory_config.get("store", "chroma"), tmp_dir)
+        print(f"📦 {collection_name}: {len(data['ids'])} 条 × {data['vectors'].shape[1]} 维（当前空间 {data['space']}）")
+
+        texts, source = load_queries(args.queries or memory_config.get("query_log", "logs/memory_queries.jsonl"),
+                                     data["documents"], args.max_queries, args.seed)
+        if not texts:
+            print("❌ 没有可回放的查询")
+            return
+        print(f"🔁 回放 {len(texts)} 条查询（来源: {source}）")
+        embedding = args.embedding or memory_config.get("embedding", "default")
+        queries = np.asarray(make_embedding_function(embedding)(texts), dtype=np.float32)
+        k = min(args.k, len(data["ids"]))
+
+        spaces = args.space.split(",") if args.space else [data["space"]]
+        results = sweep(data, queries, k, spaces, _int_list(args.m), _int_list(args.ef_construction),
+                        _int_list(args.ef_search), tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    best = recommend(results, args.target_recall)
+    print()
+    if best is not None:
+        if best["recall"] >= args.target_recall:
+            print(f"✅ 推荐（recall@{k} ≥ {args.target_recall:.0%} 中 p95 最低）: "
+                  f"recall {best['recall']:.1%}, p95 {best['p95_ms']:.3f}ms")
+        else:
+            print(f"⚠️  没有参数达到 recall@{k} ≥ {args.target_recall:.0%}，召回率最高的一组: "
+                  f"recall {best['recall']:.1%}, p95 {best['p95_ms']:.3f}ms（可加大 M / ef_search 再试）")
+        snippet = {key: best[key] for key in ("space", "M", "ef_construction", "ef_search")}
+        print(f'   config/api.json → "memory": {{"index": {{"{collection_name}": '
+              f'{json.dumps(snippet, ensure_ascii=False)}}}}}')
+        if snippet["space"] != data["space"]:
+            print(f"   更换距离空间后需重建: python import_memory.py --reembed {args.collection}")
+    if args.plot:
+        plot(results, k, args.plot)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"collection": collection_name, "docs": len(data["ids"]), "queries": len(texts),
+                       "k": k, "results": results, "recommended": best}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
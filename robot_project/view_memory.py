@@ -2,89 +2,310 @@
 # -*- coding: utf-8 -*-
 """
 查看机器人记忆数据库内容
+
+以只读方式直接读取 ChromaDB 的 SQLite 文件（不创建 chromadb 客户端），
+机器人运行中也可以安全使用。按页读取，支持时间范围、类型、说话人和关键字过滤，
+可流式导出为 JSONL / CSV。只支持 ChromaDB 存储（memory.store 为 numpy 时直接退出）。
+
+用法:
+    python view_memory.py                                  # 统计 + 每个集合前 20 条
+    python view_memory.py --collection facts --offset 20   # 事实记忆第 2 页
+    python view_memory.py --since 2026-01-01 --contains 恐龙
+    python view_memory.py --type digest --export digests.jsonl
+    python view_memory.py --speaker 小明 --collection facts
+    python view_memory.py --export all.csv                 # 导出全部（按扩展名选择格式）
 """
 
-import chromadb
-from datetime import datetime
+import argparse
+import csv
+import json
+import os
+import sqlite3
+
+from src.brain.vector_store import NUMPY_STORE_UNSUPPORTED, numpy_store_in_use
+
+# 集合别名 -> (集合名, 显示名, 图标)
+COLLECTIONS = {
+    "facts": ("important_facts", "重要事实记忆", "🌟"),
+    "conversations": ("long_term_memory", "对话记忆", "💬"),
+}
+
+DOCUMENT_KEY = "chroma:document"
+
+
+class MemoryReader:
+    """ChromaDB 存储的只读分页读取器"""
+
+    def __init__(self, db_path: str = "data/memory"):
+        sqlite_path = os.path.join(db_path, "chroma.sqlite3")
+        if not os.path.exists(sqlite_path):
+            raise FileNotFoundError(f"找不到数据库文件: {sqlite_path}")
+        # mode=ro：只读打开，不会加写锁，也不会改动机器人正在使用的数据库
+        self.conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+
+    def close(self):
+        self.conn.close()
+
+    def _segment(self, collection_name: str) -> str:
+        """集合对应的元数据段 ID（集合不存在时返回 None）"""
+        row = self.conn.execute(
+            "SELECT s.id FROM segments s JOIN collections c ON s.collection = c.id "
+            "WHERE c.name = ? AND s.scope = 'METADATA'",
+            (collection_name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _where(since: str = None, until: str = None, doc_type: str = None, contains: str = None,
+               speaker: str = None) -> tuple:
+        """过滤条件的 SQL 片段和参数（时间为 ISO 字符串，按字典序比较即可）"""
+        clauses, params = [], []
+
+        def has(key: str, condition: str, value):
+            clauses.append(
+                f"EXISTS (SELECT 1 FROM embedding_metadata m WHERE m.id = e.id AND m.key = ? AND {condition})"
+            )
+            params.extend([key, value])
+
+        if since:
+            has("time", "m.string_value >= ?", since)
+        if until:
+            has("time", "m.string_value < ?", until)
+        if doc_type:
+            has("type", "m.string_value = ?", doc_type)
+        if contains:
+            has(DOCUMENT_KEY, "instr(m.string_value, ?) > 0", contains)
+        if speaker:
+            has("speaker", "m.string_value = ?", speaker)
+        return "".join(f" AND {clause}" for clause in clauses), params
+
+    def count(self, collection_name: str, **filters) -> int:
+        """符合条件的条数"""
+        segment = self._segment(collection_name)
+        if segment is None:
+            return 0
+        where, params = self._where(**filters)
+        row = self.conn.execute(
+            f"SELECT COUNT(*) FROM embeddings e WHERE e.segment_id = ?{where}", [segment] + params
+        ).fetchone()
+        return row[0]
+
+    def iter_records(self, collection_name: str, offset: int = 0, limit: int = None,
+                     batch_size: int = 200, **filters):
+        """
+        按写入顺序逐条产出记录，每次只从数据库读取 batch_size 条
+
+        Args:
+            collection_name: 集合名
+            offset: 跳过前多少条（过滤之后）
+            limit: 最多返回多少条（None 表示全部）
+            batch_size: 每批读取条数
+            filters: since / until / doc_type / contains / speaker
+
+        Yields:
+            {"id", "document", "time", "type", "metadata"}
+        """
+        segment = self._segment(collection_name)
+        if segment is None:
+            return
+        where, params = self._where(**filters)
+
+        last_rowid = -1
+        remaining = limit
+        skip = offset
+        while remaining is None or remaining > 0:
+            size = batch_size if remaining is None else min(batch_size, remaining + skip)
+            # 按行号翻页（keyset），越往后翻也不会变慢
+            rows = self.conn.execute(
+                f"SELECT e.id, e.embedding_id FROM embeddings e "
+                f"WHERE e.segment_id = ? AND e.id > ?{where} ORDER BY e.id LIMIT ?",
+                [segment, last_rowid] + params + [size]
+            ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+
+            if skip:
+                dropped = min(skip, len(rows))
+                rows = rows[dropped:]
+                skip -= dropped
+            if not rows:
+                continue
+
+            metadata = self._metadata([rowid for rowid, _ in rows])
+            for rowid, doc_id in rows:
+                meta = metadata.get(rowid, {})
+                document = meta.pop(DOCUMENT_KEY, "")
+                yield {
+                    "id": doc_id,
+                    "document": document,
+                    "time": meta.get("time", ""),
+                    "type": meta.get("type", ""),
+                    "metadata": meta
+                }
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining <= 0:
+                        return
+
+    def _metadata(self, rowids: list) -> dict:
+        """批量读取一页记录的元数据（含文档内容）"""
+        placeholders = ",".join("?" * len(rowids))
+        result = {}
+        for rowid, key, string_value, int_value, float_value, bool_value in self.conn.execute(
+            f"SELECT id, key, string_value, int_value, float_value, bool_value "
+            f"FROM embedding_metadata WHERE id IN ({placeholders})",
+            rowids
+        ):
+            if string_value is not None:
+                value = string_value
+            elif int_value is not None:
+                value = int_value
+            elif float_value is not None:
+                value = float_value
+            else:
+                value = bool(bool_value) if bool_value is not None else None
+            result.setdefault(rowid, {})[key] = value
+        return result
+
+
+def export_records(reader: MemoryReader, collection_names: list, path: str, fmt: str = None,
+                   **filters) -> int:
+    """
+    流式导出到 JSONL / CSV（逐批写入磁盘，不在内存中攒全部记录）
+
+    Returns:
+        导出条数
+    """
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    exported = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = None
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(["collection", "id", "time", "type", "document", "metadata"])
+        for name in collection_names:
+            for record in reader.iter_records(name, **filters):
+                if writer:
+                    writer.writerow([name, record["id"], record["time"], record["type"], record["document"],
+                                     json.dumps(record["metadata"], ensure_ascii=False)])
+                else:
+                    f.write(json.dumps(dict(record, collection=name), ensure_ascii=False) + "\n")
+                exported += 1
+    return exported
 
-def view_memory_database(db_path="data/memory"):
-    """查看记忆数据库中的所有内容"""
 
+def view_memory_database(db_path="data/memory", collections=None, offset=0, limit=20,
+                         export=None, export_format=None, **filters):
+    """
+    查看（或导出）记忆数据库内容
+
+    Args:
+        db_path: 数据库路径
+        collections: 集合别名列表（facts / conversations），默认全部
+        offset / limit: 分页（仅对查看生效；导出时 limit 为 None 表示全部）
+        export: 导出文件路径（JSONL / CSV）
+        export_format: 导出格式 jsonl / csv（默认按扩展名）
+        filters: since / until / doc_type / contains / speaker
+    """
     print("=" * 60)
     print("  机器人记忆数据库查看工具")
     print("=" * 60)
     print()
 
+    aliases = collections or list(COLLECTIONS)
+    try:
+        reader = MemoryReader(db_path)
+    except Exception as e:
+        print(f"❌ 错误: {e}")
+        print("\n可能的原因:")
+        print("  1. 数据库路径不正确")
+        print("  2. 还没有运行过机器人程序")
+        return
+
     try:
-        # 连接数据库
-        client = chromadb.PersistentClient(path=db_path)
-
-        # 获取两个集合
-        try:
-            facts = client.get_collection("important_facts")
-            fact_count = facts.count()
-        except:
-            facts = None
-            fact_count = 0
-
-        try:
-            conversations = client.get_collection("long_term_memory")
-            conv_count = conversations.count()
-        except:
-            conversations = None
-            conv_count = 0
-
-        # 显示统计
-        print(f"📊 记忆统计:")
-        print(f"   重要事实: {fact_count} 条")
-        print(f"   对话记忆: {conv_count} 条")
-        print(f"   总计: {fact_count + conv_count} 条\n")
-
-        if fact_count == 0 and conv_count == 0:
-            print("⚠️  数据库为空，还没有任何记忆")
+        counts = {alias: reader.count(COLLECTIONS[alias][0], **filters) for alias in aliases}
+        filtered = any(filters.values())
+        print(f"📊 记忆统计{'（已过滤）' if filtered else ''}:")
+        for alias in aliases:
+            print(f"   {COLLECTIONS[alias][1]}: {counts[alias]} 条")
+        print(f"   总计: {sum(counts.values())} 条\n")
+
+        if export:
+            names = [COLLECTIONS[alias][0] for alias in aliases]
+            exported = export_records(reader, names, export, export_format,
+                                      offset=offset, limit=limit, **filters)
+            print(f"✅ 已导出 {exported} 条到 {export}")
             return
 
-        # 显示事实记忆
-        if facts and fact_count > 0:
-            print("=" * 60)
-            print("🌟 重要事实记忆")
+        if sum(counts.values()) == 0:
+            print("⚠️  没有符合条件的记忆" if filtered else "⚠️  数据库为空，还没有任何记忆")
+            return
+
+        for alias in aliases:
+            name, title, icon = COLLECTIONS[alias]
+            if counts[alias] <= offset:
+                continue
             print("=" * 60)
-            all_facts = facts.get()
-            for i, (doc_id, document, metadata) in enumerate(zip(
-                all_facts['ids'],
-                all_facts['documents'],
-                all_facts['metadatas']
-            ), 1):
-                print(f"\n{'─' * 60}")
-                print(f"📌 事实 #{i}")
-                print(f"时间: {metadata.get('time', '未知')}")
-                print(f"内容: {document}")
-
-        # 显示对话记忆
-        if conversations and conv_count > 0:
-            print("\n" + "=" * 60)
-            print("💬 对话记忆")
+            print(f"{icon} {title}（第 {offset + 1}~{min(offset + limit, counts[alias])} 条，共 {counts[alias]} 条）")
             print("=" * 60)
-            all_convs = conversations.get()
-            for i, (doc_id, document, metadata) in enumerate(zip(
-                all_convs['ids'],
-                all_convs['documents'],
-                all_convs['metadatas']
-            ), 1):
+            for i, record in enumerate(reader.iter_records(name, offset=offset, limit=limit, **filters),
+                                       offset + 1):
                 print(f"\n{'─' * 60}")
-                print(f"📝 对话 #{i}")
-                print(f"时间: {metadata.get('time', '未知')}")
-                print(f"内容:")
-                print(f"  {document}")
+                print(f"{'📌' if alias == 'facts' else '📝'} #{i}  [{record['type'] or '未知'}]")
+                print(f"时间: {record['time'] or '未知'}")
+                if record["metadata"].get("speaker"):
+                    print(f"说话人: {record['metadata']['speaker']}")
+                if record["metadata"].get("count", 1) > 1:
+                    print(f"提及次数: {record['metadata']['count']}")
+                print(f"内容: {record['document']}")
+            if offset + limit < counts[alias]:
+                print(f"\n👉 下一页: --collection {alias} --offset {offset + limit}")
+            print()
+
+        print("=" * 60)
+    finally:
+        reader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看机器人记忆数据库（只读）")
+    parser.add_argument("--db-path", default="data/memory", help="数据库路径")
+    parser.add_argument("--collection", choices=list(COLLECTIONS) + ["all"], default="all", help="集合")
+    parser.add_argument("--offset", type=int, default=0, help="跳过前 N 条")
+    parser.add_argument("--limit", type=int, default=None, help="每页条数（查看默认 20，导出默认全部）")
+    parser.add_argument("--since", default=None, help="起始时间（含），如 2026-01-01")
+    parser.add_argument("--until", default=None, help="截止时间（不含），如 2026-02-01")
+    parser.add_argument("--type", dest="doc_type", choices=["fact", "conv", "digest"], default=None, help="记忆类型")
+    parser.add_argument("--contains", default=None, help="内容包含的关键字")
+    parser.add_argument("--speaker", default=None, help="说话人（家庭成员名字，或 shared 表示共享）")
+    parser.add_argument("--export", default=None, help="导出文件路径（.jsonl / .csv）")
+    parser.add_argument("--format", dest="export_format", choices=["jsonl", "csv"], default=None, help="导出格式")
+    parser.add_argument("--config", default="config/api.json", help="配置文件（检查 memory.store）")
+    args = parser.parse_args()
+
+    if numpy_store_in_use(args.db_path, args.config):
+        print(f"❌ {NUMPY_STORE_UNSUPPORTED}")
+        return
+
+    limit = args.limit
+    if limit is None and not args.export:
+        limit = 20
+
+    view_memory_database(
+        db_path=args.db_path,
+        collections=None if args.collection == "all" else [args.collection],
+        offset=args.offset,
+        limit=limit,
+        export=args.export,
+        export_format=args.export_format,
+        since=args.since,
+        until=args.until,
+        doc_type=args.doc_type,
+        contains=args.contains,
+        speaker=args.speaker
+    )
 
-        print("\n" + "=" * 60)
-        
-    except Exception as e:
-        print(f"❌ 错误: {e}")
-        print("\n可能的原因:")
-        print("  1. 数据库路径不正确")
-        print("  2. 还没有运行过机器人程序")
-        print("  3. ChromaDB 未正确安装")
 
 if __name__ == "__main__":
-    view_memory_database()
+    main()